@@ -0,0 +1,56 @@
+import argparse
+import json
+
+# python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+
+METRICS = ["throughput_per_s", "p50_ms", "p95_ms", "p99_ms", "errors"]
+
+
+def flatten(results: dict):
+    rows = {}
+    for phase in ["upload", "process"]:
+        if phase in results:
+            rows[phase] = results[phase]
+
+    for search_mode, levels in results.get("query", {}).items():
+        for level, summary in levels.items():
+            rows[f"query {search_mode} {level}"] = summary
+
+    return rows
+
+
+def format_change(old, new):
+    if old is None or new is None:
+        return "n/a"
+    if old == 0:
+        return "" if new == 0 else "new"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    print(f"baseline  {baseline['meta']['commit']} {baseline['meta']['started_at']}")
+    print(f"candidate {candidate['meta']['commit']} {candidate['meta']['started_at']}")
+
+    old_rows = flatten(baseline["results"])
+    new_rows = flatten(candidate["results"])
+
+    print(f"\n{'phase':<24}{'metric':<18}{'baseline':>12}{'candidate':>12}{'change':>10}")
+    for name in [name for name in old_rows if name in new_rows]:
+        for metric in METRICS:
+            old = old_rows[name].get(metric)
+            new = new_rows[name].get(metric)
+            print(f"{name:<24}{metric:<18}{str(old):>12}{str(new):>12}{format_change(old, new):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import random
+import os
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+# synthetic documents: the same seed always gives the same bytes
+
+VOCABULARY = (
+    "pump valve bearing housing seal rotor stator flange gasket shaft coupling motor sensor "
+    "pressure temperature flow torque voltage current inspection maintenance warranty clause "
+    "contract supplier delivery invoice tolerance assembly calibration specification revision "
+    "approval safety procedure operator manual failure replacement interval schedule report"
+).split()
+
+
+def make_sentence(rng: random.Random, words: int = 14):
+    sentence = [rng.choice(VOCABULARY) for _ in range(words)]
+    if rng.random() < 0.3:
+        sentence.insert(rng.randrange(len(sentence)), make_part_number(rng))
+    return " ".join(sentence).capitalize() + "."
+
+
+def make_part_number(rng: random.Random):
+    return f"{rng.choice('ABCDEFGH')}{rng.choice('KLMNPQRS')}-{rng.randrange(1000, 9999)}"
+
+
+def escape_pdf_text(text: str):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(path: str, pages: list):
+    # a minimal valid PDF with one Helvetica text stream per page, no external tool needed
+    objects = []
+
+    def add(body: str):
+        objects.append(body)
+        return len(objects)
+
+    font_id = add("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    content_ids = []
+    for lines in pages:
+        stream = "BT /F1 10 Tf 50 750 Td 13 TL " + " ".join(
+            f"({escape_pdf_text(line)}) Tj T*" for line in lines
+        ) + " ET"
+        content_ids.append(add(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream"))
+
+    pages_id = len(objects) + len(pages) + 1
+    page_ids = [
+        add(f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 612 792] "
+            f"/Contents {content_id} 0 R /Resources << /Font << /F1 {font_id} 0 R >> >> >>")
+        for content_id in content_ids
+    ]
+    add(f"<< /Type /Pages /Kids [{' '.join(f'{page_id} 0 R' for page_id in page_ids)}] /Count {len(page_ids)} >>")
+    catalog_id = add(f"<< /Type /Catalog /Pages {pages_id} 0 R >>")
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for idx, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{idx} 0 obj\n{body}\nendobj\n".encode("latin-1")
+
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root {catalog_id} 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def make_pdf_document(path: str, n_pages: int, rng: random.Random):
+    pages = []
+    for page in range(n_pages):
+        lines = [f"Section {page + 1}. {rng.choice(VOCABULARY).capitalize()} {rng.choice(VOCABULARY)}"]
+        paragraph = " ".join(make_sentence(rng) for _ in range(12))
+        # about 90 characters per line keeps the text inside the page
+        while paragraph:
+            lines.append(paragraph[:90])
+            paragraph = paragraph[90:]
+        pages.append(lines)
+    make_pdf(path, pages)
+
+
+def make_xlsx_document(path: str, n_rows: int, rng: random.Random):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Parts"
+    sheet.append(["Part", "Component", "Supplier", "Tolerance", "Notes"])
+    for _ in range(n_rows):
+        sheet.append([
+            make_part_number(rng),
+            rng.choice(VOCABULARY),
+            rng.choice(VOCABULARY).capitalize(),
+            round(rng.uniform(0.01, 2.0), 3),
+            make_sentence(rng, words=8),
+        ])
+    workbook.save(path)
+
+
+def generate_corpus(output_dir: str, pdf_files: int = 10, pdf_pages: int = 20,
+                    xlsx_files: int = 0, xlsx_rows: int = 500, seed: int = 0):
+    os.makedirs(output_dir, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+
+    for idx in range(pdf_files):
+        path = os.path.join(output_dir, f"document_{idx:04d}.pdf")
+        make_pdf_document(path, pdf_pages, rng)
+        paths.append(path)
+
+    if xlsx_files and openpyxl is None:
+        raise RuntimeError("openpyxl is required to generate XLSX files")
+
+    for idx in range(xlsx_files):
+        path = os.path.join(output_dir, f"sheet_{idx:04d}.xlsx")
+        make_xlsx_document(path, xlsx_rows, rng)
+        paths.append(path)
+
+    return paths
+
+
+def generate_questions(n_questions: int, seed: int = 1):
+    rng = random.Random(seed)
+    questions = []
+    for idx in range(n_questions):
+        if idx % 4 == 3:
+            questions.append(f"Which documents mention part {make_part_number(rng)}?")
+        else:
+            questions.append(f"What does the manual say about {rng.choice(VOCABULARY)} "
+                             f"{rng.choice(VOCABULARY)} and {rng.choice(VOCABULARY)}?")
+    return questions
@@ -0,0 +1,168 @@
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import numpy as np
+import contextlib
+import argparse
+import asyncio
+import hashlib
+import base64
+import json
+import time
+import re
+import uvicorn
+
+# an OpenAI compatible stand-in: deterministic embeddings and canned answers with configurable latency
+
+app = FastAPI()
+app.state.options = {
+    "embedding_size": 1536,
+    "embedding_latency_ms": 20.0,
+    "embedding_latency_per_item_ms": 0.05,
+    "first_token_latency_ms": 200.0,
+    "token_latency_ms": 10.0,
+    "answer_tokens": 64,
+    "max_concurrency": 0,
+}
+app.state.slots = None
+
+word_pattern = re.compile(r"\w+(?:[-./]\w+)*")
+
+
+def embed(text: str, size: int):
+    # feature hashing of the words, texts sharing words end up close like real embeddings
+    vector = np.zeros(size, dtype=np.float32)
+    for word in word_pattern.findall(text.lower()):
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % size
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        vector[0] = 1.0
+        norm = 1.0
+    return vector / norm
+
+
+def count_tokens(text: str):
+    return len(text) // 4 + 1
+
+
+def get_slots(app: FastAPI):
+    # like an inference server with a fixed batch size, requests past max_concurrency wait their turn
+    if app.state.slots is None:
+        size = app.state.options["max_concurrency"]
+        app.state.slots = asyncio.Semaphore(size) if size > 0 else contextlib.nullcontext()
+    return app.state.slots
+
+
+@app.get("/v1/models")
+async def models():
+    return JSONResponse({
+        "object": "list",
+        "data": [{"id": "fake", "object": "model", "created": 0, "owned_by": "benchmarks"}],
+    })
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    options = request.app.state.options
+    body = await request.json()
+
+    inputs = body["input"]
+    if isinstance(inputs, str):
+        inputs = [inputs]
+
+    async with get_slots(request.app):
+        await asyncio.sleep((options["embedding_latency_ms"]
+                             + options["embedding_latency_per_item_ms"] * len(inputs)) / 1000)
+
+    data = []
+    for idx, text in enumerate(inputs):
+        vector = embed(text, options["embedding_size"])
+        if body.get("encoding_format") == "base64":
+            encoded = base64.b64encode(vector.astype("<f4").tobytes()).decode("ascii")
+        else:
+            encoded = vector.tolist()
+        data.append({"object": "embedding", "index": idx, "embedding": encoded})
+
+    tokens = sum(count_tokens(text) for text in inputs)
+    return JSONResponse({
+        "object": "list",
+        "data": data,
+        "model": body.get("model"),
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+    })
+
+
+def make_answer(messages: list, n_tokens: int):
+    prompt = " ".join(str(message.get("content", "")) for message in messages)
+    words = word_pattern.findall(prompt) or ["answer"]
+    digest = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+    return [words[(digest + idx * 7) % len(words)] + " " for idx in range(n_tokens)], count_tokens(prompt)
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    options = request.app.state.options
+    body = await request.json()
+
+    tokens, prompt_tokens = make_answer(body.get("messages", []), options["answer_tokens"])
+    completion_id = f"chatcmpl-{int(time.time() * 1000)}"
+    created = int(time.time())
+    model = body.get("model")
+
+    slots = get_slots(request.app)
+
+    if not body.get("stream"):
+        async with slots:
+            await asyncio.sleep((options["first_token_latency_ms"]
+                                 + options["token_latency_ms"] * len(tokens)) / 1000)
+        return JSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(tokens)},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(tokens),
+                "total_tokens": prompt_tokens + len(tokens),
+            },
+        })
+
+    async def stream():
+        async with slots:
+            await asyncio.sleep(options["first_token_latency_ms"] / 1000)
+            for token in tokens:
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(options["token_latency_ms"] / 1000)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI compatible server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    for key, value in app.state.options.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+
+    app.state.options = {key: getattr(args, key) for key in app.state.options}
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
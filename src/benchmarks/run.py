@@ -0,0 +1,454 @@
+from .corpus import generate_corpus, generate_questions
+import numpy as np
+import subprocess
+import argparse
+import platform
+import tempfile
+import asyncio
+import shutil
+import socket
+import httpx
+import json
+import time
+import uuid
+import sys
+import os
+
+# end to end benchmark: fake OpenAI server + the real app, upload -> process -> query
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MIME_TYPES = {
+    ".pdf": "application/pdf",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# unstructured downloads these on first use, which fails the pdf jobs on an offline box
+NLTK_RESOURCES = {
+    "punkt": "tokenizers/punkt",
+    "punkt_tab": "tokenizers/punkt_tab",
+    "averaged_perceptron_tagger": "taggers/averaged_perceptron_tagger",
+    "averaged_perceptron_tagger_eng": "taggers/averaged_perceptron_tagger_eng",
+}
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline upload/process/query benchmark")
+    parser.add_argument("--output", default=None, help="results json, defaults to benchmarks/results/")
+    parser.add_argument("--pdf-files", type=int, default=10)
+    parser.add_argument("--pdf-pages", type=int, default=20)
+    parser.add_argument("--xlsx-files", type=int, default=2)
+    parser.add_argument("--xlsx-rows", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200, help="queries per concurrency level")
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--search-modes", default="vector,lexical,hybrid")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--overlap-size", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--vector-db", default="NUMPY")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--vector-db-mode", default=None,
+                        help="single, server or replica, defaults to single for one worker and to "
+                             "replica (NUMPY) or server (CHROMA) for more")
+    parser.add_argument("--embedding-size", type=int, default=256)
+    parser.add_argument("--embedding-latency-ms", type=float, default=20.0)
+    parser.add_argument("--first-token-latency-ms", type=float, default=200.0)
+    parser.add_argument("--token-latency-ms", type=float, default=5.0)
+    parser.add_argument("--answer-tokens", type=int, default=64)
+    parser.add_argument("--openai-replicas", type=int, default=1,
+                        help="fake OpenAI servers, more than one goes through the load balancer")
+    parser.add_argument("--openai-max-concurrency", type=int, default=0,
+                        help="requests each fake server runs at once, 0 for no limit")
+    parser.add_argument("--answer-cache", action="store_true", help="keep the answer cache on")
+    parser.add_argument("--process-timeout", type=float, default=1800.0)
+    parser.add_argument("--nltk-data", default=None,
+                        help="directory with the nltk data the pdf partitioner needs, passed to the app as NLTK_DATA")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark files and databases")
+    return parser.parse_args()
+
+
+def get_vector_db_mode(args):
+    if args.vector_db_mode:
+        return args.vector_db_mode
+    if args.workers <= 1:
+        return "single"
+    return "server" if args.vector_db == "CHROMA" else "replica"
+
+
+def check_nltk_data(args):
+    if args.pdf_files <= 0:
+        return
+
+    import nltk
+    if args.nltk_data:
+        nltk.data.path.insert(0, os.path.abspath(args.nltk_data))
+
+    missing = []
+    for name, resource in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            missing.append(name)
+
+    if missing:
+        target = f" -d {args.nltk_data}" if args.nltk_data else ""
+        raise BenchmarkError(
+            f"missing nltk data {', '.join(missing)}, the pdf jobs would fail. "
+            f"Run `python -m nltk.downloader{target} {' '.join(NLTK_RESOURCES)}` "
+            f"on a machine with network access and pass the directory with --nltk-data"
+        )
+
+
+def ingestion_errors(results: dict):
+    errors = []
+    if results["upload"]["errors"]:
+        errors.append(f"{results['upload']['errors']} uploads failed")
+    if results["process"]["errors"]:
+        errors.append(f"{results['process']['errors']} process jobs failed {results['process']['job_errors']}")
+    if results["process"]["chunks"]["failed"]:
+        errors.append(f"{results['process']['chunks']['failed']} chunks were not indexed")
+    return errors
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=SRC_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def summarize(latencies: list, errors: int, wall_seconds: float):
+    count = len(latencies)
+    summary = {
+        "count": count,
+        "errors": errors,
+        "wall_seconds": round(wall_seconds, 4),
+        "throughput_per_s": round(count / wall_seconds, 3) if wall_seconds > 0 else None,
+    }
+    if latencies:
+        values = np.asarray(latencies) * 1000
+        summary.update({
+            "mean_ms": round(float(values.mean()), 3),
+            "p50_ms": round(float(np.percentile(values, 50)), 3),
+            "p95_ms": round(float(np.percentile(values, 95)), 3),
+            "p99_ms": round(float(np.percentile(values, 99)), 3),
+            "max_ms": round(float(values.max()), 3),
+        })
+    return summary
+
+
+async def run_concurrent(items: list, concurrency: int, call):
+    # call(item) -> bool, latencies only count the calls that succeeded
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def run(item):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                ok = await call(item)
+            except Exception:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[run(item) for item in items])
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def wait_ready(client: httpx.AsyncClient, url: str, process: subprocess.Popen, timeout: float = 120):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}")
+        try:
+            await client.get(url)
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up in {timeout}s")
+
+
+async def bench_upload(client, base_url: str, project_id: str, paths: list, concurrency: int):
+    file_ids = {}
+
+    async def upload(path):
+        with open(path, "rb") as f:
+            content = f.read()
+        name = os.path.basename(path)
+        response = await client.post(
+            f"{base_url}/api/v1/data/upload/{project_id}",
+            files={"file": (name, content, MIME_TYPES[os.path.splitext(name)[1]])}
+        )
+        if response.status_code != 200:
+            return False
+        file_ids[path] = response.json()["file_id"]
+        return True
+
+    summary = await run_concurrent(paths, concurrency, upload)
+    summary["bytes"] = sum(os.path.getsize(path) for path in paths)
+    return summary, [file_ids[path] for path in paths if path in file_ids]
+
+
+async def bench_process(client, base_url: str, project_id: str, file_ids: list, args):
+    chunks = {"added": 0, "skipped": 0, "failed": 0}
+    job_errors = []
+
+    async def process(file_id):
+        response = await client.post(f"{base_url}/api/v1/data/process/{project_id}", json={
+            "file_id": file_id, "chunk_size": args.chunk_size, "overlap_size": args.overlap_size,
+        })
+        if response.status_code != 202:
+            return False
+
+        job_id = response.json()["job_id"]
+        deadline = time.perf_counter() + args.process_timeout
+        while time.perf_counter() < deadline:
+            job = (await client.get(f"{base_url}/api/v1/jobs/{job_id}")).json()
+            if job["status"] == "completed":
+                for key in chunks:
+                    chunks[key] += job["result"].get(key, 0)
+                return True
+            if job["status"] == "failed":
+                job_errors.append(job["error"])
+                return False
+            await asyncio.sleep(0.05)
+        return False
+
+    # every job is submitted at once, the app's job queue sets the real concurrency
+    summary = await run_concurrent(file_ids, len(file_ids) or 1, process)
+    summary["chunks"] = chunks
+    summary["chunks_per_s"] = round(chunks["added"] / summary["wall_seconds"], 3) if summary["wall_seconds"] else None
+    summary["job_errors"] = sorted(set(job_errors))[:5]
+    return summary
+
+
+async def bench_query(client, base_url: str, project_id: str, questions: list,
+                      concurrency: int, search_mode: str, top_k: int):
+
+    async def query(question):
+        response = await client.post(f"{base_url}/api/v1/data/query/{project_id}", json={
+            "question": question, "top_k": top_k, "search_mode": search_mode,
+        })
+        return response.status_code == 200 and bool(response.json().get("answer"))
+
+    return await run_concurrent(questions, concurrency, query)
+
+
+def start_process(command: list, env: dict, log_path: str):
+    log_file = open(log_path, "w")
+    return subprocess.Popen(command, cwd=SRC_DIR, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+
+
+async def run_benchmark(args, work_dir: str, run_id: str):
+    fake_ports = [free_port() for _ in range(args.openai_replicas)]
+    app_port = free_port()
+    chroma_port = free_port()
+    vector_db_mode = get_vector_db_mode(args)
+    project_id = f"bench{run_id}"
+
+    env = dict(os.environ)
+    if args.nltk_data:
+        env["NLTK_DATA"] = os.path.abspath(args.nltk_data)
+    env.update({
+        "APP_NAME": "mini-rag-bench",
+        "APP_VERSION": "bench",
+        "FILE_ALLOWED_TYPES": json.dumps(sorted(MIME_TYPES.values())),
+        "FILE_MAX_SIZE": "200",
+        "FILE_DEFAULT_CHUNK_SIZE": "512000",
+        "GENERATION_BACKEND": "OPENAI",
+        "EMBEDDING_BACKEND": "OPENAI",
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_API_URL": f"http://127.0.0.1:{fake_ports[0]}/v1/",
+        "GENERATION_MODEL_ID": "bench-chat",
+        "EMBEDDING_MODEL_ID": "bench-embedding",
+        "EMBEDDING_MODEL_SIZE": str(args.embedding_size),
+        "INPUT_DAFAULT_MAX_CHARACTERS": "100000",
+        "GENERATION_DAFAULT_MAX_TOKENS": "256",
+        "GENERATION_DAFAULT_TEMPERATURE": "0.1",
+        "VECTOR_DB_BACKEND": args.vector_db,
+        "VECTOR_DB_MODE": vector_db_mode,
+        "VECTOR_DB_PORT": str(chroma_port),
+        "VECTOR_DB_DISTANCE_METHOD": "cosine",
+        # every store gets a run specific name so nothing leaks into the real databases
+        "VECTOR_DB_PATH": f"bench_{run_id}_vectors",
+        "LEXICAL_INDEX_PATH": f"bench_{run_id}_lexical",
+        "EMBEDDING_CACHE_PATH": f"bench_{run_id}_embedding_cache",
+        "CATALOG_PATH": f"bench_{run_id}_catalog",
+        "CHECKPOINT_PATH": f"bench_{run_id}_checkpoints",
+        "ANSWER_CACHE_ENABLED": str(args.answer_cache),
+        "PYTHONUNBUFFERED": "1",
+    })
+
+    if len(fake_ports) > 1:
+        pool = json.dumps({f"http://127.0.0.1:{port}/v1/": 1 for port in fake_ports})
+        env.update({"GENERATION_API_URLS": pool, "EMBEDDING_API_URLS": pool})
+
+    chroma = None
+    if vector_db_mode == "server":
+        # the chroma sidecar owns the vector files, every app worker is its client
+        chroma_path = os.path.join(SRC_DIR, "assets", "database", f"bench_{run_id}_vectors")
+        os.makedirs(chroma_path, exist_ok=True)
+        chroma = start_process([
+            "chroma", "run", "--path", chroma_path, "--port", str(chroma_port),
+        ], env, os.path.join(work_dir, "chroma.log"))
+        try:
+            # the app connects to it at startup
+            async with httpx.AsyncClient() as client:
+                await wait_ready(client, f"http://127.0.0.1:{chroma_port}/api/v2/heartbeat", chroma)
+        except BaseException:
+            chroma.terminate()
+            raise
+
+    fakes = [
+        start_process([
+            sys.executable, "-m", "benchmarks.fake_openai", "--port", str(fake_port),
+            "--embedding-size", str(args.embedding_size),
+            "--embedding-latency-ms", str(args.embedding_latency_ms),
+            "--first-token-latency-ms", str(args.first_token_latency_ms),
+            "--token-latency-ms", str(args.token_latency_ms),
+            "--answer-tokens", str(args.answer_tokens),
+            "--max-concurrency", str(args.openai_max_concurrency),
+        ], env, os.path.join(work_dir, f"fake_openai_{idx}.log"))
+        for idx, fake_port in enumerate(fake_ports)
+    ]
+
+    app_start = time.perf_counter()
+    server = start_process([
+        sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(app_port),
+        "--log-level", "warning", "--workers", str(args.workers),
+    ], env, os.path.join(work_dir, "app.log"))
+    processes = [process for process in [server, chroma, *fakes] if process is not None]
+
+    base_url = f"http://127.0.0.1:{app_port}"
+    limits = httpx.Limits(max_connections=256, max_keepalive_connections=256)
+    results = {}
+
+    try:
+        async with httpx.AsyncClient(timeout=600, limits=limits) as client:
+            for fake_port, fake in zip(fake_ports, fakes):
+                await wait_ready(client, f"http://127.0.0.1:{fake_port}/v1/models", fake)
+            await wait_ready(client, f"{base_url}/api/v1/", server)
+            results["startup_seconds"] = round(time.perf_counter() - app_start, 3)
+
+            paths = generate_corpus(
+                os.path.join(work_dir, "corpus"),
+                pdf_files=args.pdf_files, pdf_pages=args.pdf_pages,
+                xlsx_files=args.xlsx_files, xlsx_rows=args.xlsx_rows, seed=args.seed
+            )
+
+            concurrency_levels = [int(level) for level in args.concurrency.split(",") if level]
+            results["upload"], file_ids = await bench_upload(
+                client, base_url, project_id, paths, max(concurrency_levels)
+            )
+            results["process"] = await bench_process(client, base_url, project_id, file_ids, args)
+
+            # query numbers from a half ingested corpus are not comparable to anything
+            errors = ingestion_errors(results)
+            if errors:
+                raise BenchmarkError(f"ingestion failed: {'; '.join(errors)}")
+
+            # memory per collection, and recall@k when the store is quantized
+            stats = await client.get(f"{base_url}/api/v1/data/collections/{project_id}/stats",
+                                     params={"recall_k": args.top_k})
+            if stats.status_code == 200:
+                results["collections"] = stats.json()["collections"]
+
+            questions = generate_questions(args.queries, seed=args.seed + 1)
+            results["query"] = {}
+            for search_mode in [mode for mode in args.search_modes.split(",") if mode]:
+                results["query"][search_mode] = {}
+                for concurrency in concurrency_levels:
+                    results["query"][search_mode][f"c{concurrency}"] = await bench_query(
+                        client, base_url, project_id, questions, concurrency, search_mode, args.top_k
+                    )
+
+            metrics = await client.get(f"{base_url}/metrics")
+            if metrics.status_code == 200:
+                results["app_metrics"] = metrics.text
+    finally:
+        for process in processes:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    return results
+
+
+def cleanup(run_id: str):
+    assets_dir = os.path.join(SRC_DIR, "assets")
+    shutil.rmtree(os.path.join(assets_dir, "files", f"bench{run_id}"), ignore_errors=True)
+
+    database_dir = os.path.join(assets_dir, "database")
+    if os.path.isdir(database_dir):
+        for name in os.listdir(database_dir):
+            if name.startswith(f"bench_{run_id}_"):
+                shutil.rmtree(os.path.join(database_dir, name), ignore_errors=True)
+
+
+def main():
+    args = parse_args()
+    run_id = uuid.uuid4().hex[:8]
+    work_dir = tempfile.mkdtemp(prefix="mini-rag-bench-")
+
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+    try:
+        check_nltk_data(args)
+        results = asyncio.run(run_benchmark(args, work_dir, run_id))
+    except BenchmarkError as e:
+        sys.exit(f"benchmark aborted, no results written: {e}")
+    finally:
+        if not args.keep:
+            cleanup(run_id)
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "started_at": started_at,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "params": vars(args),
+        },
+        "results": results,
+    }
+
+    output = args.output or os.path.join(
+        SRC_DIR, "benchmarks", "results", f"{time.strftime('%Y%m%d-%H%M%S')}_{commit}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"startup {results.get('startup_seconds')}s")
+    for phase in ["upload", "process"]:
+        print(phase, {key: value for key, value in results.get(phase, {}).items() if not isinstance(value, (dict, list))})
+    for search_mode, levels in results.get("query", {}).items():
+        for level, summary in levels.items():
+            print(f"query {search_mode} {level}", summary)
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,9 @@ from .BaseController import BaseController
 from .ProjectController import ProjectController
 from fastapi import UploadFile
 from models import ResponseSignal
+import contextlib
+import aiofiles
+import hashlib
 import re
 import os
 
@@ -16,33 +19,64 @@ class DataController(BaseController):
         if file.content_type not in self.app_settings.FILE_ALLOWED_TYPES:
             return False, ResponseSignal.FILE_TYPE_NOT_SUPPORTED.value
 
-        if file.size > self.app_settings.FILE_MAX_SIZE * self.size_scale:
+        # the declared size is only a hint, write_uploaded_file enforces the real limit
+        if file.size is not None and file.size > self.app_settings.FILE_MAX_SIZE * self.size_scale:
             return False, ResponseSignal.FILE_SIZE_EXCEEDED.value
 
         return True, ResponseSignal.FILE_VALIDATED_SUCCESS.value
 
-    def generate_unique_filepath(self, orig_file_name: str, project_id: str):
+    async def write_uploaded_file(self, file: UploadFile, project_id: str, catalog):
 
-        random_key = self.generate_random_string()
-        project_path = ProjectController().get_project_path(project_id=project_id)
+        catalog.add_project(project_id)
+        project_path = ProjectController().create_project_path(project_id=project_id)
+        max_size = self.app_settings.FILE_MAX_SIZE * self.size_scale
 
-        cleaned_file_name = self.get_clean_file_name(
-            orig_file_name=orig_file_name
-        )
-
-        new_file_path = os.path.join(
+        temp_path = os.path.join(
             project_path,
-            random_key + "_" + cleaned_file_name
+            f".upload_{self.generate_random_string()}.part"
         )
 
-        while os.path.exists(new_file_path):
-            random_key = self.generate_random_string()
-            new_file_path = os.path.join(
-                project_path,
-                random_key + "_" + cleaned_file_name
-            )
+        file_hash = hashlib.sha256()
+        file_size = 0
+
+        try:
+            async with aiofiles.open(temp_path, "wb") as f:
+                while chunk := await file.read(self.app_settings.FILE_DEFAULT_CHUNK_SIZE):
+                    file_size += len(chunk)
+                    if file_size > max_size:
+                        # whatever the client declared, stop reading as soon as the limit is passed
+                        break
+
+                    file_hash.update(chunk)
+                    await f.write(chunk)
+        except Exception:
+            # the open itself may have failed, the original error is what the caller needs to see
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(temp_path)
+            raise
+
+        if file_size > max_size:
+            os.remove(temp_path)
+            return False, ResponseSignal.FILE_SIZE_EXCEEDED.value, None
+
+        file_hash = file_hash.hexdigest()
+
+        # an indexed lookup in the catalog instead of globbing the project directory
+        existing_file_id = catalog.find_file_by_hash(project_id=project_id, file_hash=file_hash)
+        if existing_file_id is not None:
+            os.remove(temp_path)
+            return True, ResponseSignal.FILE_ALREADY_EXISTS.value, existing_file_id
+
+        # files are stored content-addressed, the first 32 hex chars of the sha256 prefix the name
+        file_id = file_hash[:32] + "_" + self.get_clean_file_name(orig_file_name=file.filename)
+        os.replace(temp_path, os.path.join(project_path, file_id))
+
+        catalog.add_file(
+            project_id=project_id, file_id=file_id, file_name=file.filename,
+            file_hash=file_hash, file_size=file_size
+        )
 
-        return new_file_path, random_key + "_" + cleaned_file_name
+        return True, ResponseSignal.FILE_UPLOAD_SUCCESS.value, file_id
 
     def get_clean_file_name(self, orig_file_name: str):
 
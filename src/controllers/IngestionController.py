@@ -0,0 +1,486 @@
+from .BaseController import BaseController
+from .ProcessController import ProcessController
+from .ProjectController import ProjectController
+from models import ResponseSignal, JobStageEnum, FileStatusEnum
+from helpers.metrics import CHUNKS, observe_stage
+from stores.catalog import ChunkSpool
+from queue import Full, Empty
+import multiprocessing
+import threading
+import hashlib
+import asyncio
+
+
+def send_chunks(channel, stop_event, item):
+    # the job may have been given up on, never block forever on a channel nobody reads
+    while not stop_event.is_set():
+        try:
+            channel.put(item, timeout=0.5)
+            return True
+        except Full:
+            continue
+    return False
+
+
+def stream_file_chunks(project_id: str, file_id: str, chunk_size: int, overlap_size: int,
+                       channel, stop_event, batch_size: int, start_part: int = 0, start_index: int = 0):
+    # runs inside the parsing process pool, chunks go back in batches through the bounded channel
+    # a resumed run starts at the first part it has not spooled yet, numbering continues from there
+    process_controller = ProcessController(project_id=project_id)
+
+    batch = []
+    chunk_count = start_index
+    try:
+        file_chunks = process_controller.get_file_chunks(
+            file_id=file_id,
+            chunk_size=chunk_size,
+            overlap_size=overlap_size,
+            start_part=start_part
+        )
+
+        for chunk in file_chunks:
+            batch.append({"chunk_index": chunk_count, **chunk})
+            chunk_count += 1
+
+            if len(batch) >= batch_size:
+                if not send_chunks(channel, stop_event, batch):
+                    break
+                batch = []
+
+        if batch:
+            send_chunks(channel, stop_event, batch)
+    finally:
+        # the end marker goes out on errors too, the exception itself comes back with the future
+        send_chunks(channel, stop_event, None)
+
+    return {"chunk_count": chunk_count, "timings": process_controller.timings}
+
+
+chunk_channel_manager = None
+chunk_channel_lock = threading.Lock()
+
+def get_chunk_channel_manager():
+    # started with the first job, a worker that only serves queries never pays for the extra process
+    global chunk_channel_manager
+    with chunk_channel_lock:
+        if chunk_channel_manager is None:
+            chunk_channel_manager = multiprocessing.get_context("spawn").Manager()
+    return chunk_channel_manager
+
+
+class IngestionController(BaseController):
+
+    def __init__(self, project_id: str):
+        super().__init__()
+
+        self.project_id = project_id
+        self.batch_size = self.app_settings.JOB_INGEST_BATCH_SIZE
+        self.queue_batches = max(1, self.app_settings.JOB_INGEST_QUEUE_BATCHES)
+        self.checkpoint_enabled = self.app_settings.CHECKPOINT_ENABLED
+
+    def make_chunk_ids(self, file_id: str, file_hash: str, chunk_size: int,
+                             overlap_size: int, chunks: list, seen: dict = None):
+        # the same file parsed with the same parameters always yields the same ids
+        # seen carries the occurrence counts over from the previous batches of the file
+        seen = {} if seen is None else seen
+        chunk_ids = []
+        for chunk in chunks:
+            text_hash = hashlib.sha256(chunk["text"].encode("utf-8")).hexdigest()
+            occurrence = seen.get(text_hash, 0)
+            seen[text_hash] = occurrence + 1
+
+            key = f"{file_id}|{file_hash}|{chunk_size}|{overlap_size}|{text_hash}|{occurrence}"
+            chunk_ids.append(hashlib.sha256(key.encode("utf-8")).hexdigest()[:32])
+
+        return chunk_ids
+
+    def make_metadata(self, file_id: str, chunk: dict, ingest_key: str):
+        return {
+            # where the chunk came from, e.g. the sheet and row range of a spreadsheet chunk
+            **chunk.get("metadata", {}),
+            "file_id": file_id,
+            "chunk_index": chunk["chunk_index"],
+            "project_id": self.project_id,
+            "ingest_key": ingest_key,
+        }
+
+    def is_fully_ingested(self, existing: dict, ingest_key: str, file_record: dict = None):
+        # chunks are written while the file is still parsed, only the catalog knows a run finished
+        if not existing["ids"] or file_record is None:
+            return False
+
+        return (
+            file_record["status"] == FileStatusEnum.PROCESSED.value
+            and file_record["chunk_count"] == len(existing["ids"])
+            and all(metadata.get("ingest_key") == ingest_key for metadata in existing["metadatas"])
+        )
+
+    async def run(self, job, executor, embedding_client, vectordb_client, answer_cache=None,
+                        lexical_index=None, catalog=None):
+
+        loop = asyncio.get_running_loop()
+        file_id = job.file_id
+        chunk_size = job.params.get("chunk_size")
+        overlap_size = job.params.get("overlap_size")
+
+        job.set_stage(JobStageEnum.PARSING)
+        file_record = None
+        if catalog is not None:
+            file_record = catalog.get_file(project_id=self.project_id, file_id=file_id)
+
+        # the hash was recorded at upload, the file is only read again without a catalog
+        if file_record is not None:
+            file_hash = file_record["file_hash"]
+        else:
+            file_hash = await asyncio.to_thread(
+                ProcessController(project_id=self.project_id).get_file_hash,
+                file_id=file_id
+            )
+        ingest_key = f"{file_hash}:{chunk_size}:{overlap_size}"
+        partition_key = ProcessController(project_id=self.project_id).get_partition_key(file_id=file_id)
+        if partition_key:
+            ingest_key = f"{ingest_key}:{partition_key}"
+
+        collection_name = ProjectController().get_collection_name(
+            project_id=self.project_id, file_id=file_id
+        )
+
+        if catalog is not None:
+            catalog.mark_processing(
+                project_id=self.project_id, file_id=file_id, chunk_size=chunk_size,
+                overlap_size=overlap_size, collection_name=collection_name
+            )
+
+        # the collection is shared by every file of the project, never reset it here
+        await asyncio.to_thread(
+            vectordb_client.create_collection,
+            collection_name=collection_name,
+            embedding_size=embedding_client.embedding_size,
+            do_reset=False
+        )
+
+        # parsed chunks and batch commit markers survive a failed or killed run
+        spool = None
+        if self.checkpoint_enabled and catalog is not None:
+            spool = ChunkSpool(
+                spool_dir=self.get_database_path(db_name=self.app_settings.CHECKPOINT_PATH),
+                project_id=self.project_id, file_id=file_id, ingest_key=ingest_key
+            )
+
+        file_filter = {"file_id": file_id}
+        if job.params.get("do_reset"):
+            if spool is not None:
+                catalog.clear_checkpoint(project_id=self.project_id, file_id=file_id)
+                await asyncio.to_thread(spool.remove)
+
+            # wipe this file's vectors and rebuild them from scratch
+            await asyncio.to_thread(
+                vectordb_client.delete_by_filter,
+                collection_name=collection_name,
+                metadata_filter=file_filter
+            )
+            if lexical_index is not None:
+                await asyncio.to_thread(
+                    lexical_index.delete_by_filter,
+                    collection_name=collection_name,
+                    metadata_filter=file_filter
+                )
+
+        if spool is not None:
+            catalog.start_checkpoint(project_id=self.project_id, file_id=file_id, ingest_key=ingest_key)
+
+        existing = await asyncio.to_thread(
+            vectordb_client.get_records,
+            collection_name=collection_name,
+            metadata_filter=file_filter
+        )
+
+        lexical_missing = set()
+        if lexical_index is not None:
+            lexical_missing = set(await asyncio.to_thread(
+                lexical_index.missing_ids,
+                collection_name=collection_name,
+                record_ids=existing["ids"]
+            ))
+
+        # vectors ingested before the lexical index existed still need their postings
+        if not lexical_missing and self.is_fully_ingested(existing=existing, ingest_key=ingest_key,
+                                                          file_record=file_record):
+            # same bytes, same chunking and nothing missing: no need to even parse it
+            job.progress["chunks_total"] = len(existing["ids"])
+            job.add_progress("chunks_skipped", len(existing["ids"]))
+            CHUNKS.labels("skipped").inc(len(existing["ids"]))
+            if catalog is not None:
+                catalog.mark_processed(project_id=self.project_id, file_id=file_id,
+                                       chunk_count=len(existing["ids"]))
+            if spool is not None:
+                await asyncio.to_thread(spool.remove)
+            return {
+                "signal": ResponseSignal.PROCESSING_SUCCESS.value,
+                "collection": collection_name,
+                "added": 0, "updated": 0, "deleted": 0,
+                "skipped": len(existing["ids"]), "failed": 0,
+                "missing_chunks": [],
+            }
+
+        if answer_cache is not None:
+            answer_cache.invalidate(self.project_id)
+
+        existing_ids = set(existing["ids"])
+        existing_by_index = {
+            metadata.get("chunk_index"): record_id
+            for record_id, metadata in zip(existing["ids"], existing["metadatas"])
+        }
+
+        # chunks spooled by an earlier run are replayed, only what comes after them is parsed
+        resume = {"complete": False, "replay_count": 0, "start_part": 0}
+        if spool is not None:
+            resume = await asyncio.to_thread(spool.prepare)
+
+        replay = None
+        if resume["replay_count"]:
+            replay = spool.iter_batches(limit=resume["replay_count"])
+            job.progress["chunks_replayed"] = resume["replay_count"]
+
+        channel = stop_event = parse_future = None
+        if not resume["complete"]:
+            manager = await asyncio.to_thread(get_chunk_channel_manager)
+            channel = manager.Queue(maxsize=self.queue_batches)
+            stop_event = manager.Event()
+
+            parse_future = loop.run_in_executor(
+                executor, stream_file_chunks,
+                self.project_id, file_id, chunk_size, overlap_size,
+                channel, stop_event, self.batch_size,
+                resume["start_part"], resume["replay_count"]
+            )
+
+        # at most queue_batches embedded batches wait for the vector store
+        insert_queue = asyncio.Queue(maxsize=self.queue_batches)
+
+        seen = {}
+        new_ids = set()
+        replaced_ids = []
+        missing_chunks = []
+        counts = {"added": 0, "updated": 0, "deleted": 0, "skipped": 0, "failed": 0}
+        job.progress["chunks_parsed"] = 0
+
+        async def receive_chunks():
+            nonlocal replay
+            if replay is not None:
+                chunks = await asyncio.to_thread(next, replay, None)
+                if chunks is not None:
+                    return chunks
+                replay = None
+
+            if parse_future is None:
+                return None
+
+            while True:
+                try:
+                    chunks = await asyncio.to_thread(channel.get, True, 0.5)
+                    break
+                except Empty:
+                    if parse_future.done():
+                        # the worker died before sending its end marker
+                        parse_future.result()
+                        return None
+
+            if spool is not None:
+                if chunks is not None:
+                    await asyncio.to_thread(spool.append, chunks)
+                else:
+                    # the end marker means the whole file is spooled, from here a retry replays it
+                    # and never parses it again, even when this run dies while embedding
+                    parsed = await parse_future
+                    if parsed["chunk_count"]:
+                        await asyncio.to_thread(spool.complete, parsed["chunk_count"])
+            return chunks
+
+        async def embed_stage():
+            while (chunks := await receive_chunks()) is not None:
+                job.add_progress("chunks_parsed", len(chunks))
+                job.progress["chunks_total"] = job.progress["chunks_parsed"]
+
+                chunk_ids = self.make_chunk_ids(
+                    file_id=file_id, file_hash=file_hash, chunk_size=chunk_size,
+                    overlap_size=overlap_size, chunks=chunks, seen=seen
+                )
+                new_ids.update(chunk_ids)
+
+                pending = []
+                lexical_backfill = []
+                for chunk, chunk_id in zip(chunks, chunk_ids):
+                    if chunk_id in existing_ids:
+                        counts["skipped"] += 1
+                        job.add_progress("chunks_skipped", 1)
+                        # vectors ingested before the lexical index existed still need their postings
+                        if chunk_id in lexical_missing:
+                            lexical_backfill.append((chunk, chunk_id))
+                        continue
+                    pending.append((chunk, chunk_id))
+
+                if lexical_backfill:
+                    await asyncio.to_thread(
+                        lexical_index.upsert,
+                        collection_name=collection_name,
+                        record_ids=[chunk_id for _, chunk_id in lexical_backfill],
+                        texts=[chunk["text"] for chunk, _ in lexical_backfill],
+                        metadatas=[self.make_metadata(file_id, chunk, ingest_key)
+                                   for chunk, _ in lexical_backfill]
+                    )
+
+                rows = []
+                failed = []
+                if pending:
+                    job.set_stage(JobStageEnum.EMBEDDING)
+                    vectors = await embedding_client.aembed_many([chunk["text"] for chunk, _ in pending])
+
+                    for (chunk, chunk_id), vector in zip(pending, vectors):
+                        if vector is None:
+                            # recorded in the batch marker, the next run retries exactly these
+                            failed.append(chunk["chunk_index"])
+                            continue
+                        rows.append((chunk, chunk_id, vector))
+
+                    counts["failed"] += len(failed)
+                    job.add_progress("chunks_embedded", len(rows))
+
+                # the next batch is embedded while this one is being inserted
+                batch_range = (chunks[0]["chunk_index"], chunks[-1]["chunk_index"] + 1)
+                await insert_queue.put((batch_range, rows, failed))
+
+            await insert_queue.put(None)
+
+        async def insert_rows(rows: list):
+            record_ids = [chunk_id for _, chunk_id, _ in rows]
+            texts = [chunk["text"] for chunk, _, _ in rows]
+            metadata = [self.make_metadata(file_id, chunk, ingest_key) for chunk, _, _ in rows]
+
+            success = await asyncio.to_thread(
+                vectordb_client.upsert_many,
+                collection_name=collection_name,
+                texts=texts,
+                vectors=[vector for _, _, vector in rows],
+                metadata=metadata,
+                record_ids=record_ids
+            )
+
+            if not success:
+                raise RuntimeError(f"Failed to upsert chunks into {collection_name}")
+
+            if lexical_index is not None:
+                await asyncio.to_thread(
+                    lexical_index.upsert,
+                    collection_name=collection_name,
+                    record_ids=record_ids,
+                    texts=texts,
+                    metadatas=metadata
+                )
+
+            # the batch is searchable from here on, the rest of the file is still on its way
+            for chunk, _, _ in rows:
+                previous_id = existing_by_index.get(chunk["chunk_index"])
+                if previous_id is not None:
+                    replaced_ids.append(previous_id)
+
+            counts["added"] += len(rows)
+            job.add_progress("chunks_inserted", len(rows))
+
+        async def insert_stage():
+            while (batch := await insert_queue.get()) is not None:
+                (chunk_start, chunk_end), rows, failed = batch
+                missing_chunks.extend(failed)
+
+                if rows:
+                    await insert_rows(rows)
+
+                if spool is not None:
+                    await asyncio.to_thread(
+                        catalog.commit_batch,
+                        project_id=self.project_id, file_id=file_id, ingest_key=ingest_key,
+                        chunk_start=chunk_start, chunk_end=chunk_end, failed_chunks=failed
+                    )
+
+        stages = [asyncio.create_task(embed_stage()), asyncio.create_task(insert_stage())]
+        try:
+            done, _ = await asyncio.wait(stages, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()
+            parsed = {"chunk_count": resume["replay_count"], "timings": {}}
+            if parse_future is not None:
+                parsed = await parse_future
+        except BaseException:
+            for task in stages:
+                task.cancel()
+            if parse_future is not None:
+                # the worker stops at its next batch instead of parsing a file nobody waits for
+                stop_event.set()
+                parse_future.add_done_callback(lambda future: future.cancelled() or future.exception())
+            if spool is not None:
+                spool.close()
+            raise
+
+        # the worker process has its own registry, its timings are recorded here
+        for stage, seconds in parsed["timings"].items():
+            observe_stage(stage, seconds)
+
+        chunk_count = parsed["chunk_count"]
+        if not chunk_count:
+            raise ValueError(f"No chunks extracted from file {file_id}")
+
+        if spool is not None:
+            catalog.update_file(project_id=self.project_id, file_id=file_id, chunk_count=chunk_count)
+
+        job.progress["chunks_total"] = chunk_count
+
+        # a chunk written at the position of one that is now gone replaced it
+        counts["updated"] = sum(1 for previous_id in replaced_ids if previous_id not in new_ids)
+        counts["added"] -= counts["updated"]
+
+        # chunks that disappeared from the file, including the replaced ones
+        stale_ids = sorted(existing_ids - new_ids)
+        if stale_ids:
+            job.set_stage(JobStageEnum.INSERTING)
+            success = await asyncio.to_thread(
+                vectordb_client.delete_many,
+                collection_name=collection_name,
+                record_ids=stale_ids
+            )
+            if not success:
+                raise RuntimeError(f"Failed to delete stale chunks from {collection_name}")
+
+            if lexical_index is not None:
+                await asyncio.to_thread(
+                    lexical_index.delete,
+                    collection_name=collection_name,
+                    record_ids=stale_ids
+                )
+
+        counts["deleted"] = len(stale_ids) - counts["updated"]
+
+        if counts["added"] + counts["updated"] + counts["skipped"] == 0:
+            raise RuntimeError(f"No chunk of file {file_id} could be embedded")
+
+        for result, count in counts.items():
+            if count:
+                CHUNKS.labels(result).inc(count)
+
+        # answers cached while the collection was half written are stale too
+        if answer_cache is not None:
+            answer_cache.invalidate(self.project_id)
+
+        # chunks that failed to embed leave the collection short of chunk_count, the next run retries them
+        if catalog is not None:
+            catalog.mark_processed(project_id=self.project_id, file_id=file_id, chunk_count=chunk_count)
+
+        # the spool is kept until every chunk made it into the collection
+        if spool is not None and not missing_chunks:
+            await asyncio.to_thread(spool.remove)
+
+        return {
+            "signal": ResponseSignal.PROCESSING_SUCCESS.value,
+            "collection": collection_name,
+            **counts,
+            "missing_chunks": sorted(missing_chunks),
+        }
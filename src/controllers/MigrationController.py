@@ -0,0 +1,88 @@
+from .BaseController import BaseController
+from .ProjectController import ProjectController
+import hashlib
+import logging
+
+class MigrationController(BaseController):
+
+    # the first layout kept one chroma collection per file, named <project_id>_<file_id>
+    def __init__(self):
+        super().__init__()
+        self.project_controller = ProjectController()
+        self.logger = logging.getLogger(__name__)
+
+    def find_legacy_collections(self, vectordb_client, catalog):
+        legacy_names = {
+            f"{project_id}_{file_record['file_id']}": (project_id, file_record["file_id"])
+            for project_id in catalog.list_projects()
+            for file_record in catalog.list_files(project_id=project_id)
+        }
+
+        collection_names = [collection.name for collection in vectordb_client.list_all_collections()]
+        return [
+            (name, *legacy_names[name])
+            for name in collection_names if name in legacy_names
+        ]
+
+    def make_record_id(self, file_id: str, legacy_id: str):
+        return hashlib.sha256(f"{file_id}|legacy|{legacy_id}".encode("utf-8")).hexdigest()[:32]
+
+    def make_metadata(self, record_metadata: dict, legacy_id: str, position: int,
+                            project_id: str, file_id: str):
+        record_metadata = dict(record_metadata or {})
+
+        # the old records already hold their chunk_index, the ids were random uuids
+        # only a record without one gets a derived index, the page position is not the chunk order
+        if record_metadata.get("chunk_index") is None:
+            record_metadata["chunk_index"] = int(legacy_id) if legacy_id.isdigit() else position
+
+        return {**record_metadata, "file_id": file_id, "project_id": project_id}
+
+    def migrate_collection(self, vectordb_client, legacy_name: str, project_id: str, file_id: str,
+                                 batch_size: int = 500):
+        collection_name = self.project_controller.get_collection_name(project_id=project_id, file_id=file_id)
+
+        offset = 0
+        while True:
+            records = vectordb_client.get_batch(collection_name=legacy_name, offset=offset, limit=batch_size)
+            if not records["ids"]:
+                break
+
+            if offset == 0:
+                vectordb_client.create_collection(
+                    collection_name=collection_name,
+                    embedding_size=len(records["embeddings"][0]),
+                    do_reset=False
+                )
+
+            # the vectors are kept and nothing is embedded again
+            metadata = [
+                self.make_metadata(record_metadata, legacy_id, offset + idx, project_id, file_id)
+                for idx, (legacy_id, record_metadata) in enumerate(zip(records["ids"], records["metadatas"]))
+            ]
+            is_upserted = vectordb_client.upsert_many(
+                collection_name=collection_name,
+                texts=records["documents"],
+                vectors=[list(vector) for vector in records["embeddings"]],
+                metadata=metadata,
+                record_ids=[self.make_record_id(file_id, legacy_id) for legacy_id in records["ids"]]
+            )
+            if not is_upserted:
+                # the legacy collection stays, the next startup tries again
+                self.logger.error(f"Migration of collection {legacy_name} failed at record {offset}")
+                return False
+
+            offset += len(records["ids"])
+
+        vectordb_client.delete_collection(collection_name=legacy_name)
+        self.logger.info(f"Migrated {offset} records of collection {legacy_name} into {collection_name}")
+        return True
+
+    def migrate_legacy_collections(self, vectordb_client, catalog):
+        legacy_collections = self.find_legacy_collections(vectordb_client=vectordb_client, catalog=catalog)
+
+        return sum(
+            self.migrate_collection(vectordb_client=vectordb_client, legacy_name=legacy_name,
+                                    project_id=project_id, file_id=file_id)
+            for legacy_name, project_id, file_id in legacy_collections
+        )
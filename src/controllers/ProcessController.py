@@ -1,12 +1,74 @@
 from .BaseController import BaseController
 from .ProjectController import ProjectController
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from itertools import islice
+from io import BytesIO
+import multiprocessing
+import hashlib
 import os
-from unstructured.partition.pdf import partition_pdf
-from unstructured.partition.xlsx import partition_xlsx
-from unstructured.chunking.title import chunk_by_title
-from unstructured.documents.elements import ElementMetadata
 from models import ProcessingEnum
-from unstructured.documents.elements import Table
+from helpers.metrics import StageTimer
+import importlib
+
+
+PDF_PARTITION_OPTIONS = {
+    "strategy": "fast",
+    "hi_res_model_name": "yolox",
+    "infer_table_structure": True,
+    "extract_image_block_types": ["Image"],
+    "extract_image_block_to_payload": True,
+}
+
+# unstructured pulls in nltk, scipy and pandas, seconds of import time a query only worker never needs
+PARSER_MODULES = [
+    "pypdf",
+    "unstructured.partition.pdf",
+    "unstructured.partition.xlsx",
+    "unstructured.chunking.title",
+    "openpyxl",
+]
+
+
+def load_parsers():
+    for module_name in PARSER_MODULES:
+        importlib.import_module(module_name)
+
+
+def partition_pdf_range(file_path: str, start_page: int, end_page: int):
+    # partition pages [start_page, end_page) and give the elements their real page numbers
+    from unstructured.partition.pdf import partition_pdf
+    from pypdf import PdfReader, PdfWriter
+
+    reader = PdfReader(file_path)
+    writer = PdfWriter()
+    for page_idx in range(start_page, end_page):
+        writer.add_page(reader.pages[page_idx])
+
+    buffer = BytesIO()
+    writer.write(buffer)
+    buffer.seek(0)
+
+    elements = partition_pdf(file=buffer,
+                             metadata_filename=os.path.basename(file_path),
+                             **PDF_PARTITION_OPTIONS)
+
+    for element in elements:
+        if element.metadata.page_number is not None:
+            element.metadata.page_number += start_page
+
+    return elements
+
+
+pdf_partition_pool = None
+
+def get_pdf_partition_pool(workers: int):
+    # kept alive across files, spawned workers pay the parser import cost only once
+    global pdf_partition_pool
+    if pdf_partition_pool is None:
+        pdf_partition_pool = ProcessPoolExecutor(max_workers=workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+    return pdf_partition_pool
 
 
 class ProcessController(BaseController):
@@ -16,38 +78,119 @@ class ProcessController(BaseController):
 
         self.project_id = project_id
         self.project_path = ProjectController().get_project_path(project_id=project_id)
+        # filled in the parsing worker process and sent back with the chunks
+        self.timings = {}
 
 
     def get_file_extension(self, file_id: str):
         return os.path.splitext(file_id)[-1]
     
 
-    def get_file_content(self, file_id: str):
-
-        file_ext = self.get_file_extension(file_id=file_id)
-        file_path = os.path.join(
+    def get_file_path(self, file_id: str):
+        return os.path.join(
             self.project_path,
             file_id
         )
 
+    def get_file_hash(self, file_id: str):
+        file_hash = hashlib.sha256()
+        with open(self.get_file_path(file_id=file_id), "rb") as f:
+            while block := f.read(self.app_settings.FILE_DEFAULT_CHUNK_SIZE):
+                file_hash.update(block)
+        return file_hash.hexdigest()
+
+    def get_file_content(self, file_id: str):
+
+        file_ext = self.get_file_extension(file_id=file_id)
+        file_path = self.get_file_path(file_id=file_id)
+
         if file_ext == ProcessingEnum.PDF.value:
-            return partition_pdf(filename=file_path,
-                                 strategy="fast",
-                                 hi_res_model_name="yolox",
-                                 infer_table_structure=True,
-                                 extract_image_block_types=["Image"],
-                                 extract_image_block_to_payload=True,   
-)
+            return [
+                element
+                for elements in self.iter_pdf_partitions(file_path=file_path)
+                for element in elements
+            ]
 
         if file_ext == ProcessingEnum.EXCEL.value:
-            return partition_xlsx(filename=file_path,
-                                  include_metadata=True,
-                                  include_header=True,
-                                  infer_table_structure=True
-                                  )
+            from unstructured.partition.xlsx import partition_xlsx
+
+            with StageTimer("partition_xlsx", self.timings):
+                return partition_xlsx(filename=file_path,
+                                      include_metadata=True,
+                                      include_header=True,
+                                      infer_table_structure=True
+                                      )
         
         return None
 
+    def get_pdf_page_ranges(self, file_path: str):
+        from pypdf import PdfReader
+
+        page_count = len(PdfReader(file_path).pages)
+        pages_per_task = max(1, self.app_settings.PDF_PAGES_PER_TASK)
+
+        return [
+            (start, min(start + pages_per_task, page_count))
+            for start in range(0, page_count, pages_per_task)
+        ]
+
+    def is_pdf_windowed(self, file_id: str):
+        # every page window is chunked on its own, a section crossing a window boundary is cut there
+        # so the chunks and their ids differ from a whole file run, this is why windows are opt in
+        return (
+            self.app_settings.PDF_PARALLEL_PARTITION
+            and self.get_file_extension(file_id=file_id) == ProcessingEnum.PDF.value
+        )
+
+    def get_partition_key(self, file_id: str):
+        # part of the ingest key, chunks parsed in windows are never mixed with whole file chunks
+        if self.is_pdf_windowed(file_id=file_id):
+            return f"pages{max(1, self.app_settings.PDF_PAGES_PER_TASK)}"
+        return None
+
+    def iter_pdf_partitions(self, file_path: str, start_part: int = 0):
+        # yields the elements of one page window at a time, in page order
+        # start_part skips the windows a resumed run already has
+        from unstructured.partition.pdf import partition_pdf
+
+        # without parallel partitioning the whole file is one part, chunked like a single document
+        if not self.app_settings.PDF_PARALLEL_PARTITION:
+            with StageTimer("partition_pdf", self.timings):
+                elements = partition_pdf(filename=file_path, **PDF_PARTITION_OPTIONS)
+            yield elements
+            return
+
+        page_ranges = self.get_pdf_page_ranges(file_path=file_path)
+
+        # a single window is partitioned straight from the file
+        if len(page_ranges) <= 1 and start_part == 0:
+            with StageTimer("partition_pdf", self.timings):
+                elements = partition_pdf(filename=file_path, **PDF_PARTITION_OPTIONS)
+            yield elements
+            return
+
+        page_ranges = page_ranges[start_part:]
+
+        executor = get_pdf_partition_pool(workers=self.app_settings.PDF_PARTITION_WORKERS)
+        window = max(1, self.app_settings.PDF_PARTITION_WORKERS)
+
+        # only a window of ranges is in flight, memory follows the window and not the page count
+        ranges = iter(page_ranges)
+        pending = deque(
+            executor.submit(partition_pdf_range, file_path, start, end)
+            for start, end in islice(ranges, window)
+        )
+
+        while pending:
+            with StageTimer("partition_pdf", self.timings):
+                elements = pending.popleft().result()
+
+            next_range = next(ranges, None)
+            if next_range is not None:
+                pending.append(executor.submit(partition_pdf_range, file_path, *next_range))
+
+            yield elements
+
    # def get_file_content(self, file_id: str):
 
     #    loader = self.get_file_loader(file_id=file_id)
@@ -55,21 +198,112 @@ class ProcessController(BaseController):
 
     def process_file_content(self, file_content: list, file_id: str,
                             chunk_size: int=500, overlap_size: int=50):
-        print("before title chunk ", set([str(type(el)) for el in file_content]))
-        chunks = chunk_by_title(file_content, 
-                                max_characters=chunk_size, 
-                                overlap=overlap_size,
-                                combine_text_under_n_chars=100,       
-                                new_after_n_chars=1500,
-                                )
-        for i, chunk in enumerate(chunks[50:100]):  
-            print("\n=== Chunk", i, "===")
-            print("Type:", type(chunk))
-            print("Text:", chunk.text[:100], "...")  
-            print("Metadata:", chunk.metadata)
+        from unstructured.chunking.title import chunk_by_title
+
+        with StageTimer("chunk_by_title", self.timings):
+            chunks = chunk_by_title(file_content, 
+                                    max_characters=chunk_size, 
+                                    overlap=overlap_size,
+                                    combine_text_under_n_chars=100,       
+                                    new_after_n_chars=1500,
+                                    )
 
         return chunks
 
+    def get_file_chunks(self, file_id: str, chunk_size: int=500, overlap_size: int=50,
+                              start_part: int = 0):
+        # yields {"text", "metadata", "part"} dicts, spreadsheets never go through unstructured
+        # a part is a unit the parsing can restart from, only pdf page windows are more than one part
+        file_ext = self.get_file_extension(file_id=file_id)
+
+        if file_ext == ProcessingEnum.EXCEL.value and self.app_settings.XLSX_STREAMING_ENABLED:
+            with StageTimer("stream_xlsx", self.timings):
+                for chunk in self.stream_xlsx_chunks(
+                    file_path=self.get_file_path(file_id=file_id),
+                    chunk_size=chunk_size
+                ):
+                    yield {**chunk, "part": 0}
+            return
+
+        if file_ext == ProcessingEnum.PDF.value:
+            # each page window is chunked as soon as it is partitioned
+            partitions = self.iter_pdf_partitions(
+                file_path=self.get_file_path(file_id=file_id),
+                start_part=start_part
+            )
+        else:
+            file_content = self.get_file_content(file_id=file_id)
+            partitions = [file_content] if file_content else []
+
+        for part, elements in enumerate(partitions, start=start_part):
+            file_chunks = self.process_file_content(
+                file_content=elements,
+                file_id=file_id,
+                chunk_size=chunk_size,
+                overlap_size=overlap_size
+            )
+
+            for chunk in file_chunks or []:
+                if hasattr(chunk, "text") and chunk.text.strip():
+                    yield {"text": chunk.text.strip(), "metadata": {}, "part": part}
+
+    def format_xlsx_row(self, values: tuple):
+        cells = ["" if value is None else str(value).strip() for value in values]
+        while cells and not cells[-1]:
+            cells.pop()
+
+        return " | ".join(cells)
+
+    def make_xlsx_chunk(self, sheet_name: str, header: str, lines: list, row_start: int, row_end: int):
+        return {
+            "text": "\n".join([header] + lines),
+            "metadata": {"sheet": sheet_name, "row_start": row_start, "row_end": row_end},
+        }
+
+    def stream_xlsx_chunks(self, file_path: str, chunk_size: int=500):
+        from openpyxl import load_workbook
+
+        # read only mode streams the rows out of the zip, memory follows the chunk size and not the workbook
+        workbook = load_workbook(filename=file_path, read_only=True, data_only=True)
+
+        try:
+            for sheet in workbook.worksheets:
+                # exporters often write a wrong dimension, without the reset rows past it would be dropped
+                sheet.reset_dimensions()
+
+                header = None
+                header_row = None
+                lines = []
+                size = 0
+                row_start = row_end = None
+
+                for row_number, values in enumerate(sheet.iter_rows(values_only=True), start=1):
+                    line = self.format_xlsx_row(values)
+                    if not line:
+                        continue
+
+                    # the first non empty row is the header, every chunk of the sheet repeats it
+                    if header is None:
+                        header = f"Sheet: {sheet.title}\n{line}"
+                        header_row = row_number
+                        continue
+
+                    if lines and size + len(line) + 1 > chunk_size:
+                        yield self.make_xlsx_chunk(sheet.title, header, lines, row_start, row_end)
+                        lines = []
+
+                    if not lines:
+                        size = len(header)
+                        row_start = row_number
 
+                    lines.append(line)
+                    size += len(line) + 1
+                    row_end = row_number
 
-    
\ No newline at end of file
+                if lines:
+                    yield self.make_xlsx_chunk(sheet.title, header, lines, row_start, row_end)
+                elif header is not None:
+                    # a single row sheet is all header, it still holds data
+                    yield self.make_xlsx_chunk(sheet.title, header, [], header_row, header_row)
+        finally:
+            workbook.close()
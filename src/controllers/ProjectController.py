@@ -1,20 +1,41 @@
 from .BaseController import BaseController
+import hashlib
 import os
 
+# directories this process already created, uploads skip the makedirs call after the first one
+created_project_dirs = set()
+
 class ProjectController(BaseController):
     
     def __init__(self):
         super().__init__()
 
     def get_project_path(self, project_id: str):
-        project_dir = os.path.join(
+        return os.path.join(
             self.files_dir,
             project_id
         )
 
-        if not os.path.exists(project_dir):
-            os.makedirs(project_dir)
+    def create_project_path(self, project_id: str):
+        project_dir = self.get_project_path(project_id=project_id)
+
+        if project_dir not in created_project_dirs:
+            os.makedirs(project_dir, exist_ok=True)
+            created_project_dirs.add(project_dir)
 
         return project_dir
 
-    
\ No newline at end of file
+    def get_collection_names(self, project_id: str):
+        # one collection per project, or a fixed set of shards when configured
+        shards = self.app_settings.VECTOR_DB_PROJECT_SHARDS
+        if shards <= 1:
+            return [f"project_{project_id}"]
+
+        return [f"project_{project_id}_shard{idx}" for idx in range(shards)]
+
+    def get_collection_name(self, project_id: str, file_id: str):
+        collection_names = self.get_collection_names(project_id=project_id)
+
+        # stable across processes, unlike hash()
+        shard = int(hashlib.md5(file_id.encode("utf-8")).hexdigest(), 16) % len(collection_names)
+        return collection_names[shard]
@@ -0,0 +1,374 @@
+from .BaseController import BaseController
+from .ProjectController import ProjectController
+from stores.llm.templates.prompt_template import PromptTemplate
+from stores.retrieval import RankFusion, MMRReranker, ContextBuilder
+from helpers.metrics import StageTimer
+import logging
+import asyncio
+import anyio
+import json
+
+# chunk metadata pointing back into the original file
+SOURCE_LOCATION_KEYS = ["sheet", "row_start", "row_end"]
+
+
+class QueryController(BaseController):
+
+    def __init__(self, project_id: str):
+        super().__init__()
+
+        self.project_id = project_id
+        self.project_controller = ProjectController()
+        self.prompt_template = PromptTemplate()
+        self.logger = logging.getLogger(__name__)
+
+    def get_collection_names(self, file_ids: list = None):
+        if not file_ids:
+            return self.project_controller.get_collection_names(project_id=self.project_id)
+
+        # only the shards that can hold the requested files
+        return sorted(set(
+            self.project_controller.get_collection_name(project_id=self.project_id, file_id=file_id)
+            for file_id in file_ids
+        ))
+
+    def build_metadata_filter(self, file_ids: list = None):
+        if not file_ids:
+            return None
+
+        if len(file_ids) == 1:
+            return {"file_id": file_ids[0]}
+
+        return {"file_id": {"$in": list(file_ids)}}
+
+    async def search(self, vectordb_client, question_vector: list, top_k: int, file_ids: list = None,
+                           include_vectors: bool = False):
+        metadata_filter = self.build_metadata_filter(file_ids=file_ids)
+
+        results_list = await asyncio.gather(*[
+            asyncio.to_thread(
+                vectordb_client.search_by_vector,
+                collection_name=collection_name,
+                vector=question_vector,
+                limit=top_k,
+                metadata_filter=metadata_filter,
+                include_vectors=include_vectors
+            )
+            for collection_name in self.get_collection_names(file_ids=file_ids)
+        ])
+
+        return self.merge_search_results(
+            [results for results in results_list if results and results['ids'][0]],
+            limit=top_k
+        )
+
+    def lexical_search(self, lexical_index, question: str, top_k: int, file_ids: list = None):
+        with StageTimer("lexical_search"):
+            return self.run_lexical_search(lexical_index, question, top_k, file_ids)
+
+    def run_lexical_search(self, lexical_index, question: str, top_k: int, file_ids: list = None):
+        metadata_filter = self.build_metadata_filter(file_ids=file_ids)
+
+        results_list = [
+            lexical_index.search(
+                collection_name=collection_name,
+                query=question,
+                limit=top_k,
+                metadata_filter=metadata_filter
+            )
+            for collection_name in self.get_collection_names(file_ids=file_ids)
+        ]
+
+        return self.merge_search_results(
+            [results for results in results_list if results and results['ids'][0]],
+            limit=top_k
+        )
+
+    async def hybrid_search(self, embedding_client, vectordb_client, lexical_index,
+                                  question: str, top_k: int, file_ids: list = None):
+        # each side fetches deeper than top_k so the fusion has something to reorder
+        fetch_k = top_k * 2
+
+        async def vector_search():
+            question_vector = await embedding_client.aembed_text(question)
+            if question_vector is None:
+                return None, None
+
+            results = await self.search(
+                vectordb_client=vectordb_client,
+                question_vector=question_vector,
+                top_k=fetch_k,
+                file_ids=file_ids
+            )
+            return question_vector, results
+
+        # the lexical side runs while the question is being embedded
+        (question_vector, vector_results), lexical_results = await asyncio.gather(
+            vector_search(),
+            asyncio.to_thread(self.lexical_search, lexical_index, question, fetch_k, file_ids)
+        )
+
+        return question_vector, RankFusion().fuse([vector_results, lexical_results], limit=top_k)
+
+    def split_results(self, results: dict, n_queries: int):
+        # a multi-query result nests one list per query, give each query its own result
+        if not results:
+            return [None] * n_queries
+
+        keys = [
+            key for key in ["ids", "documents", "metadatas", "distances", "embeddings"]
+            if results.get(key) is not None
+        ]
+        return [
+            {key: [results[key][idx]] for key in keys}
+            for idx in range(n_queries)
+        ]
+
+    async def search_many(self, vectordb_client, question_vectors: list, top_k: int,
+                                file_ids: list = None, include_vectors: bool = False):
+        metadata_filter = self.build_metadata_filter(file_ids=file_ids)
+
+        # one multi-query call per shard answers every question of the group
+        results_list = await asyncio.gather(*[
+            asyncio.to_thread(
+                vectordb_client.search_by_vectors,
+                collection_name=collection_name,
+                vectors=question_vectors,
+                limit=top_k,
+                metadata_filter=metadata_filter,
+                include_vectors=include_vectors
+            )
+            for collection_name in self.get_collection_names(file_ids=file_ids)
+        ])
+
+        per_collection = [
+            self.split_results(results, len(question_vectors))
+            for results in results_list
+        ]
+
+        return [
+            self.merge_search_results(
+                [results[idx] for results in per_collection if results[idx] and results[idx]['ids'][0]],
+                limit=top_k
+            )
+            for idx in range(len(question_vectors))
+        ]
+
+    def merge_search_results(self, results_list: list, limit: int):
+        if not results_list:
+            return None
+
+        if len(results_list) == 1:
+            return results_list[0]
+
+        with_vectors = all(results.get('embeddings') is not None for results in results_list)
+
+        rows = []
+        for results in results_list:
+            rows.extend(zip(
+                results['distances'][0], results['ids'][0],
+                results['documents'][0], results['metadatas'][0],
+                results['embeddings'][0] if with_vectors else [None] * len(results['ids'][0])
+            ))
+
+        rows = sorted(rows, key=lambda row: row[0])[:limit]
+
+        merged = {
+            "ids": [[row[1] for row in rows]],
+            "documents": [[row[2] for row in rows]],
+            "metadatas": [[row[3] for row in rows]],
+            "distances": [[row[0] for row in rows]],
+        }
+        if with_vectors:
+            merged["embeddings"] = [[row[4] for row in rows]]
+
+        return merged
+
+    def rerank(self, search_results: dict, top_k: int, mmr_lambda: float, question_vector: list = None):
+        with StageTimer("rerank"):
+            return MMRReranker(mmr_lambda=mmr_lambda).rerank(
+                search_results=search_results,
+                top_k=top_k,
+                query_vector=question_vector
+            )
+
+    def build_sources(self, search_results: dict):
+        return [
+            {
+             "text": doc,
+             "file_id": metadata['file_id'],
+             "chunk_index": metadata['chunk_index'],
+             **{key: metadata[key] for key in SOURCE_LOCATION_KEYS if key in metadata}
+            }
+            for doc, metadata in zip(search_results['documents'][0], search_results['metadatas'][0])
+        ]
+
+    def build_prompt(self, question: str, search_results: dict):
+        # Prepare context (top-k chunks) for LLM within the prompt token budget
+        context_builder = ContextBuilder(
+            max_tokens=self.app_settings.CONTEXT_MAX_TOKENS,
+            model_id=self.app_settings.GENERATION_MODEL_ID
+        )
+        with StageTimer("context_build"):
+            return context_builder.build(question, search_results, self.prompt_template)
+
+    def format_ndjson(self, data: dict):
+        return json.dumps(data) + "\n"
+
+    async def answer_batch(self, embedding_client, vectordb_client, generation_client,
+                                 questions: list, top_k: int, fetch_factor: int, mmr_lambda: float,
+                                 answer_cache=None):
+
+        search_size = self.app_settings.QUERY_BATCH_SEARCH_SIZE
+        concurrency = self.app_settings.QUERY_BATCH_GENERATION_CONCURRENCY
+
+        results_queue = asyncio.Queue()
+        generation_slots = asyncio.Semaphore(concurrency)
+        # prepared prompts waiting for a slot are bounded, the producer waits for them to drain
+        pending_slots = asyncio.Semaphore(concurrency * 4)
+        tasks = set()
+
+        async def answer(idx: int, item: dict, question_vector: list, search_results: dict):
+            line = {"index": idx, "id": item.get("id"), "question": item["question"]}
+            try:
+                if not search_results:
+                    line["signal"] = "No relevant chunks found"
+                    return
+
+                sources = self.build_sources(search_results)
+                chunk_ids = search_results['ids'][0]
+                line["sources"] = sources
+
+                cached_answer = None
+                if answer_cache is not None:
+                    cached_answer = answer_cache.get(
+                        scope=self.project_id, question_vector=question_vector, chunk_ids=chunk_ids
+                    )
+
+                if cached_answer is not None:
+                    line.update({"answer": cached_answer["answer"], "cached": True, "prompt_tokens": 0})
+                    return
+
+                context = self.build_prompt(item["question"], search_results)
+                async with generation_slots:
+                    answer_text = await generation_client.agenerate_text(context["prompt"], truncate_input=False)
+
+                if not answer_text:
+                    line["signal"] = "Answer generation failed"
+                    return
+
+                if answer_cache is not None:
+                    answer_cache.put(
+                        scope=self.project_id, question_vector=question_vector, chunk_ids=chunk_ids,
+                        answer=answer_text, sources=sources
+                    )
+                line.update({"answer": answer_text, "cached": False, "prompt_tokens": context["prompt_tokens"]})
+
+            except Exception as e:
+                self.logger.error(f"Batch question {idx} failed: {e}")
+                line["signal"] = "Answer generation failed"
+            finally:
+                pending_slots.release()
+                await results_queue.put(self.format_ndjson(line))
+
+        async def produce():
+            try:
+                for start in range(0, len(questions), search_size):
+                    chunk = questions[start:start + search_size]
+
+                    # the whole chunk is embedded through the batching provider in one go
+                    vectors = await embedding_client.aembed_many([item["question"] for item in chunk])
+
+                    groups = {}
+                    for offset, (item, vector) in enumerate(zip(chunk, vectors)):
+                        if vector is None:
+                            await results_queue.put(self.format_ndjson({
+                                "index": start + offset, "id": item.get("id"),
+                                "question": item["question"], "signal": "Question embedding failed",
+                            }))
+                            continue
+                        file_ids = tuple(sorted(item.get("file_ids") or []))
+                        groups.setdefault(file_ids, []).append(offset)
+
+                    for file_ids, offsets in groups.items():
+                        results_list = await self.search_many(
+                            vectordb_client=vectordb_client,
+                            question_vectors=[vectors[offset] for offset in offsets],
+                            top_k=top_k * fetch_factor,
+                            file_ids=list(file_ids),
+                            include_vectors=True
+                        )
+
+                        for offset, search_results in zip(offsets, results_list):
+                            search_results = self.rerank(
+                                search_results=search_results, top_k=top_k,
+                                mmr_lambda=mmr_lambda, question_vector=vectors[offset]
+                            )
+
+                            await pending_slots.acquire()
+                            tasks.add(asyncio.create_task(
+                                answer(start + offset, chunk[offset], vectors[offset], search_results)
+                            ))
+
+                await asyncio.gather(*tasks)
+
+            except Exception as e:
+                self.logger.error(f"Batch query failed: {e}")
+                await results_queue.put(self.format_ndjson({"signal": "Batch query failed"}))
+            finally:
+                results_queue.put_nowait(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                line = await results_queue.get()
+                if line is None:
+                    break
+                yield line
+        finally:
+            # a client that went away stops the generation of everything left
+            producer.cancel()
+            for task in tasks:
+                task.cancel()
+
+    def format_sse(self, event: str, data: dict):
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    async def stream_answer(self, generation_client, prompt: str, sources: list,
+                                  cached_answer: dict = None, on_complete=None,
+                                  prompt_tokens: int = None):
+
+        # sources go out first so the client can render them before the first token
+        yield self.format_sse("sources", {"sources": sources})
+
+        if cached_answer is not None:
+            yield self.format_sse("token", {"text": cached_answer["answer"]})
+            yield self.format_sse("done", {"cached": True, "prompt_tokens": 0})
+            return
+
+        tokens = []
+        # the prompt is already fitted to the token budget, no character cut on top
+        token_stream = generation_client.astream_text(prompt, truncate_input=False)
+
+        try:
+            async for token in token_stream:
+                tokens.append(token)
+                yield self.format_sse("token", {"text": token})
+        except Exception as e:
+            self.logger.error(f"Error while streaming answer: {e}")
+            yield self.format_sse("error", {"signal": "Answer generation failed"})
+            return
+        finally:
+            # runs on client disconnect too, the cancelled scope must not skip the upstream close
+            with anyio.CancelScope(shield=True):
+                await token_stream.aclose()
+
+        answer = "".join(tokens)
+        if not answer:
+            yield self.format_sse("error", {"signal": "Answer generation failed"})
+            return
+
+        if on_complete is not None:
+            on_complete(answer)
+
+        yield self.format_sse("done", {"cached": False, "prompt_tokens": prompt_tokens})
@@ -1,3 +1,6 @@
 from .DataController import DataController
 from .ProjectController import ProjectController
-from .ProcessController import ProcessController
\ No newline at end of file
+from .ProcessController import ProcessController
+from .IngestionController import IngestionController
+from .QueryController import QueryController
+from .MigrationController import MigrationController
\ No newline at end of file
@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from functools import lru_cache
 
 class Settings(BaseSettings):
 
@@ -24,12 +25,85 @@ class Settings(BaseSettings):
     GENERATION_DAFAULT_MAX_TOKENS: int = None
     GENERATION_DAFAULT_TEMPERATURE: float = None
 
+    EMBEDDING_BATCH_MAX_ITEMS: int = 256
+    EMBEDDING_BATCH_MAX_TOKENS: int = 100000
+    EMBEDDING_BATCH_CONCURRENCY: int = 4
+
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "embedding_cache"
+    EMBEDDING_CACHE_MEMORY_ITEMS: int = 10000
+    EMBEDDING_CACHE_MAX_DISK_MB: int = 1024
+
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = 0.97
+    ANSWER_CACHE_TTL_SECONDS: int = 3600
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000
+
+    LLM_MAX_CONNECTIONS: int = 100
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_CONNECT_TIMEOUT: float = 5.0
+    LLM_REQUEST_TIMEOUT: float = 60.0
+
+    GENERATION_API_URLS: dict = {}
+    EMBEDDING_API_URLS: dict = {}
+    LLM_HEALTH_CHECK_INTERVAL: float = 5.0
+    LLM_EJECT_FAILURES: int = 3
+    LLM_EJECT_SECONDS: float = 30.0
+
+    PDF_PARALLEL_PARTITION: bool = False
+    PDF_PARTITION_WORKERS: int = 4
+    PDF_PAGES_PER_TASK: int = 10
+
+    XLSX_STREAMING_ENABLED: bool = True
+
+    JOB_QUEUE_MAX_SIZE: int = 100
+    JOB_WORKERS: int = 2
+    JOB_PARSE_WORKERS: int = 2
+    JOB_INGEST_BATCH_SIZE: int = 256
+    JOB_INGEST_QUEUE_BATCHES: int = 2
+    JOB_HISTORY_SIZE: int = 1000
+    JOB_POLL_INTERVAL: float = 0.5
+
     VECTOR_DB_BACKEND : str
     VECTOR_DB_PATH : str
+    VECTOR_DB_MODE: str = "single"
+    VECTOR_DB_HOST: str = "localhost"
+    VECTOR_DB_PORT: int = 8000
     VECTOR_DB_DISTANCE_METHOD: str = None
+    VECTOR_DB_PROJECT_SHARDS: int = 1
+    VECTOR_DB_COMPACTION_RATIO: float = 0.3
+    VECTOR_DB_QUANTIZATION: str = "none"
+    VECTOR_DB_PQ_SUBSPACES: int = 16
+    VECTOR_DB_RESCORE_FACTOR: int = 4
+
+    LEXICAL_INDEX_ENABLED: bool = True
+    LEXICAL_INDEX_PATH: str = "lexical"
+
+    RETRIEVAL_MMR_LAMBDA: float = 0.7
+    RETRIEVAL_FETCH_FACTOR: int = 4
+    CONTEXT_MAX_TOKENS: int = 3000
+    TOKENIZER_CACHE_DIR: str = ""
+    TOKENIZER_LOAD_TIMEOUT: float = 10.0
+
+    QUERY_BATCH_MAX_QUESTIONS: int = 10000
+    QUERY_BATCH_SEARCH_SIZE: int = 256
+    QUERY_BATCH_GENERATION_CONCURRENCY: int = 16
+
+    METRICS_ENABLED: bool = True
+
+    CATALOG_PATH: str = "catalog"
+
+    CHECKPOINT_ENABLED: bool = True
+    CHECKPOINT_PATH: str = "checkpoints"
+
+    PREWARM_PARSERS: bool = False
+    STARTUP_REPORT_ENABLED: bool = True
+    STARTUP_REPORT_IMPORTS: int = 10
 
     class Config:
         env_file = ".env"
 
+@lru_cache
 def get_settings():
+    # .env is read once per process, not on every controller instance
     return Settings()
@@ -0,0 +1,82 @@
+from importlib.machinery import SourceFileLoader, SourcelessFileLoader, ExtensionFileLoader
+import threading
+import time
+import sys
+import os
+
+
+# only these loaders are created per module, patching them cannot leak into another import
+TIMED_LOADERS = (SourceFileLoader, SourcelessFileLoader, ExtensionFileLoader)
+
+
+class ImportTimer:
+
+    # a meta path finder that times module execution, the in process version of python -X importtime
+    def __init__(self, app_dir: str):
+        self.app_dir = os.path.abspath(app_dir)
+        self.started_at = time.perf_counter()
+        self.records = {}
+        self.local = threading.local()
+
+    def install(self):
+        sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname: str, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+
+            spec = finder.find_spec(fullname, path, target)
+            if spec is None:
+                continue
+
+            if isinstance(spec.loader, TIMED_LOADERS):
+                self.wrap_loader(spec.loader, fullname, spec.origin)
+            return spec
+
+        return None
+
+    def is_app_module(self, origin: str):
+        return bool(origin) and os.path.abspath(origin).startswith(self.app_dir + os.sep)
+
+    def wrap_loader(self, loader, fullname: str, origin: str):
+        exec_module = loader.exec_module
+
+        def timed_exec_module(module):
+            stack = self.local.__dict__.setdefault("stack", [])
+            importer = stack[-1] if stack else None
+
+            stack.append(fullname)
+            start = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                stack.pop()
+                self.records[fullname] = {
+                    "seconds": time.perf_counter() - start,
+                    "importer": importer,
+                    "is_app": self.is_app_module(origin),
+                }
+
+        loader.exec_module = timed_exec_module
+
+    def slowest(self, limit: int = 10):
+        # the third party packages the app imports itself, each one counting everything it pulled in
+        entries = [
+            {"module": name, "seconds": record["seconds"], "importer": record["importer"]}
+            for name, record in self.records.items()
+            if not record["is_app"]
+            and (record["importer"] is None or self.records.get(record["importer"], {}).get("is_app"))
+        ]
+        return sorted(entries, key=lambda entry: entry["seconds"], reverse=True)[:limit]
+
+    def report(self, limit: int = 10):
+        lines = [f"startup took {time.perf_counter() - self.started_at:.3f}s, slowest imports:"]
+        for entry in self.slowest(limit=limit):
+            importer = f"  (from {entry['importer']})" if entry["importer"] else ""
+            lines.append(f"  {entry['seconds'] * 1000:8.1f} ms  {entry['module']}{importer}")
+        return "\n".join(lines)
@@ -0,0 +1,308 @@
+from bisect import bisect_left
+import threading
+import inspect
+import time
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labelnames: tuple, labelvalues: tuple, extra: dict = None):
+    pairs = list(zip(labelnames, labelvalues)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in pairs) + "}"
+
+
+class Metric:
+
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        self.lock = threading.Lock()
+
+    def labels(self, *labelvalues):
+        child = self.children.get(labelvalues)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(labelvalues, self.new_child())
+        return child
+
+    def new_child(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labelvalues, child in sorted(self.children.items()):
+            lines.extend(child.render(self.name, self.labelnames, labelvalues))
+        return lines
+
+
+class CounterChild:
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self.lock:
+            self.value += amount
+
+    def render(self, name: str, labelnames: tuple, labelvalues: tuple):
+        return [f"{name}{format_labels(labelnames, labelvalues)} {self.value}"]
+
+
+class Counter(Metric):
+
+    kind = "counter"
+
+    def new_child(self):
+        return CounterChild()
+
+
+class GaugeChild(CounterChild):
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Gauge(Metric):
+
+    kind = "gauge"
+
+    def new_child(self):
+        return GaugeChild()
+
+
+class HistogramChild:
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        # one slot per bucket plus the +Inf overflow
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        idx = bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[idx] += 1
+            self.sum += value
+
+    def render(self, name: str, labelnames: tuple, labelvalues: tuple):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{name}_bucket{format_labels(labelnames, labelvalues, {'le': le})} {cumulative}")
+        lines.append(f"{name}_sum{format_labels(labelnames, labelvalues)} {self.sum}")
+        lines.append(f"{name}_count{format_labels(labelnames, labelvalues)} {cumulative}")
+        return lines
+
+
+class Histogram(Metric):
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (),
+                       buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def new_child(self):
+        return HistogramChild(self.buckets)
+
+
+class Registry:
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric: Metric):
+        self.metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        # collectors are only called on a scrape, values that already live elsewhere cost nothing until then
+        self.collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+
+        for collector in self.collectors:
+            for name, kind, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{format_labels(tuple(labels.keys()), tuple(labels.values()))} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "rag_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")))
+HTTP_DURATION = REGISTRY.register(Histogram(
+    "rag_http_request_duration_seconds", "HTTP request duration including streamed bodies.", ("method", "route")))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge(
+    "rag_http_requests_in_flight", "HTTP requests currently being served.", ("method",)))
+
+STAGE_DURATION = REGISTRY.register(Histogram(
+    "rag_stage_duration_seconds", "Time spent per pipeline stage.", ("stage",)))
+STAGE_ERRORS = REGISTRY.register(Counter(
+    "rag_stage_errors_total", "Pipeline stage failures.", ("stage",)))
+
+PROVIDER_DURATION = REGISTRY.register(Histogram(
+    "rag_provider_call_duration_seconds", "Provider call duration.", ("provider", "method")))
+PROVIDER_ERRORS = REGISTRY.register(Counter(
+    "rag_provider_errors_total", "Provider calls that raised or returned their failure value.", ("provider", "method")))
+
+CHUNKS = REGISTRY.register(Counter(
+    "rag_chunks_total", "Ingested chunks by outcome.", ("result",)))
+TOKENS = REGISTRY.register(Counter(
+    "rag_tokens_total", "Tokens reported by the model provider.", ("kind",)))
+JOBS = REGISTRY.register(Counter(
+    "rag_jobs_total", "Finished ingestion jobs by status.", ("status",)))
+
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_DURATION.labels(stage).observe(seconds)
+
+
+class StageTimer:
+
+    # with StageTimer("partition_pdf"): ...
+    def __init__(self, stage: str, timings: dict = None):
+        self.stage = stage
+        self.timings = timings
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        if self.timings is not None:
+            # timings measured in a worker process travel back in the result instead
+            self.timings[self.stage] = self.timings.get(self.stage, 0) + elapsed
+        else:
+            observe_stage(self.stage, elapsed)
+        if exc_type is not None:
+            STAGE_ERRORS.labels(self.stage).inc()
+        return False
+
+
+class InstrumentedProvider:
+
+    def __init__(self, provider, name: str, methods: set, failure_results: dict = None):
+        self.provider = provider
+        self.name = name
+        self.methods = set(methods)
+        # the value a method returns instead of raising, e.g. False from a write, errors are exceptions otherwise
+        self.failure_results = failure_results or {}
+
+    def __getattr__(self, attr: str):
+        value = getattr(self.provider, attr)
+        if attr not in self.methods or not callable(value):
+            return value
+        return self.wrap(attr, value)
+
+    def is_failure(self, method: str, result):
+        return method in self.failure_results and result is self.failure_results[method]
+
+    def wrap(self, method: str, function):
+        duration = PROVIDER_DURATION.labels(self.name, method)
+        errors = PROVIDER_ERRORS.labels(self.name, method)
+
+        async def timed_coroutine(coroutine, start):
+            try:
+                result = await coroutine
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                duration.observe(time.perf_counter() - start)
+            if self.is_failure(method, result):
+                errors.inc()
+            return result
+
+        async def timed_stream(stream, start):
+            try:
+                async for item in stream:
+                    yield item
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                # the caller closing early still closes the upstream stream
+                await stream.aclose()
+                duration.observe(time.perf_counter() - start)
+
+        def call(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                duration.observe(time.perf_counter() - start)
+                raise
+
+            if inspect.iscoroutine(result):
+                return timed_coroutine(result, start)
+            if inspect.isasyncgen(result):
+                return timed_stream(result, start)
+
+            duration.observe(time.perf_counter() - start)
+            if self.is_failure(method, result):
+                errors.inc()
+            return result
+
+        return call
+
+
+class MetricsMiddleware:
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status = {"code": 500}
+        start = time.perf_counter()
+        in_flight = HTTP_IN_FLIGHT.labels(method)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            # the route template, not the raw path, keeps project ids out of the label values
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            HTTP_REQUESTS.labels(method, route_path, str(status["code"])).inc()
+            HTTP_DURATION.labels(method, route_path).observe(time.perf_counter() - start)
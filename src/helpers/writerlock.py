@@ -0,0 +1,33 @@
+import fcntl
+import os
+
+
+class WriterLock:
+
+    # held for the life of the process, the kernel releases it when the process dies
+    def __init__(self, path: str):
+        self.path = path
+        self.file = None
+
+    def acquire(self) -> bool:
+        # never waits, the first worker to start becomes the writer
+        file = open(self.path, "a+")
+        try:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            file.close()
+            return False
+
+        file.seek(0)
+        file.truncate()
+        file.write(f"{os.getpid()}\n")
+        file.flush()
+
+        self.file = file
+        return True
+
+    def release(self):
+        if self.file is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            self.file.close()
+            self.file = None
@@ -0,0 +1,98 @@
+from models import JobStatusEnum, JobStageEnum
+from uuid import uuid4
+import time
+
+class Job:
+
+    def __init__(self, project_id: str, file_id: str, params: dict = None):
+        self.job_id = uuid4().hex
+        self.project_id = project_id
+        self.file_id = file_id
+        self.params = params or {}
+
+        self.status = JobStatusEnum.QUEUED.value
+        self.stage = None
+        self.progress = {
+            "chunks_total": 0,
+            "chunks_embedded": 0,
+            "chunks_inserted": 0,
+        }
+        self.timings = {}
+        self.result = None
+        self.error = None
+
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.stage_started_at = None
+
+    @classmethod
+    def from_record(cls, record: dict):
+        # a job as another worker stored it in the catalog
+        job = cls(project_id=record["project_id"], file_id=record["file_id"], params=record["params"])
+        job.job_id = record["job_id"]
+        job.status = record["status"]
+        job.stage = record["stage"]
+        job.progress = record["progress"]
+        job.timings = record["timings"]
+        job.result = record["result"]
+        job.error = record["error"]
+        job.created_at = record["created_at"]
+        job.started_at = record["started_at"]
+        job.finished_at = record["finished_at"]
+        return job
+
+    def start(self):
+        self.status = JobStatusEnum.RUNNING.value
+        self.started_at = time.time()
+
+    def set_stage(self, stage: JobStageEnum):
+        now = time.time()
+        if self.stage is not None and self.stage_started_at is not None:
+            self.timings[self.stage] = round(
+                self.timings.get(self.stage, 0) + now - self.stage_started_at, 4
+            )
+
+        self.stage = stage.value
+        self.stage_started_at = now
+
+    def add_progress(self, key: str, count: int):
+        self.progress[key] = self.progress.get(key, 0) + count
+
+    def complete(self, result: dict):
+        self.set_stage(JobStageEnum.DONE)
+        self.status = JobStatusEnum.COMPLETED.value
+        self.result = result
+        self.finished_at = time.time()
+
+    def fail(self, error: str):
+        if self.stage is not None:
+            self.set_stage(JobStageEnum(self.stage))
+        self.status = JobStatusEnum.FAILED.value
+        self.error = error
+        self.finished_at = time.time()
+
+    def is_finished(self):
+        return self.status in [JobStatusEnum.COMPLETED.value, JobStatusEnum.FAILED.value]
+
+    def to_dict(self):
+        total_time = None
+        if self.started_at is not None:
+            total_time = round((self.finished_at or time.time()) - self.started_at, 4)
+
+        return {
+            "job_id": self.job_id,
+            "project_id": self.project_id,
+            "file_id": self.file_id,
+            "params": self.params,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "timings": {
+                "queued": round((self.started_at or time.time()) - self.created_at, 4),
+                "stages": self.timings,
+                "total": total_time,
+            },
+            "result": self.result,
+            "error": self.error,
+        }
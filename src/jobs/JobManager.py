@@ -0,0 +1,107 @@
+from .Job import Job
+from helpers.metrics import JOBS
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+import multiprocessing
+import asyncio
+import logging
+
+class JobManager:
+
+    def __init__(self, runner, queue_max_size: int = 100, workers: int = 2,
+                       parse_workers: int = 2, history_size: int = 1000):
+        # runner is an async callable (job, executor) -> result dict
+        self.runner = runner
+        self.queue_max_size = queue_max_size
+        self.workers = workers
+        self.parse_workers = parse_workers
+        self.history_size = history_size
+
+        self.queue = None
+        self.executor = None
+        self.worker_tasks = []
+        self.jobs = OrderedDict()
+
+        self.logger = logging.getLogger(__name__)
+
+    async def start(self):
+        self.queue = asyncio.Queue(maxsize=self.queue_max_size)
+
+        # spawn keeps the parsing workers clear of the event loop and client threads
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.parse_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+
+        self.worker_tasks = [
+            asyncio.create_task(self.worker())
+            for _ in range(self.workers)
+        ]
+
+    def prewarm(self, function):
+        # one call per parse worker spawns the whole pool, each worker pays its imports before the first job
+        if self.executor is None:
+            return
+        for _ in range(self.parse_workers):
+            self.executor.submit(function).add_done_callback(self.log_prewarm_error)
+
+    def log_prewarm_error(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            self.logger.error(f"Parse worker prewarm failed: {future.exception()}")
+
+    async def stop(self):
+        for task in self.worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self.worker_tasks, return_exceptions=True)
+        self.worker_tasks = []
+
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def submit(self, job: Job) -> bool:
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            return False
+
+        self.jobs[job.job_id] = job
+        self.prune_history()
+        return True
+
+    def get_job(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    def queue_depth(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+
+    def prune_history(self):
+        # drop the oldest finished jobs, never the ones still queued or running
+        for job_id in list(self.jobs.keys()):
+            if len(self.jobs) <= self.history_size:
+                break
+            if self.jobs[job_id].is_finished():
+                del self.jobs[job_id]
+
+    async def worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                await self.run_job(job)
+            finally:
+                self.queue.task_done()
+
+    async def run_job(self, job: Job):
+        job.start()
+
+        try:
+            result = await self.runner(job, self.executor)
+            job.complete(result)
+        except asyncio.CancelledError:
+            job.fail("cancelled")
+            raise
+        except Exception as e:
+            self.logger.error(f"Job {job.job_id} failed: {e}")
+            job.fail(str(e))
+        finally:
+            JOBS.labels(job.status).inc()
@@ -0,0 +1,72 @@
+from .Job import Job
+from .JobManager import JobManager
+from models import JobStatusEnum
+import asyncio
+
+class SharedJobManager(JobManager):
+
+    # jobs go through the catalog, so any app worker takes them and only the writer runs them
+    def __init__(self, runner, catalog, is_writer: bool, poll_interval: float = 0.5, **kwargs):
+        super().__init__(runner, **kwargs)
+        self.catalog = catalog
+        self.is_writer = is_writer
+        self.poll_interval = poll_interval
+        self.sync_task = None
+
+    async def start(self):
+        if not self.is_writer:
+            return
+
+        interrupted = self.catalog.fail_running_jobs("interrupted")
+        if interrupted:
+            self.logger.warning(f"{interrupted} jobs of a previous writer were marked as failed")
+
+        await super().start()
+        self.sync_task = asyncio.create_task(self.sync())
+
+    async def stop(self):
+        if self.sync_task is not None:
+            self.sync_task.cancel()
+            await asyncio.gather(self.sync_task, return_exceptions=True)
+            self.sync_task = None
+
+        await super().stop()
+
+    def submit(self, job: Job) -> bool:
+        return self.catalog.add_job(job, queue_max_size=self.queue_max_size)
+
+    def get_job(self, job_id: str):
+        # the writer's own jobs are fresher than their last sync to the catalog
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job
+
+        record = self.catalog.get_job(job_id)
+        return Job.from_record(record) if record is not None else None
+
+    def queue_depth(self) -> int:
+        return self.catalog.count_jobs(status=JobStatusEnum.QUEUED.value)
+
+    async def sync(self):
+        # progress of the running jobs reaches the other workers once per poll
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            # saved from the loop, the progress dicts are only ever touched by its tasks
+            for job in list(self.jobs.values()):
+                self.catalog.save_job(job)
+
+    async def worker(self):
+        while True:
+            record = await asyncio.to_thread(self.catalog.claim_job)
+            if record is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            job = Job.from_record(record)
+            self.jobs[job.job_id] = job
+            try:
+                await self.run_job(job)
+            finally:
+                self.catalog.save_job(job)
+                self.jobs.pop(job.job_id, None)
+                self.catalog.prune_jobs(history_size=self.history_size)
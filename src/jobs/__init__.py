@@ -0,0 +1,3 @@
+from .Job import Job
+from .JobManager import JobManager
+from .SharedJobManager import SharedJobManager
@@ -1,10 +1,35 @@
+from helpers.importtimer import ImportTimer
+import os
+
+# installed before anything else so the startup report sees every import below
+import_timer = ImportTimer(app_dir=os.path.dirname(os.path.abspath(__file__)))
+import_timer.install()
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from routes import base
 from routes import data
+from routes import jobs
+from routes import metrics
 from helpers.config import get_settings
+from helpers.metrics import REGISTRY, InstrumentedProvider, MetricsMiddleware
+from helpers.writerlock import WriterLock
+from controllers import IngestionController, MigrationController
+from controllers.ProcessController import load_parsers
+from jobs import JobManager, SharedJobManager
+from stores.cache import AnswerCache
+from stores.catalog import Catalog
+from stores.lexicaldb import BM25Store
+from stores.retrieval import load_encoding
+from stores.llm.LLMInterface import LLMInterface
+from stores.vectordb.VectorDBInterface import VectorDBInterface
+from controllers.BaseController import BaseController
 from stores.llm.LLMProviderFactory import LLMProviderFactory
+from stores.llm.LLMEnums import LLMRoleEnums
 from stores.vectordb.VectorDBProviderFactory import VectorDBProviderFactory
+from stores.vectordb.VectorDBEnums import VectorDBEnums, VectorDBModeEnums
+import logging
+import asyncio
 
 app = FastAPI()
 
@@ -20,32 +45,214 @@ app.add_middleware(
     allow_headers=["*"],  
 )
 
+if get_settings().METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 async def startup_span():
 
      settings = get_settings()
 
+     base_controller = BaseController()
+     catalog_path = base_controller.get_database_path(db_name=settings.CATALOG_PATH)
+     app.catalog = Catalog(
+        db_path=catalog_path,
+        files_dir=base_controller.files_dir,
+        hash_block_size=settings.FILE_DEFAULT_CHUNK_SIZE,
+     )
+     app.catalog.sync_files_dir()
+
+     # with several app workers on the same stores, the one holding the lock is the only one writing them
+     shared = settings.VECTOR_DB_MODE != VectorDBModeEnums.SINGLE.value
+     app.writer_lock = None
+     app.is_writer = True
+     if shared:
+        app.writer_lock = WriterLock(os.path.join(catalog_path, "writer.lock"))
+        app.is_writer = app.writer_lock.acquire()
+        logging.getLogger("uvicorn.error").info(
+            f"Worker {os.getpid()} serves in {settings.VECTOR_DB_MODE} mode as the "
+            f"{'writer' if app.is_writer else 'reader'}"
+        )
+
      llm_provider_factory = LLMProviderFactory(settings)
+     app.llm_provider_factory = llm_provider_factory
      vectordb_provider_factory = VectorDBProviderFactory(settings)
 
     # generation client
-     app.generation_client = llm_provider_factory.create(provider=settings.GENERATION_BACKEND)
+     app.generation_client = llm_provider_factory.create(
+        provider=settings.GENERATION_BACKEND,
+        role=LLMRoleEnums.GENERATION.value
+    )
      app.generation_client.set_generation_model(model_id = settings.GENERATION_MODEL_ID)
 
     # embedding client
-     app.embedding_client = llm_provider_factory.create(provider=settings.EMBEDDING_BACKEND)
+     app.embedding_client = llm_provider_factory.create_cached(
+        provider=settings.EMBEDDING_BACKEND,
+        role=LLMRoleEnums.EMBEDDING.value
+    )
      app.embedding_client.set_embedding_model(model_id=settings.EMBEDDING_MODEL_ID,embedding_size=settings.EMBEDDING_MODEL_SIZE)
 
      app.vectordb_client = vectordb_provider_factory.create(
-        provider=settings.VECTOR_DB_BACKEND
+        provider=settings.VECTOR_DB_BACKEND,
+        read_only=not app.is_writer
     )
      app.vectordb_client.connect()
 
+     # per file collections of the first layout are moved into their project collection once
+     if settings.VECTOR_DB_BACKEND == VectorDBEnums.CHROMA.value and app.is_writer:
+        MigrationController().migrate_legacy_collections(
+            vectordb_client=app.vectordb_client,
+            catalog=app.catalog
+        )
+
+     if settings.METRICS_ENABLED:
+        # provider calls are timed at the interface boundary, whatever the backend
+        # the llm providers return None on a failed call, the vector db writes return False
+        app.generation_client = InstrumentedProvider(
+            app.generation_client, name="generation", methods=LLMInterface.__abstractmethods__,
+            failure_results={"generate_text": None, "agenerate_text": None})
+        app.embedding_client = InstrumentedProvider(
+            app.embedding_client, name="embedding", methods=LLMInterface.__abstractmethods__,
+            failure_results={"embed_text": None, "aembed_text": None})
+        app.vectordb_client = InstrumentedProvider(
+            app.vectordb_client, name="vectordb", methods=VectorDBInterface.__abstractmethods__,
+            failure_results={method: False for method in ["insert_one", "insert_many", "upsert_many",
+                                                          "delete_many", "delete_by_filter"]})
+        REGISTRY.register_collector(collect_app_metrics)
+
+     app.answer_cache = None
+     if settings.ANSWER_CACHE_ENABLED:
+        app.answer_cache = AnswerCache(
+            similarity_threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+            ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+            max_entries_per_scope=settings.ANSWER_CACHE_MAX_ENTRIES,
+            catalog=app.catalog,
+        )
+
+     app.lexical_index = None
+     if settings.LEXICAL_INDEX_ENABLED:
+        app.lexical_index = BM25Store(
+            db_path=base_controller.get_database_path(db_name=settings.LEXICAL_INDEX_PATH),
+            read_only=not app.is_writer
+        )
+
+     job_manager_options = dict(
+        runner=run_ingestion_job,
+        queue_max_size=settings.JOB_QUEUE_MAX_SIZE,
+        workers=settings.JOB_WORKERS,
+        parse_workers=settings.JOB_PARSE_WORKERS,
+        history_size=settings.JOB_HISTORY_SIZE,
+     )
+     if shared:
+        # any worker takes a job, the writer runs it
+        app.job_manager = SharedJobManager(
+            catalog=app.catalog,
+            is_writer=app.is_writer,
+            poll_interval=settings.JOB_POLL_INTERVAL,
+            **job_manager_options
+        )
+     else:
+        app.job_manager = JobManager(**job_manager_options)
+     await app.job_manager.start()
+
+     # parsing stacks load in the parse workers, never in a worker that only serves queries
+     if settings.PREWARM_PARSERS:
+        app.job_manager.prewarm(load_parsers)
+
+     # a cold tokenizer cache means a download, it happens here and never on the first query
+     if settings.TOKENIZER_CACHE_DIR:
+        os.environ["TIKTOKEN_CACHE_DIR"] = settings.TOKENIZER_CACHE_DIR
+     try:
+        await asyncio.wait_for(
+            asyncio.to_thread(load_encoding, settings.GENERATION_MODEL_ID),
+            timeout=settings.TOKENIZER_LOAD_TIMEOUT
+        )
+     except asyncio.TimeoutError:
+        logging.getLogger("uvicorn.error").warning(
+            "Tokenizer still loading, token counts are approximated until it is ready"
+        )
+
+     import_timer.uninstall()
+     if settings.STARTUP_REPORT_ENABLED:
+        logging.getLogger("uvicorn.error").info(
+            import_timer.report(limit=settings.STARTUP_REPORT_IMPORTS)
+        )
+
+def collect_app_metrics():
+    metrics = [
+        ("rag_job_queue_depth", "gauge", "Ingestion jobs waiting in the queue.",
+         [({}, app.job_manager.queue_depth())]),
+    ]
+
+    embedding_client = app.embedding_client
+    if hasattr(embedding_client, "cache_stats"):
+        stats = embedding_client.cache_stats()
+        metrics.append(("rag_embedding_cache_requests_total", "counter", "Embedding cache lookups by result.", [
+            ({"result": "hit_memory"}, stats["hits_memory"]),
+            ({"result": "hit_disk"}, stats["hits_disk"]),
+            ({"result": "miss"}, stats["misses"]),
+        ]))
+
+    if app.answer_cache is not None:
+        stats = app.answer_cache.stats()
+        metrics.append(("rag_answer_cache_requests_total", "counter", "Answer cache lookups by result.", [
+            ({"result": "hit"}, stats["hits"]),
+            ({"result": "miss"}, stats["misses"]),
+        ]))
+
+    balancer_stats = app.llm_provider_factory.balancer_stats()
+    if balancer_stats:
+        backends = [
+            ({"role": role, "backend": backend["url"]}, backend)
+            for role, stats in balancer_stats.items()
+            for backend in stats
+        ]
+        metrics.extend([
+            ("rag_llm_backend_outstanding_requests", "gauge", "Requests in flight per LLM backend.",
+             [(labels, backend["outstanding"]) for labels, backend in backends]),
+            ("rag_llm_backend_requests_total", "counter", "Requests sent per LLM backend.",
+             [(labels, backend["requests"]) for labels, backend in backends]),
+            ("rag_llm_backend_failures_total", "counter", "Failed requests and health checks per LLM backend.",
+             [(labels, backend["failures"]) for labels, backend in backends]),
+            ("rag_llm_backend_healthy", "gauge", "Whether the LLM backend is in its pool, 0 while ejected.",
+             [(labels, int(backend["healthy"])) for labels, backend in backends]),
+        ])
+
+    return metrics
+
+async def run_ingestion_job(job, executor):
+    ingestion_controller = IngestionController(project_id=job.project_id)
+
+    try:
+        return await ingestion_controller.run(
+            job=job,
+            executor=executor,
+            embedding_client=app.embedding_client,
+            vectordb_client=app.vectordb_client,
+            answer_cache=app.answer_cache,
+            lexical_index=app.lexical_index,
+            catalog=app.catalog,
+        )
+    except BaseException as e:
+        # cancelled jobs are failed too, the file must not stay marked as processing
+        app.catalog.mark_failed(project_id=job.project_id, file_id=job.file_id, error=str(e) or "cancelled")
+        raise
+
 async def shutdown_span():
+    await app.job_manager.stop()
     app.vectordb_client.disconnect()
+    if app.lexical_index is not None:
+        app.lexical_index.close()
+    app.catalog.close()
+    await app.llm_provider_factory.close()
+    # released last, a new writer must not open the stores before they are closed here
+    if app.writer_lock is not None:
+        app.writer_lock.release()
 
 app.router.on_startup.append(startup_span)
 app.router.on_shutdown.append(shutdown_span)
 
 
 app.include_router(base.base_router)
-app.include_router(data.data_router)
\ No newline at end of file
+app.include_router(data.data_router)
+app.include_router(jobs.jobs_router)
+app.include_router(metrics.metrics_router)
\ No newline at end of file
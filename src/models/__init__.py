@@ -1,3 +1,5 @@
 
 from .enums.ResponseEnums import ResponseSignal
-from .enums.ProcessingEnum import ProcessingEnum
\ No newline at end of file
+from .enums.ProcessingEnum import ProcessingEnum
+from .enums.JobEnums import JobStatusEnum, JobStageEnum
+from .enums.FileEnums import FileStatusEnum
\ No newline at end of file
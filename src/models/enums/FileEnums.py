@@ -0,0 +1,8 @@
+from enum import Enum
+
+class FileStatusEnum(Enum):
+
+    UPLOADED = "uploaded"
+    PROCESSING = "processing"
+    PROCESSED = "processed"
+    FAILED = "failed"
@@ -0,0 +1,15 @@
+from enum import Enum
+
+class JobStatusEnum(Enum):
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class JobStageEnum(Enum):
+
+    PARSING = "parsing"
+    EMBEDDING = "embedding"
+    INSERTING = "inserting"
+    DONE = "done"
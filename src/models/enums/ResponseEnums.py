@@ -9,3 +9,9 @@ class ResponseSignal(Enum):
     FILE_UPLOAD_FAILED = "file_upload_failed"
     PROCESSING_SUCCESS = "processing_success"
     PROCESSING_FAILED = "processing_failed"
+    FILE_NOT_FOUND = "file_not_found"
+    FILE_ALREADY_EXISTS = "file_already_exists"
+    JOB_QUEUED = "job_queued"
+    JOB_QUEUE_FULL = "job_queue_full"
+    JOB_NOT_FOUND = "job_not_found"
+    COLLECTION_NOT_FOUND = "collection_not_found"
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, APIRouter, Depends
+from fastapi import FastAPI, APIRouter, Depends, Request
 from helpers.config import get_settings, Settings
 
 base_router = APIRouter(    
@@ -16,3 +16,13 @@ async def welcome(app_settings: Settings = Depends(get_settings)):
         "app_name":app_name,
         "app_version":app_version,
     }
+
+@base_router.get("/cache/stats")
+async def cache_stats(request: Request):
+
+    embedding_client = request.app.embedding_client
+
+    return {
+        "embeddings": embedding_client.cache_stats() if hasattr(embedding_client, "cache_stats") else None,
+        "answers": request.app.answer_cache.stats() if request.app.answer_cache else None,
+    }
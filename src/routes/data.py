@@ -1,14 +1,13 @@
-from fastapi import FastAPI, APIRouter, Depends, UploadFile, status,Request
-from fastapi.responses import JSONResponse
-import os
+from fastapi import FastAPI, APIRouter, Depends, UploadFile, status,Request, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+import asyncio
 from helpers.config import get_settings, Settings
-from controllers import DataController, ProjectController,ProcessController
-import aiofiles
+from controllers import DataController, ProjectController, QueryController
 from models import ResponseSignal
 import logging
-from .schemes.data import ProcessRequest
-from uuid import uuid4
-from stores.llm.templates.prompt_template import PromptTemplate
+from .schemes.data import ProcessRequest, QueryRequest, BatchQueryRequest
+from jobs import Job
+from stores.retrieval import SearchModeEnums
 
 logger = logging.getLogger('uvicorn.error')
 
@@ -18,8 +17,7 @@ data_router = APIRouter(
 )
 
 @data_router.post("/upload/{project_id}")
-async def upload_data(project_id: str, file: UploadFile,
-                      app_settings: Settings = Depends(get_settings)):
+async def upload_data(project_id: str, file: UploadFile, request: Request):
         
     
 
@@ -36,16 +34,12 @@ async def upload_data(project_id: str, file: UploadFile,
             }
         )
 
-    project_dir_path = ProjectController().get_project_path(project_id=project_id)
-    file_path, file_id = data_controller.generate_unique_filepath(
-        orig_file_name=file.filename,
-        project_id=project_id
-    )
-
     try:
-        async with aiofiles.open(file_path, "wb") as f:
-            while chunk := await file.read(app_settings.FILE_DEFAULT_CHUNK_SIZE):
-                await f.write(chunk)
+        is_stored, result_signal, file_id = await data_controller.write_uploaded_file(
+            file=file,
+            project_id=project_id,
+            catalog=request.app.catalog
+        )
     except Exception as e:
 
         logger.error(f"Error while uploading file: {e}")
@@ -57,10 +51,19 @@ async def upload_data(project_id: str, file: UploadFile,
             }
         )
 
+    if not is_stored:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={
+                "signal": result_signal
+            }
+        )
+
     return JSONResponse(
             content={
-                "signal": ResponseSignal.FILE_UPLOAD_SUCCESS.value,
+                "signal": result_signal,
                 "file_id": file_id,
+                "is_duplicate": result_signal == ResponseSignal.FILE_ALREADY_EXISTS.value,
             }
         )
 
@@ -72,103 +75,135 @@ async def process_endpoint(project_id: str, process_request: ProcessRequest, req
     chunk_size = process_request.chunk_size
     overlap_size = process_request.overlap_size
 
-    process_controller = ProcessController(project_id=project_id)
-
-    file_content = process_controller.get_file_content(file_id=file_id)
+    # the catalog knows every uploaded file, no need to touch the disk
+    if request.app.catalog.get_file(project_id=project_id, file_id=file_id) is None:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={
+                "signal": ResponseSignal.FILE_NOT_FOUND.value
+            }
+        )
 
-    file_chunks = process_controller.process_file_content(
-        file_content=file_content,
+    job = Job(
+        project_id=project_id,
         file_id=file_id,
-        chunk_size=chunk_size,
-        overlap_size=overlap_size
+        params={
+            "chunk_size": chunk_size,
+            "overlap_size": overlap_size,
+            "do_reset": process_request.do_reset,
+        }
     )
 
-    if file_chunks is None or len(file_chunks) == 0:
+    if not request.app.job_manager.submit(job):
         return JSONResponse(
-            status_code=status.HTTP_400_BAD_REQUEST,
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             content={
-                "signal": ResponseSignal.PROCESSING_FAILED.value
+                "signal": ResponseSignal.JOB_QUEUE_FULL.value
             }
         )
-    
-    embedding_client = request.app.embedding_client
-    vectordb_client = request.app.vectordb_client
 
-        
-    texts = []
-    vectors = []
-    metadata = []
-    record_ids = []
-
-    collection_name = f"{project_id}_{file_id}"
-
-    print(collection_name)
-    # Create collection if not exist or reset if needed
-    vectordb_client.create_collection(
-        collection_name=collection_name,
-        embedding_size=embedding_client.embedding_size,
-        do_reset=True
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={
+            "signal": ResponseSignal.JOB_QUEUED.value,
+            "job_id": job.job_id,
+        }
     )
-    for idx, chunk in enumerate(file_chunks):
-        if not hasattr(chunk, "text") or not chunk.text.strip():
-            continue
-        clean_text = chunk.text.strip()
-        vector = embedding_client.embed_text(clean_text)
-        if vector is None:
-            continue  # skip failed embeddings
-
-        texts.append(clean_text)
-
-        vectors.append(vector)
-
-        metadata.append({
-            "file_id": file_id,
-            "chunk_index": idx,
-            "project_id": project_id,
-        })
-        record_ids.append(str(uuid4()))
-
-    if not texts:
+
+
+@data_router.get("/files/{project_id}")
+async def list_files(project_id: str, request: Request, file_status: str = Query(None, alias="status")):
+
+    files = request.app.catalog.list_files(project_id=project_id, status=file_status)
+
+    return JSONResponse(
+        content={
+            "files": files,
+        }
+    )
+
+
+@data_router.get("/files/{project_id}/{file_id}/checkpoint")
+async def file_checkpoint(project_id: str, file_id: str, request: Request):
+
+    # which chunks of the file are committed and which ones the next run has to retry
+    checkpoint = request.app.catalog.get_missing_chunks(project_id=project_id, file_id=file_id)
+
+    if checkpoint is None:
         return JSONResponse(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            content={"signal": ResponseSignal.PROCESSING_FAILED.value}
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={
+                "signal": ResponseSignal.FILE_NOT_FOUND.value
+            }
         )
 
-    success = vectordb_client.insert_many(
-        collection_name=collection_name,
-        texts=texts,
-        vectors=vectors,
-        metadata=metadata,
-        record_ids=record_ids
+    return JSONResponse(
+        content=checkpoint
     )
 
-    if not success:
+
+@data_router.get("/collections/{project_id}/stats")
+async def collection_stats(project_id: str, request: Request,
+                           recall_k: int = Query(10, ge=0, le=100),
+                           sample_size: int = Query(100, ge=1, le=10000)):
+
+    vectordb_client = request.app.vectordb_client
+    collection_names = [
+        collection_name
+        for collection_name in ProjectController().get_collection_names(project_id=project_id)
+        if vectordb_client.is_collection_existed(collection_name)
+    ]
+
+    if not collection_names:
         return JSONResponse(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            content={"signal": ResponseSignal.PROCESSING_FAILED.value}
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={
+                "signal": ResponseSignal.COLLECTION_NOT_FOUND.value
+            }
         )
 
-    return {
-        "signal": ResponseSignal.PROCESSING_SUCCESS.value,
-        "chunks_stored": len(texts),
-        "collection": collection_name
-    }
+    collections = []
+    for collection_name in collection_names:
+        info = await asyncio.to_thread(vectordb_client.get_collection_info, collection_name)
+
+        # recall@k of the compressed search against the exact scan, stores without quantization skip it
+        if recall_k and hasattr(vectordb_client, "evaluate_recall"):
+            info["recall"] = await asyncio.to_thread(
+                vectordb_client.evaluate_recall,
+                collection_name=collection_name, k=recall_k, sample_size=sample_size
+            )
+        collections.append(info)
+
+    return JSONResponse(
+        content={
+            "collections": collections,
+        }
+    )
 
 
 @data_router.post("/query/{project_id}")
 async def query_endpoint(
     request: Request,
-    project_id: str
+    project_id: str,
+    query_request: QueryRequest
 ):
-    # Get the raw request body (question and top_k)
-    body = await request.json()
-    question = body.get("question")
-    top_k = body.get("top_k", 5)  # Default to 5 if top_k is not provided
-    file_id = body.get("file_id")  # Assuming file_id is part of the request
-
-    metadata_filter = {}
-    metadata_filter["file_id"] = file_id
-
+    question = query_request.question
+    top_k = query_request.top_k
+    stream = query_request.stream
+    search_mode = query_request.search_mode
+
+    # candidates are over-fetched then narrowed to top_k by the reranker
+    app_settings = get_settings()
+    mmr_lambda = query_request.mmr_lambda
+    if mmr_lambda is None:
+        mmr_lambda = app_settings.RETRIEVAL_MMR_LAMBDA
+    fetch_factor = query_request.fetch_factor or app_settings.RETRIEVAL_FETCH_FACTOR
+    fetch_k = top_k * fetch_factor
+
+    # search the whole project unless the query is restricted to some files
+    file_ids = query_request.file_ids
+    if not file_ids and query_request.file_id:
+        file_ids = [query_request.file_id]
 
     if not question:
         return JSONResponse(
@@ -176,30 +211,71 @@ async def query_endpoint(
             content={"signal": "Missing question"}
         )
 
-    # Embed the user question
-    embedding_client = request.app.embedding_client
-    question_vector = embedding_client.embed_text(question)
+    if search_mode not in [mode.value for mode in SearchModeEnums]:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"signal": "Invalid search mode"}
+        )
+
+    lexical_index = request.app.lexical_index
+    if search_mode != SearchModeEnums.VECTOR.value and lexical_index is None:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"signal": "Lexical index is disabled"}
+        )
+
+    query_controller = QueryController(project_id=project_id)
 
+    embedding_client = request.app.embedding_client
     vectordb_client = request.app.vectordb_client
-    collection_name = f"{project_id}_{file_id}"
 
+    if search_mode == SearchModeEnums.LEXICAL.value:
+        # exact term matching needs no embedding call at all
+        question_vector = None
+        # the bm25 scan and a replica's snapshot reload stay off the event loop
+        search_results = await asyncio.to_thread(
+            query_controller.lexical_search,
+            lexical_index=lexical_index,
+            question=question,
+            top_k=fetch_k,
+            file_ids=file_ids
+        )
 
-    if question_vector is None:
-        return JSONResponse(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            content={"signal": "Question embedding failed"}
+    elif search_mode == SearchModeEnums.HYBRID.value:
+        question_vector, search_results = await query_controller.hybrid_search(
+            embedding_client=embedding_client,
+            vectordb_client=vectordb_client,
+            lexical_index=lexical_index,
+            question=question,
+            top_k=fetch_k,
+            file_ids=file_ids
         )
 
-    # Search for top-k relevant chunks from ChromaDB
-    
-    search_results = vectordb_client.search_by_vector(
-        collection_name=collection_name,
-        vector=question_vector,
-        limit=top_k,
-        metadata_filter=metadata_filter
-    
+    else:
+        # Embed the user question
+        question_vector = await embedding_client.aembed_text(question)
+
+        if question_vector is None:
+            return JSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={"signal": "Question embedding failed"}
+            )
+
+        # Search for top-k relevant chunks across the project collections
+        search_results = await query_controller.search(
+            vectordb_client=vectordb_client,
+            question_vector=question_vector,
+            top_k=fetch_k,
+            file_ids=file_ids,
+            include_vectors=True
         )
-    
+
+    search_results = query_controller.rerank(
+        search_results=search_results,
+        top_k=top_k,
+        mmr_lambda=mmr_lambda,
+        question_vector=question_vector
+    )
 
 
     if not search_results:
@@ -208,17 +284,64 @@ async def query_endpoint(
             content={"signal": "No relevant chunks found"}
         )
 
-    # Prepare context (top-k chunks) for LLM
-    context = "\n".join([doc for doc in search_results['documents'][0]])
+    # Prepare response sources, they are the same for a cached answer
+    sources = query_controller.build_sources(search_results)
+
+    answer_cache = request.app.answer_cache
+    chunk_ids = search_results['ids'][0]
+
+    # lexical-only queries have no question vector to match cached answers against
+    if question_vector is None:
+        answer_cache = None
+
+    cached_answer = None
+    if answer_cache is not None:
+        cached_answer = answer_cache.get(
+            scope=project_id,
+            question_vector=question_vector,
+            chunk_ids=chunk_ids
+        )
+
+    def cache_answer(answer: str):
+        if answer_cache is not None:
+            answer_cache.put(
+                scope=project_id,
+                question_vector=question_vector,
+                chunk_ids=chunk_ids,
+                answer=answer,
+                sources=sources
+            )
 
     # Generate AI response using the context and question
     generation_client = request.app.generation_client
+    context = query_controller.build_prompt(question, search_results)
+    prompt = context["prompt"]
+
+    if stream:
+        return StreamingResponse(
+            query_controller.stream_answer(
+                generation_client=generation_client,
+                prompt=prompt,
+                sources=sources,
+                cached_answer=cached_answer,
+                on_complete=cache_answer,
+                prompt_tokens=context["prompt_tokens"]
+            ),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
 
-    prompt_template = PromptTemplate()
-    prompt = prompt_template.create_question_prompt(question, context)
-
+    if cached_answer is not None:
+        return JSONResponse(
+            content={
+                "answer": cached_answer["answer"],
+                "sources": cached_answer["sources"],
+                "cached": True,
+                "prompt_tokens": 0
+            }
+        )
 
-    answer = generation_client.generate_text(prompt)
+    answer = await generation_client.agenerate_text(prompt, truncate_input=False)
 
     if not answer:
         return JSONResponse(
@@ -226,21 +349,54 @@ async def query_endpoint(
             content={"signal": "Answer generation failed"}
         )
 
-    # Prepare response with the answer and sources
-   
-    sources = [
-        {
-         "text": doc,  # result is a dictionary
-         "file_id": metadata['file_id'],
-         "chunk_index": metadata['chunk_index']
-
-        }
-        for doc, metadata in zip(search_results['documents'][0], search_results['metadatas'][0])
-    ]
+    cache_answer(answer)
 
     return JSONResponse(
         content={
             "answer": answer,
-            "sources": sources
+            "sources": sources,
+            "cached": False,
+            "prompt_tokens": context["prompt_tokens"]
         }
     )
+
+
+@data_router.post("/query/batch/{project_id}")
+async def batch_query_endpoint(project_id: str, batch_request: BatchQueryRequest, request: Request):
+
+    app_settings = get_settings()
+
+    if not batch_request.questions:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"signal": "Missing questions"}
+        )
+
+    if len(batch_request.questions) > app_settings.QUERY_BATCH_MAX_QUESTIONS:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"signal": f"At most {app_settings.QUERY_BATCH_MAX_QUESTIONS} questions per batch"}
+        )
+
+    mmr_lambda = batch_request.mmr_lambda
+    if mmr_lambda is None:
+        mmr_lambda = app_settings.RETRIEVAL_MMR_LAMBDA
+    fetch_factor = batch_request.fetch_factor or app_settings.RETRIEVAL_FETCH_FACTOR
+
+    query_controller = QueryController(project_id=project_id)
+
+    # one json line per question, in completion order, each carrying its index
+    return StreamingResponse(
+        query_controller.answer_batch(
+            embedding_client=request.app.embedding_client,
+            vectordb_client=request.app.vectordb_client,
+            generation_client=request.app.generation_client,
+            questions=[item.model_dump() for item in batch_request.questions],
+            top_k=batch_request.top_k,
+            fetch_factor=fetch_factor,
+            mmr_lambda=mmr_lambda,
+            answer_cache=request.app.answer_cache
+        ),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"}
+    )
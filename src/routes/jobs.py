@@ -0,0 +1,25 @@
+from fastapi import APIRouter, status, Request
+from fastapi.responses import JSONResponse
+from models import ResponseSignal
+
+jobs_router = APIRouter(
+    prefix="/api/v1/jobs",
+    tags=["api_v1", "jobs"],
+)
+
+@jobs_router.get("/{job_id}")
+async def get_job(job_id: str, request: Request):
+
+    job = request.app.job_manager.get_job(job_id)
+
+    if job is None:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={
+                "signal": ResponseSignal.JOB_NOT_FOUND.value
+            }
+        )
+
+    return JSONResponse(
+        content=job.to_dict()
+    )
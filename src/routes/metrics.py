@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from helpers.metrics import REGISTRY
+
+metrics_router = APIRouter(
+    tags=["metrics"],
+)
+
+@metrics_router.get("/metrics")
+async def metrics():
+
+    # rendered only when scraped, the hot paths just bump counters
+    return PlainTextResponse(
+        REGISTRY.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
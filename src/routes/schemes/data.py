@@ -1,8 +1,30 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, conint, confloat
+from typing import Optional, List
+from stores.retrieval import SearchModeEnums
 
 class ProcessRequest(BaseModel):
     file_id: str
     chunk_size: Optional[int] = 500
     overlap_size: Optional[int] = 50
-    do_reset: Optional[int] = 0
\ No newline at end of file
+    do_reset: Optional[int] = 0
+
+class BatchQuestion(BaseModel):
+    question: str
+    id: Optional[str] = None
+    file_ids: Optional[List[str]] = None
+
+class QueryRequest(BaseModel):
+    question: Optional[str] = None
+    top_k: conint(ge=1) = 5
+    stream: Optional[bool] = False
+    search_mode: Optional[str] = SearchModeEnums.VECTOR.value
+    mmr_lambda: Optional[confloat(ge=0, le=1)] = None
+    fetch_factor: Optional[conint(ge=1)] = None
+    file_ids: Optional[List[str]] = None
+    file_id: Optional[str] = None
+
+class BatchQueryRequest(BaseModel):
+    questions: List[BatchQuestion]
+    top_k: conint(ge=1) = 5
+    mmr_lambda: Optional[confloat(ge=0, le=1)] = None
+    fetch_factor: Optional[conint(ge=1)] = None
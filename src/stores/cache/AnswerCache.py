@@ -0,0 +1,126 @@
+import numpy as np
+import threading
+import time
+
+class AnswerCache:
+
+    def __init__(self, similarity_threshold: float = 0.97, ttl_seconds: int = 3600,
+                       max_entries_per_scope: int = 1000, catalog=None):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries_per_scope = max_entries_per_scope
+
+        # the cache lives in one worker, only the writer invalidates it
+        # with a catalog the invalidations go through a generation every worker checks on lookup
+        self.catalog = catalog
+
+        # scope (a project) -> {"matrix": normalized question vectors, "entries": [...]}
+        self.scopes = {}
+        # scope -> the catalog generation its entries were cached under
+        self.generations = {}
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def normalize(vector: list):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def purge_expired(self, scope: str, now: float):
+        cached = self.scopes.get(scope)
+        if cached is None:
+            return None
+
+        keep = [
+            idx for idx, entry in enumerate(cached["entries"])
+            if now - entry["created_at"] < self.ttl_seconds
+        ]
+        if len(keep) != len(cached["entries"]):
+            cached["entries"] = [cached["entries"][idx] for idx in keep]
+            cached["matrix"] = cached["matrix"][keep]
+
+        if not cached["entries"]:
+            del self.scopes[scope]
+            return None
+
+        return cached
+
+    def get_generation(self, scope: str):
+        return self.catalog.get_generation(scope) if self.catalog is not None else 0
+
+    def sync_generation(self, scope: str, generation: int):
+        # entries cached before another worker invalidated the scope are dropped, called under the lock
+        if self.generations.get(scope, generation) != generation:
+            if self.scopes.pop(scope, None) is not None:
+                self.invalidations += 1
+        self.generations[scope] = generation
+
+    def get(self, scope: str, question_vector: list, chunk_ids: list):
+        query = self.normalize(question_vector)
+        chunk_ids = tuple(chunk_ids)
+        generation = self.get_generation(scope)
+
+        with self.lock:
+            self.sync_generation(scope, generation)
+            cached = self.purge_expired(scope, time.time())
+            if cached is not None:
+                similarities = cached["matrix"] @ query
+                for idx in np.argsort(-similarities):
+                    if similarities[idx] < self.similarity_threshold:
+                        break
+                    entry = cached["entries"][idx]
+                    if entry["chunk_ids"] == chunk_ids:
+                        self.hits += 1
+                        return entry
+
+            self.misses += 1
+            return None
+
+    def put(self, scope: str, question_vector: list, chunk_ids: list,
+                  answer: str, sources: list):
+        entry = {
+            "chunk_ids": tuple(chunk_ids),
+            "answer": answer,
+            "sources": sources,
+            "created_at": time.time(),
+        }
+        vector = self.normalize(question_vector)[np.newaxis, :]
+        generation = self.get_generation(scope)
+
+        with self.lock:
+            self.sync_generation(scope, generation)
+            cached = self.purge_expired(scope, entry["created_at"])
+            if cached is None:
+                self.scopes[scope] = {"matrix": vector, "entries": [entry]}
+                return
+
+            cached["entries"].append(entry)
+            cached["matrix"] = np.vstack([cached["matrix"], vector])
+
+            overflow = len(cached["entries"]) - self.max_entries_per_scope
+            if overflow > 0:
+                cached["entries"] = cached["entries"][overflow:]
+                cached["matrix"] = cached["matrix"][overflow:]
+
+    def invalidate(self, scope: str):
+        generation = self.catalog.bump_generation(scope) if self.catalog is not None else 0
+
+        with self.lock:
+            self.generations[scope] = generation
+            if self.scopes.pop(scope, None) is not None:
+                self.invalidations += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "scopes": len(self.scopes),
+            "entries": sum(len(cached["entries"]) for cached in self.scopes.values()),
+        }
@@ -0,0 +1,166 @@
+from collections import OrderedDict
+from array import array
+import unicodedata
+import threading
+import hashlib
+import sqlite3
+import logging
+import time
+import os
+
+class EmbeddingCache:
+
+    def __init__(self, db_path: str, max_memory_items: int = 10000,
+                       max_disk_bytes: int = 1024 * 1048576):
+        self.db_path = db_path
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.logger = logging.getLogger(__name__)
+
+        self.connection = sqlite3.connect(
+            os.path.join(db_path, "embeddings.sqlite"),
+            check_same_thread=False
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, "
+            "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)"
+        )
+        self.connection.commit()
+
+        self.disk_bytes = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    @staticmethod
+    def normalize_text(text: str):
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    def make_key(self, model_id: str, embedding_size: int, text: str):
+        digest = hashlib.sha256(self.normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{model_id}:{embedding_size}:{digest}"
+
+    def get_many(self, keys: list):
+        found = {}
+        missing = []
+
+        with self.lock:
+            for key in keys:
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    found[key] = self.memory[key]
+                    self.hits_memory += 1
+                else:
+                    missing.append(key)
+
+            if missing:
+                now = time.time()
+                for start in range(0, len(missing), 500):
+                    batch = missing[start:start + 500]
+                    rows = self.connection.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                        batch
+                    ).fetchall()
+
+                    for key, blob in rows:
+                        vector = array("f", blob).tolist()
+                        found[key] = vector
+                        self.remember(key, vector)
+
+                    if rows:
+                        self.connection.executemany(
+                            "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                            [(now, key) for key, _ in rows]
+                        )
+                self.connection.commit()
+
+                disk_hits = sum(1 for key in missing if key in found)
+                self.hits_disk += disk_hits
+                self.misses += len(missing) - disk_hits
+
+        return found
+
+    def put_many(self, items: dict):
+        if not items:
+            return
+
+        now = time.time()
+        rows = []
+        with self.lock:
+            for key, vector in items.items():
+                blob = array("f", vector).tobytes()
+                rows.append((key, blob, len(blob), now))
+                self.remember(key, vector)
+
+            for row in rows:
+                cursor = self.connection.execute(
+                    "INSERT OR IGNORE INTO embeddings (key, vector, size, last_access) VALUES (?, ?, ?, ?)",
+                    row
+                )
+                if cursor.rowcount > 0:
+                    self.disk_bytes += row[2]
+
+            if self.disk_bytes > self.max_disk_bytes:
+                self.evict_disk()
+
+            self.connection.commit()
+
+    def remember(self, key: str, vector: list):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_items:
+            self.memory.popitem(last=False)
+
+    def evict_disk(self):
+        # trim the least recently used rows down to 90% of the budget
+        target = int(self.max_disk_bytes * 0.9)
+        while self.disk_bytes > target:
+            rows = self.connection.execute(
+                "SELECT key, size FROM embeddings ORDER BY last_access LIMIT 1000"
+            ).fetchall()
+            if not rows:
+                break
+
+            evicted = []
+            for key, size in rows:
+                if self.disk_bytes <= target:
+                    break
+                evicted.append((key,))
+                self.disk_bytes -= size
+
+            self.connection.executemany("DELETE FROM embeddings WHERE key = ?", evicted)
+            self.evictions += len(evicted)
+
+        self.disk_bytes = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    def stats(self):
+        lookups = self.hits_memory + self.hits_disk + self.misses
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits_memory + self.hits_disk) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "memory_items": len(self.memory),
+            "disk_bytes": self.disk_bytes,
+        }
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,2 @@
+from .EmbeddingCache import EmbeddingCache
+from .AnswerCache import AnswerCache
\ No newline at end of file
@@ -0,0 +1,389 @@
+from models import FileStatusEnum, JobStatusEnum
+import threading
+import hashlib
+import json
+import sqlite3
+import logging
+import time
+import os
+
+class Catalog:
+
+    def __init__(self, db_path: str, files_dir: str, hash_block_size: int = 512000):
+        self.db_path = db_path
+        self.files_dir = files_dir
+        self.hash_block_size = hash_block_size
+
+        self.lock = threading.Lock()
+        # projects are never removed, once seen they skip the database round trip
+        self.known_projects = set()
+
+        self.logger = logging.getLogger(__name__)
+
+        self.connection = sqlite3.connect(
+            os.path.join(db_path, "catalog.sqlite"),
+            check_same_thread=False,
+            timeout=30
+        )
+        self.connection.row_factory = sqlite3.Row
+        # WAL lets every app worker read while one of them writes
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS projects ("
+            "project_id TEXT PRIMARY KEY, created_at REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "project_id TEXT NOT NULL, file_id TEXT NOT NULL, file_name TEXT NOT NULL, "
+            "file_hash TEXT NOT NULL, file_size INTEGER NOT NULL, status TEXT NOT NULL, "
+            "chunk_size INTEGER, overlap_size INTEGER, collection_name TEXT, chunk_count INTEGER, "
+            "error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL, "
+            "PRIMARY KEY (project_id, file_id))"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_files_hash ON files (project_id, file_hash)"
+        )
+        # one row per ingested batch, written once the batch is in the vector store
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS ingest_batches ("
+            "project_id TEXT NOT NULL, file_id TEXT NOT NULL, ingest_key TEXT NOT NULL, "
+            "chunk_start INTEGER NOT NULL, chunk_end INTEGER NOT NULL, failed_chunks TEXT NOT NULL, "
+            "committed_at REAL NOT NULL, PRIMARY KEY (project_id, file_id, ingest_key, chunk_start))"
+        )
+        # the job queue shared by every app worker, only the writer runs what is in it
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, project_id TEXT NOT NULL, file_id TEXT NOT NULL, "
+            "params TEXT NOT NULL, status TEXT NOT NULL, stage TEXT, progress TEXT NOT NULL, "
+            "timings TEXT NOT NULL, result TEXT, error TEXT, created_at REAL NOT NULL, "
+            "started_at REAL, finished_at REAL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)"
+        )
+        # bumped whenever the chunks of a project change, the answer cache of every worker checks it
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache_generations ("
+            "project_id TEXT PRIMARY KEY, generation INTEGER NOT NULL)"
+        )
+        self.connection.commit()
+
+    def hash_file(self, file_path: str):
+        file_hash = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            while block := f.read(self.hash_block_size):
+                file_hash.update(block)
+        return file_hash.hexdigest()
+
+    def sync_files_dir(self):
+        # projects uploaded before the catalog existed are registered once, later startups only list the directory
+        if not os.path.isdir(self.files_dir):
+            return
+
+        for project_id in sorted(os.listdir(self.files_dir)):
+            if os.path.isdir(os.path.join(self.files_dir, project_id)) and self.add_project(project_id):
+                self.import_project_files(project_id)
+
+    def import_project_files(self, project_id: str):
+        project_path = os.path.join(self.files_dir, project_id)
+        rows = []
+        for file_id in sorted(os.listdir(project_path)):
+            file_path = os.path.join(project_path, file_id)
+            # half written uploads are dot files
+            if file_id.startswith(".") or not os.path.isfile(file_path):
+                continue
+            rows.append((project_id, file_id, self.hash_file(file_path), os.path.getsize(file_path)))
+
+        now = time.time()
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO files (project_id, file_id, file_name, file_hash, file_size, "
+                "status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(project_id, file_id, file_id, file_hash, file_size,
+                  FileStatusEnum.UPLOADED.value, now, now)
+                 for project_id, file_id, file_hash, file_size in rows]
+            )
+            self.connection.commit()
+
+        self.logger.info(f"Catalog imported {len(rows)} files of project {project_id}")
+
+    def add_project(self, project_id: str):
+        # True only for the caller that actually created the project
+        if project_id in self.known_projects:
+            return False
+
+        with self.lock:
+            cursor = self.connection.execute(
+                "INSERT OR IGNORE INTO projects (project_id, created_at) VALUES (?, ?)",
+                (project_id, time.time())
+            )
+            self.connection.commit()
+            self.known_projects.add(project_id)
+
+        return cursor.rowcount > 0
+
+    def list_projects(self):
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT project_id FROM projects ORDER BY project_id"
+            ).fetchall()
+        return [row["project_id"] for row in rows]
+
+    def add_file(self, project_id: str, file_id: str, file_name: str, file_hash: str, file_size: int):
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO files (project_id, file_id, file_name, file_hash, file_size, "
+                "status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (project_id, file_id, file_name, file_hash, file_size,
+                 FileStatusEnum.UPLOADED.value, now, now)
+            )
+            self.connection.commit()
+
+    def get_file(self, project_id: str, file_id: str):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT * FROM files WHERE project_id = ? AND file_id = ?",
+                (project_id, file_id)
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def find_file_by_hash(self, project_id: str, file_hash: str):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT file_id FROM files WHERE project_id = ? AND file_hash = ? ORDER BY file_id LIMIT 1",
+                (project_id, file_hash)
+            ).fetchone()
+        return row["file_id"] if row is not None else None
+
+    def list_files(self, project_id: str, status: str = None):
+        query = "SELECT * FROM files WHERE project_id = ?"
+        params = [project_id]
+        if status is not None:
+            query += " AND status = ?"
+            params.append(status)
+
+        with self.lock:
+            rows = self.connection.execute(query + " ORDER BY created_at, file_id", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def update_file(self, project_id: str, file_id: str, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+
+        with self.lock:
+            self.connection.execute(
+                f"UPDATE files SET {assignments} WHERE project_id = ? AND file_id = ?",
+                list(fields.values()) + [project_id, file_id]
+            )
+            self.connection.commit()
+
+    def mark_processing(self, project_id: str, file_id: str, chunk_size: int, overlap_size: int,
+                              collection_name: str):
+        # the chunk count is set again once this run has parsed the whole file
+        self.update_file(project_id, file_id, status=FileStatusEnum.PROCESSING.value,
+                         chunk_size=chunk_size, overlap_size=overlap_size,
+                         collection_name=collection_name, chunk_count=None, error=None)
+
+    def mark_processed(self, project_id: str, file_id: str, chunk_count: int):
+        self.update_file(project_id, file_id, status=FileStatusEnum.PROCESSED.value,
+                         chunk_count=chunk_count, error=None)
+
+    def mark_failed(self, project_id: str, file_id: str, error: str):
+        self.update_file(project_id, file_id, status=FileStatusEnum.FAILED.value, error=error)
+
+    def start_checkpoint(self, project_id: str, file_id: str, ingest_key: str):
+        # markers of another content or chunking describe chunks that no longer exist
+        with self.lock:
+            self.connection.execute(
+                "DELETE FROM ingest_batches WHERE project_id = ? AND file_id = ? AND ingest_key != ?",
+                (project_id, file_id, ingest_key)
+            )
+            self.connection.commit()
+
+    def clear_checkpoint(self, project_id: str, file_id: str):
+        with self.lock:
+            self.connection.execute(
+                "DELETE FROM ingest_batches WHERE project_id = ? AND file_id = ?",
+                (project_id, file_id)
+            )
+            self.connection.commit()
+
+    def commit_batch(self, project_id: str, file_id: str, ingest_key: str,
+                           chunk_start: int, chunk_end: int, failed_chunks: list):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO ingest_batches (project_id, file_id, ingest_key, chunk_start, "
+                "chunk_end, failed_chunks, committed_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (project_id, file_id, ingest_key, chunk_start, chunk_end,
+                 json.dumps(failed_chunks), time.time())
+            )
+            self.connection.commit()
+
+    def get_checkpoint(self, project_id: str, file_id: str):
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT * FROM ingest_batches WHERE project_id = ? AND file_id = ? "
+                "ORDER BY committed_at, chunk_start",
+                (project_id, file_id)
+            ).fetchall()
+
+        # a later batch covering the same chunks overrides an earlier one, e.g. a retry of failed chunks
+        committed = {}
+        for row in rows:
+            failed_chunks = set(json.loads(row["failed_chunks"]))
+            for chunk_index in range(row["chunk_start"], row["chunk_end"]):
+                committed[chunk_index] = chunk_index not in failed_chunks
+
+        return {
+            "ingest_key": rows[-1]["ingest_key"] if rows else None,
+            "batches": len(rows),
+            "committed_chunks": sum(committed.values()),
+            "failed_chunks": sorted(idx for idx, ok in committed.items() if not ok),
+            "covered": committed,
+        }
+
+    def get_missing_chunks(self, project_id: str, file_id: str):
+        file_record = self.get_file(project_id=project_id, file_id=file_id)
+        if file_record is None:
+            return None
+
+        checkpoint = self.get_checkpoint(project_id=project_id, file_id=file_id)
+        covered = checkpoint.pop("covered")
+
+        # the chunk count is only known once a run parsed the whole file
+        chunk_count = file_record["chunk_count"]
+        if chunk_count is None:
+            missing_chunks = checkpoint["failed_chunks"]
+        else:
+            missing_chunks = [idx for idx in range(chunk_count) if not covered.get(idx)]
+
+        return {
+            "file_id": file_id,
+            "status": file_record["status"],
+            "chunk_count": chunk_count,
+            **checkpoint,
+            "missing_chunks": missing_chunks,
+        }
+
+    def bump_generation(self, project_id: str):
+        with self.lock:
+            self.connection.execute(
+                "INSERT INTO cache_generations (project_id, generation) VALUES (?, 1) "
+                "ON CONFLICT (project_id) DO UPDATE SET generation = generation + 1",
+                (project_id,)
+            )
+            self.connection.commit()
+            row = self.connection.execute(
+                "SELECT generation FROM cache_generations WHERE project_id = ?", (project_id,)
+            ).fetchone()
+        return row["generation"]
+
+    def get_generation(self, project_id: str):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT generation FROM cache_generations WHERE project_id = ?", (project_id,)
+            ).fetchone()
+        return row["generation"] if row is not None else 0
+
+    def job_values(self, job):
+        return (
+            job.project_id, job.file_id, json.dumps(job.params), job.status, job.stage,
+            json.dumps(job.progress), json.dumps(job.timings),
+            json.dumps(job.result) if job.result is not None else None, job.error,
+            job.created_at, job.started_at, job.finished_at, job.job_id,
+        )
+
+    def job_from_row(self, row):
+        job = dict(row)
+        for key in ["params", "progress", "timings", "result"]:
+            if job[key] is not None:
+                job[key] = json.loads(job[key])
+        return job
+
+    def add_job(self, job, queue_max_size: int):
+        # the queue bound is checked in the same transaction as the insert
+        with self.lock:
+            with self.connection:
+                # other workers submit through their own connections, the count and the insert stay together
+                self.connection.execute("BEGIN IMMEDIATE")
+                queued = self.connection.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ?", (JobStatusEnum.QUEUED.value,)
+                ).fetchone()[0]
+                if queued >= queue_max_size:
+                    return False
+
+                self.connection.execute(
+                    "INSERT INTO jobs (project_id, file_id, params, status, stage, progress, timings, "
+                    "result, error, created_at, started_at, finished_at, job_id) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    self.job_values(job)
+                )
+        return True
+
+    def save_job(self, job):
+        with self.lock:
+            self.connection.execute(
+                "UPDATE jobs SET project_id = ?, file_id = ?, params = ?, status = ?, stage = ?, "
+                "progress = ?, timings = ?, result = ?, error = ?, created_at = ?, started_at = ?, "
+                "finished_at = ? WHERE job_id = ?",
+                self.job_values(job)
+            )
+            self.connection.commit()
+
+    def get_job(self, job_id: str):
+        with self.lock:
+            row = self.connection.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self.job_from_row(row) if row is not None else None
+
+    def claim_job(self):
+        # oldest queued job first, the status check keeps a job from being claimed twice
+        with self.lock:
+            with self.connection:
+                self.connection.execute("BEGIN IMMEDIATE")
+                row = self.connection.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                    (JobStatusEnum.QUEUED.value,)
+                ).fetchone()
+                if row is None:
+                    return None
+
+                cursor = self.connection.execute(
+                    "UPDATE jobs SET status = ?, started_at = ? WHERE job_id = ? AND status = ?",
+                    (JobStatusEnum.RUNNING.value, time.time(), row["job_id"], JobStatusEnum.QUEUED.value)
+                )
+                if cursor.rowcount == 0:
+                    return None
+
+        return self.job_from_row(row)
+
+    def count_jobs(self, status: str):
+        with self.lock:
+            return self.connection.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)
+            ).fetchone()[0]
+
+    def fail_running_jobs(self, error: str):
+        # jobs a dead writer was running, nobody is going to finish them
+        with self.lock:
+            cursor = self.connection.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE status = ?",
+                (JobStatusEnum.FAILED.value, error, time.time(), JobStatusEnum.RUNNING.value)
+            )
+            self.connection.commit()
+        return cursor.rowcount
+
+    def prune_jobs(self, history_size: int):
+        # drop the oldest finished jobs, never the ones still queued or running
+        with self.lock:
+            self.connection.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND job_id NOT IN "
+                "(SELECT job_id FROM jobs ORDER BY created_at DESC LIMIT ?)",
+                (JobStatusEnum.COMPLETED.value, JobStatusEnum.FAILED.value, history_size)
+            )
+            self.connection.commit()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
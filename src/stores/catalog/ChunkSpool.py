@@ -0,0 +1,116 @@
+import logging
+import json
+import os
+
+class ChunkSpool:
+
+    # the parsed chunks of one file, a resumed run replays them instead of parsing the file again
+    def __init__(self, spool_dir: str, project_id: str, file_id: str, ingest_key: str):
+        self.path = os.path.join(spool_dir, project_id, f"{file_id}.jsonl")
+        self.ingest_key = ingest_key
+        self.file = None
+
+        self.logger = logging.getLogger(__name__)
+
+    def read_lines(self):
+        if not os.path.isfile(self.path):
+            return
+
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # a crash can leave the last line half written, everything before it is intact
+                    return
+
+    def scan(self):
+        lines = self.read_lines()
+        header = next(lines, None)
+        if header is None or header.get("ingest_key") != self.ingest_key:
+            return None
+
+        state = {"complete": False, "chunk_count": 0, "last_part": 0}
+        for line in lines:
+            if line.get("complete"):
+                state["complete"] = True
+                break
+            for chunk in line["chunks"]:
+                state["chunk_count"] += 1
+                state["last_part"] = max(state["last_part"], chunk["part"])
+
+        return state
+
+    def prepare(self):
+        # returns how many spooled chunks can be replayed and the part the parsing restarts from
+        state = self.scan()
+
+        if state is not None and state["complete"]:
+            return {"complete": True, "replay_count": state["chunk_count"], "start_part": None}
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+
+        # the last spooled part may be cut short, it is parsed again with everything after it
+        start_part = state["last_part"] if state is not None else 0
+        replay_count = 0
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"ingest_key": self.ingest_key}) + "\n")
+
+            if start_part > 0:
+                lines = self.read_lines()
+                next(lines)
+                for line in lines:
+                    chunks = [chunk for chunk in line["chunks"] if chunk["part"] < start_part]
+                    if chunks:
+                        f.write(json.dumps({"chunks": chunks}) + "\n")
+                        replay_count += len(chunks)
+
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp_path, self.path)
+
+        if replay_count:
+            self.logger.info(f"Resuming {self.path} from part {start_part} with {replay_count} spooled chunks")
+
+        return {"complete": False, "replay_count": replay_count, "start_part": start_part}
+
+    def iter_batches(self, limit: int):
+        # only the first limit chunks, the rest of the file may be appended to while it is read
+        lines = self.read_lines()
+        next(lines, None)
+
+        count = 0
+        for line in lines:
+            if count >= limit or line.get("complete"):
+                return
+            chunks = line["chunks"][:limit - count]
+            count += len(chunks)
+            yield chunks
+
+    def append_line(self, line: dict):
+        if self.file is None:
+            self.file = open(self.path, "a", encoding="utf-8")
+
+        self.file.write(json.dumps(line) + "\n")
+        self.file.flush()
+        # a batch is durable before it is embedded, a crash never loses parsed work
+        os.fsync(self.file.fileno())
+
+    def append(self, chunks: list):
+        self.append_line({"chunks": chunks})
+
+    def complete(self, chunk_count: int):
+        self.append_line({"complete": True, "chunk_count": chunk_count})
+        self.close()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def remove(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,2 @@
+from .Catalog import Catalog
+from .ChunkSpool import ChunkSpool
@@ -0,0 +1,376 @@
+import numpy as np
+import threading
+import math
+import json
+import re
+import os
+
+
+class BM25Index:
+
+    k1 = 1.2
+    b = 0.75
+    # the operation log is folded into a fresh snapshot once it grows past this
+    snapshot_min_ops = 1000
+
+    # keeps part numbers, clause ids and decimals whole: "ab-12/3", "4.2.1"
+    token_pattern = re.compile(r"\w+(?:[-./:]\w+)*")
+    part_pattern = re.compile(r"\w+")
+
+    def __init__(self, path: str, read_only: bool = False):
+        self.path = path
+        # a read replica follows the writer through meta.json and the operation log
+        self.read_only = read_only
+        self.lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+        self.load()
+
+    @classmethod
+    def tokenize(cls, text: str):
+        tokens = []
+        for token in cls.token_pattern.findall(text.lower()):
+            tokens.append(token)
+            parts = cls.part_pattern.findall(token)
+            if len(parts) > 1:
+                tokens.extend(parts)
+        return tokens
+
+    @staticmethod
+    def encode_varint(value: int, out: bytearray):
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+
+    @staticmethod
+    def decode_varint(data: bytes, pos: int):
+        value = 0
+        shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value, pos
+            shift += 7
+
+    def file_path(self, name: str, generation: int = None):
+        generation = self.generation if generation is None else generation
+        return os.path.join(self.path, f"{name}.{generation}")
+
+    def read_meta_mtime(self):
+        try:
+            return os.stat(os.path.join(self.path, "meta.json")).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def load(self):
+        meta_path = os.path.join(self.path, "meta.json")
+        self.meta_mtime = self.read_meta_mtime()
+        self.generation = 0
+        if os.path.isfile(meta_path):
+            with open(meta_path) as f:
+                self.generation = json.load(f)["generation"]
+
+        self.doc_ids = []
+        self.texts = []
+        self.metadatas = []
+        self.lengths = []
+        self.id_to_doc = {}
+        self.postings = {}
+        self.total_length = 0
+
+        self.arrays = {}
+        self.length_array = None
+        self.log_ops = 0
+        self.log_offset = 0
+
+        if os.path.isfile(self.file_path("docs")):
+            self.read_snapshot()
+
+        log_path = self.file_path("log")
+        if os.path.isfile(log_path):
+            self.replay_log()
+
+        self.log = None if self.read_only else open(log_path, "a", encoding="utf-8")
+
+    def replay_log(self):
+        # applies the log from where the last replay stopped, a replica calls it again to catch up
+        with open(self.file_path("log"), "rb") as f:
+            f.seek(self.log_offset)
+            for line in f:
+                try:
+                    # a line without its newline is torn by a crash or still being written
+                    record = json.loads(line) if line.endswith(b"\n") else None
+                except json.JSONDecodeError:
+                    record = None
+                if record is None:
+                    break
+                self.log_offset += len(line)
+                self.apply(record)
+                self.log_ops += 1
+
+    def refresh(self):
+        with self.lock:
+            if self.read_meta_mtime() != self.meta_mtime:
+                # the writer folded its log into a new snapshot
+                self.close()
+                self.load()
+                return
+
+            log_path = self.file_path("log")
+            if os.path.isfile(log_path) and os.path.getsize(log_path) > self.log_offset:
+                self.replay_log()
+
+    def read_snapshot(self):
+        with open(self.file_path("docs"), encoding="utf-8") as f:
+            for line in f:
+                doc = json.loads(line)
+                self.id_to_doc[doc["id"]] = len(self.doc_ids)
+                self.doc_ids.append(doc["id"])
+                self.texts.append(doc["text"])
+                self.metadatas.append(doc["metadata"])
+                self.lengths.append(doc["length"])
+                self.total_length += doc["length"]
+
+        with open(self.file_path("postings"), "rb") as f:
+            data = f.read()
+
+        pos = 0
+        n_terms, pos = self.decode_varint(data, pos)
+        for _ in range(n_terms):
+            size, pos = self.decode_varint(data, pos)
+            term = data[pos:pos + size].decode("utf-8")
+            pos += size
+
+            df, pos = self.decode_varint(data, pos)
+            posting = {}
+            doc = 0
+            for _ in range(df):
+                delta, pos = self.decode_varint(data, pos)
+                tf, pos = self.decode_varint(data, pos)
+                doc += delta
+                posting[doc] = tf
+            self.postings[term] = posting
+
+    def write_snapshot(self):
+        # live documents are renumbered densely, postings become sorted delta lists
+        live_docs = [doc for doc in range(len(self.doc_ids)) if self.doc_ids[doc] is not None]
+        renumber = {doc: idx for idx, doc in enumerate(live_docs)}
+        generation = self.generation + 1
+
+        with open(self.file_path("docs", generation), "w", encoding="utf-8") as f:
+            for doc in live_docs:
+                f.write(json.dumps({
+                    "id": self.doc_ids[doc], "text": self.texts[doc],
+                    "metadata": self.metadatas[doc], "length": self.lengths[doc],
+                }) + "\n")
+
+        out = bytearray()
+        self.encode_varint(len(self.postings), out)
+        for term, posting in self.postings.items():
+            encoded = term.encode("utf-8")
+            self.encode_varint(len(encoded), out)
+            out += encoded
+
+            self.encode_varint(len(posting), out)
+            previous = 0
+            for doc, tf in sorted((renumber[doc], tf) for doc, tf in posting.items()):
+                self.encode_varint(doc - previous, out)
+                self.encode_varint(tf, out)
+                previous = doc
+
+        with open(self.file_path("postings", generation), "wb") as f:
+            f.write(out)
+        open(self.file_path("log", generation), "w").close()
+
+        temp_path = os.path.join(self.path, "meta.json.tmp")
+        with open(temp_path, "w") as f:
+            json.dump({"generation": generation}, f)
+        os.replace(temp_path, os.path.join(self.path, "meta.json"))
+
+        old_generation = self.generation
+        self.log.close()
+        self.load()
+
+        for name in ["docs", "postings", "log"]:
+            old_path = self.file_path(name, old_generation)
+            if os.path.isfile(old_path):
+                os.remove(old_path)
+
+    def apply(self, record: dict):
+        if record["op"] == "add":
+            self.add_document(record["id"], record["text"], record["metadata"])
+        elif record["op"] == "del":
+            self.remove_document(record["id"])
+
+    def add_document(self, record_id: str, text: str, metadata: dict):
+        self.remove_document(record_id)
+
+        tokens = self.tokenize(text)
+        doc = len(self.doc_ids)
+        self.doc_ids.append(record_id)
+        self.texts.append(text)
+        self.metadatas.append(metadata or {})
+        self.lengths.append(len(tokens))
+        self.id_to_doc[record_id] = doc
+        self.total_length += len(tokens)
+
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, tf in counts.items():
+            self.postings.setdefault(token, {})[doc] = tf
+            self.arrays.pop(token, None)
+        self.length_array = None
+
+    def remove_document(self, record_id: str):
+        doc = self.id_to_doc.pop(record_id, None)
+        if doc is None:
+            return
+
+        for token in set(self.tokenize(self.texts[doc])):
+            posting = self.postings.get(token)
+            if posting is not None:
+                posting.pop(doc, None)
+                if not posting:
+                    del self.postings[token]
+            self.arrays.pop(token, None)
+
+        self.total_length -= self.lengths[doc]
+        self.doc_ids[doc] = None
+        self.texts[doc] = None
+        self.metadatas[doc] = None
+        self.lengths[doc] = 0
+
+    def write_log(self, records: list):
+        for record in records:
+            self.log.write(json.dumps(record) + "\n")
+            self.apply(record)
+        self.log.flush()
+        self.log_ops += len(records)
+
+        if self.log_ops >= max(self.snapshot_min_ops, len(self.id_to_doc)):
+            self.write_snapshot()
+
+    def check_writable(self):
+        if self.read_only:
+            raise RuntimeError(f"{self.path} is opened as a read replica, only the writer changes it")
+
+    def upsert(self, record_ids: list, texts: list, metadatas: list):
+        self.check_writable()
+        with self.lock:
+            self.write_log([
+                {"op": "add", "id": record_id, "text": text, "metadata": metadata or {}}
+                for record_id, text, metadata in zip(record_ids, texts, metadatas)
+            ])
+
+    def delete(self, record_ids: list):
+        self.check_writable()
+        with self.lock:
+            self.write_log([
+                {"op": "del", "id": record_id}
+                for record_id in record_ids if record_id in self.id_to_doc
+            ])
+
+    def missing_ids(self, record_ids: list):
+        return [record_id for record_id in record_ids if record_id not in self.id_to_doc]
+
+    def get_ids(self, metadata_filter: dict = None):
+        with self.lock:
+            return [
+                record_id for record_id, doc in self.id_to_doc.items()
+                if not metadata_filter or self.match(self.metadatas[doc], metadata_filter)
+            ]
+
+    def get_postings(self, term: str):
+        cached = self.arrays.get(term)
+        if cached is None:
+            posting = self.postings.get(term)
+            if not posting:
+                return None
+            cached = (
+                np.fromiter(posting.keys(), dtype=np.int64, count=len(posting)),
+                np.fromiter(posting.values(), dtype=np.float32, count=len(posting)),
+            )
+            self.arrays[term] = cached
+        return cached
+
+    @classmethod
+    def match(cls, metadata: dict, metadata_filter: dict):
+        for key, condition in metadata_filter.items():
+            if key == "$and":
+                if not all(cls.match(metadata, sub_filter) for sub_filter in condition):
+                    return False
+                continue
+
+            if key == "$or":
+                if not any(cls.match(metadata, sub_filter) for sub_filter in condition):
+                    return False
+                continue
+
+            value = metadata.get(key)
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+
+            for operator, expected in condition.items():
+                if operator == "$eq" and value != expected:
+                    return False
+                if operator == "$ne" and value == expected:
+                    return False
+                if operator == "$in" and value not in expected:
+                    return False
+                if operator == "$nin" and value in expected:
+                    return False
+
+        return True
+
+    def search(self, query: str, limit: int, metadata_filter: dict = None):
+        terms = set(self.tokenize(query))
+
+        with self.lock:
+            n_docs = len(self.id_to_doc)
+            if not terms or n_docs == 0:
+                return None
+
+            if self.length_array is None:
+                self.length_array = np.asarray(self.lengths, dtype=np.float32)
+            average_length = self.total_length / n_docs
+            norms = self.k1 * (1 - self.b + self.b * self.length_array / average_length)
+
+            scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+            for term in terms:
+                postings = self.get_postings(term)
+                if postings is None:
+                    continue
+
+                docs, tfs = postings
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norms[docs])
+
+            candidates = np.flatnonzero(scores > 0)
+            if metadata_filter:
+                candidates = np.asarray([
+                    doc for doc in candidates.tolist()
+                    if self.match(self.metadatas[doc], metadata_filter)
+                ], dtype=np.int64)
+
+            if len(candidates) == 0:
+                return None
+
+            k = min(limit, len(candidates))
+            top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            top = top[np.argsort(-scores[top])].tolist()
+
+            return {
+                "ids": [[self.doc_ids[doc] for doc in top]],
+                "documents": [[self.texts[doc] for doc in top]],
+                "metadatas": [[self.metadatas[doc] for doc in top]],
+                # lower is better like a vector distance, so shard results merge the same way
+                "distances": [[-float(scores[doc]) for doc in top]],
+            }
+
+    def close(self):
+        with self.lock:
+            if self.log is not None:
+                self.log.close()
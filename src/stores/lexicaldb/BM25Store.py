@@ -0,0 +1,76 @@
+from .BM25Index import BM25Index
+import threading
+import logging
+import shutil
+import os
+
+
+class BM25Store:
+
+    def __init__(self, db_path: str, read_only: bool = False):
+        self.db_path = db_path
+        self.read_only = read_only
+        self.indexes = {}
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+        os.makedirs(self.db_path, exist_ok=True)
+
+    def get_index_path(self, collection_name: str):
+        return os.path.join(self.db_path, collection_name)
+
+    def get_index(self, collection_name: str) -> BM25Index:
+        index = self.indexes.get(collection_name)
+        if index is not None:
+            return index
+
+        # indexes are opened lazily, a collection nobody queries costs nothing
+        with self.lock:
+            index = self.indexes.get(collection_name)
+            if index is None:
+                index = BM25Index(self.get_index_path(collection_name), read_only=self.read_only)
+                self.indexes[collection_name] = index
+            return index
+
+    def upsert(self, collection_name: str, record_ids: list, texts: list, metadatas: list):
+        self.get_index(collection_name).upsert(record_ids, texts, metadatas)
+
+    def delete(self, collection_name: str, record_ids: list):
+        self.get_index(collection_name).delete(record_ids)
+
+    def delete_by_filter(self, collection_name: str, metadata_filter: dict):
+        index = self.get_index(collection_name)
+        index.delete(index.get_ids(metadata_filter=metadata_filter))
+
+    def missing_ids(self, collection_name: str, record_ids: list):
+        return self.get_index(collection_name).missing_ids(record_ids)
+
+    def search(self, collection_name: str, query: str, limit: int, metadata_filter: dict = None):
+        if collection_name not in self.indexes and not os.path.isdir(self.get_index_path(collection_name)):
+            return None
+
+        try:
+            index = self.get_index(collection_name)
+            if self.read_only:
+                # a replica catches up with the writer before every search
+                index.refresh()
+            return index.search(query, limit=limit, metadata_filter=metadata_filter)
+        except Exception as e:
+            self.logger.error(f"Lexical search failed: {e}")
+            return None
+
+    def delete_collection(self, collection_name: str):
+        if self.read_only:
+            raise RuntimeError(f"{self.db_path} is opened as a read replica, only the writer changes it")
+        with self.lock:
+            index = self.indexes.pop(collection_name, None)
+            if index is not None:
+                index.close()
+            if os.path.isdir(self.get_index_path(collection_name)):
+                shutil.rmtree(self.get_index_path(collection_name))
+
+    def close(self):
+        with self.lock:
+            for index in self.indexes.values():
+                index.close()
+            self.indexes = {}
@@ -0,0 +1,2 @@
+from .BM25Index import BM25Index
+from .BM25Store import BM25Store
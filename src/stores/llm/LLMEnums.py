@@ -10,4 +10,8 @@ class OpenAIEnums(Enum):
 
 class DocumentTypeEnum(Enum):
     DOCUMENT = "document"
-    QUERY = "query"
\ No newline at end of file
+    QUERY = "query"
+
+class LLMRoleEnums(Enum):
+    GENERATION = "generation"
+    EMBEDDING = "embedding"
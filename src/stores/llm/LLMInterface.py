@@ -12,7 +12,7 @@ class LLMInterface(ABC):
 
     @abstractmethod
     def generate_text(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
-                            temperature: float = None):
+                            temperature: float = None, truncate_input: bool = True):
         pass
 
     @abstractmethod
@@ -20,5 +20,27 @@ class LLMInterface(ABC):
         pass
 
     @abstractmethod
-    def construct_prompt(self, prompt: str, role: str):
+    def embed_many(self, texts: list, document_type: str = None):
+        pass
+
+    @abstractmethod
+    async def agenerate_text(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
+                                   temperature: float = None, truncate_input: bool = True):
+        pass
+
+    @abstractmethod
+    def astream_text(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
+                           temperature: float = None, truncate_input: bool = True):
+        pass
+
+    @abstractmethod
+    async def aembed_text(self, text: str, document_type: str = None):
+        pass
+
+    @abstractmethod
+    async def aembed_many(self, texts: list, document_type: str = None):
+        pass
+
+    @abstractmethod
+    def construct_prompt(self, prompt: str, role: str, truncate: bool = True):
         pass
\ No newline at end of file
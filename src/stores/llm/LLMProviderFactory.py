@@ -1,18 +1,120 @@
-from .LLMEnums import LLMEnums
-from .providers import OpenAIProvider
+from .LLMEnums import LLMEnums, LLMRoleEnums
+from .providers import OpenAIProvider, CachedEmbeddingProvider
+from .balancer import BalancedTransport
+from stores.cache import EmbeddingCache
+from controllers.BaseController import BaseController
+import httpx
 
 class LLMProviderFactory:
     def __init__(self, config: dict):
         self.config = config
+        self.http_client = None
+        self.balancers = {}
+        self.balanced_clients = {}
+        self.embedding_cache = None
+
+    def get_limits(self):
+        return httpx.Limits(
+            max_connections=self.config.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=self.config.LLM_MAX_KEEPALIVE_CONNECTIONS,
+        )
+
+    def get_timeout(self):
+        return httpx.Timeout(
+            self.config.LLM_REQUEST_TIMEOUT,
+            connect=self.config.LLM_CONNECT_TIMEOUT,
+        )
+
+    def get_http_client(self):
+        # one pooled client per factory, shared by the generation and embedding providers
+        if self.http_client is None:
+            self.http_client = httpx.AsyncClient(limits=self.get_limits(), timeout=self.get_timeout())
+
+        return self.http_client
+
+    def get_role_urls(self, role: str):
+        if role == LLMRoleEnums.GENERATION.value:
+            return self.config.GENERATION_API_URLS
+        if role == LLMRoleEnums.EMBEDDING.value:
+            return self.config.EMBEDDING_API_URLS
+        return None
+
+    def get_balanced_client(self, role: str):
+        # a role with its own pool of servers gets a client that spreads the requests over them
+        urls = self.get_role_urls(role)
+        if not urls:
+            return None
+
+        if role not in self.balanced_clients:
+            transport = BalancedTransport(
+                name=role,
+                backends=urls,
+                limits=self.get_limits(),
+                health_check_interval=self.config.LLM_HEALTH_CHECK_INTERVAL,
+                eject_failures=self.config.LLM_EJECT_FAILURES,
+                eject_seconds=self.config.LLM_EJECT_SECONDS,
+            )
+            self.balancers[role] = transport
+            self.balanced_clients[role] = httpx.AsyncClient(transport=transport, timeout=self.get_timeout())
+
+        return self.balanced_clients[role]
+
+    def balancer_stats(self):
+        return {role: balancer.stats() for role, balancer in self.balancers.items()}
+
+    def create(self, provider: str, role: str = None):
+        base_url = self.config.OPENAI_API_URL or None
+        async_base_url = None
+        http_client = self.get_balanced_client(role)
+        if http_client is not None:
+            # the balancer resolves this placeholder host to one backend per request
+            async_base_url = f"http://{role}.pool/"
+            # the sync client has no balancer, it goes straight to the heaviest server of the pool
+            urls = self.get_role_urls(role)
+            base_url = max(urls, key=urls.get)
+        else:
+            http_client = self.get_http_client()
 
-    def create(self, provider: str):
         if provider == LLMEnums.OPENAI.value:
             return OpenAIProvider(
                 api_key = self.config.OPENAI_API_KEY,
-                #base_url = self.config.OPENAI_API_URL,
+                base_url = base_url,
                 default_input_max_characters=self.config.INPUT_DAFAULT_MAX_CHARACTERS,
                 default_generation_max_output_tokens=self.config.GENERATION_DAFAULT_MAX_TOKENS,
-                default_generation_temperature=self.config.GENERATION_DAFAULT_TEMPERATURE
+                default_generation_temperature=self.config.GENERATION_DAFAULT_TEMPERATURE,
+                embedding_batch_max_items=self.config.EMBEDDING_BATCH_MAX_ITEMS,
+                embedding_batch_max_tokens=self.config.EMBEDDING_BATCH_MAX_TOKENS,
+                embedding_batch_concurrency=self.config.EMBEDDING_BATCH_CONCURRENCY,
+                http_client=http_client,
+                async_base_url=async_base_url
             )
 
-        return None
\ No newline at end of file
+        return None
+
+    def create_cached(self, provider: str, role: str = None):
+        client = self.create(provider=provider, role=role)
+        if client is None or not self.config.EMBEDDING_CACHE_ENABLED:
+            return client
+
+        if self.embedding_cache is None:
+            self.embedding_cache = EmbeddingCache(
+                db_path=BaseController().get_database_path(db_name=self.config.EMBEDDING_CACHE_PATH),
+                max_memory_items=self.config.EMBEDDING_CACHE_MEMORY_ITEMS,
+                max_disk_bytes=self.config.EMBEDDING_CACHE_MAX_DISK_MB * 1048576,
+            )
+
+        return CachedEmbeddingProvider(provider=client, cache=self.embedding_cache)
+
+    async def close(self):
+        if self.http_client is not None:
+            await self.http_client.aclose()
+            self.http_client = None
+
+        for client in self.balanced_clients.values():
+            await client.aclose()
+        self.balancers = {}
+        self.balanced_clients = {}
+
+        if self.embedding_cache is not None:
+            self.embedding_cache.close()
+            self.embedding_cache = None
@@ -0,0 +1,38 @@
+import httpx
+
+class Backend:
+
+    # one OpenAI compatible server of a pool, it keeps its own connections alive between requests
+    def __init__(self, base_url: str, weight: float, limits: httpx.Limits):
+        self.base_url = httpx.URL(base_url.rstrip("/") + "/")
+        self.weight = float(weight)
+        self.transport = httpx.AsyncHTTPTransport(limits=limits)
+
+        self.outstanding = 0
+        self.requests = 0
+        self.failures_total = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+
+    def is_healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def load(self) -> float:
+        # the request about to be sent counts, an idle pool still prefers the heavier backends
+        return (self.outstanding + 1) / self.weight
+
+    def make_url(self, path: str) -> httpx.URL:
+        return self.base_url.join(path)
+
+    def stats(self, now: float) -> dict:
+        return {
+            "url": str(self.base_url),
+            "weight": self.weight,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures_total,
+            "healthy": self.is_healthy(now),
+        }
+
+    async def aclose(self):
+        await self.transport.aclose()
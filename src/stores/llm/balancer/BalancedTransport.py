@@ -0,0 +1,172 @@
+from .Backend import Backend
+import logging
+import asyncio
+import httpx
+import time
+
+class BackendStream(httpx.AsyncByteStream):
+
+    # a backend stays busy until its response body is read, streamed answers included
+    def __init__(self, stream: httpx.AsyncByteStream, backend: Backend, transport):
+        self.stream = stream
+        self.backend = backend
+        self.transport = transport
+        self.closed = False
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self.stream:
+                yield chunk
+        except httpx.TransportError:
+            self.transport.record_failure(self.backend)
+            raise
+
+    async def aclose(self):
+        try:
+            await self.stream.aclose()
+        finally:
+            if not self.closed:
+                self.closed = True
+                self.backend.outstanding -= 1
+
+
+class BalancedTransport(httpx.AsyncBaseTransport):
+
+    # sends every request to the least busy healthy backend of the pool
+    def __init__(self, name: str, backends: dict, limits: httpx.Limits,
+                       health_check_interval: float = 5.0, health_check_timeout: float = 2.0,
+                       eject_failures: int = 3, eject_seconds: float = 30.0):
+        self.name = name
+        self.backends = [Backend(base_url=url, weight=weight, limits=limits) for url, weight in backends.items()]
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self.eject_failures = eject_failures
+        self.eject_seconds = eject_seconds
+
+        self.turn = 0
+        self.health_task = None
+        self.logger = logging.getLogger(__name__)
+
+        if not self.backends:
+            raise ValueError(f"No backend configured for the {name} pool")
+        if any(backend.weight <= 0 for backend in self.backends):
+            raise ValueError(f"Backend weights of the {name} pool must be positive")
+
+    def pick(self, exclude: list):
+        now = time.monotonic()
+        candidates = [
+            backend for backend in self.backends
+            if backend not in exclude and backend.is_healthy(now)
+        ]
+        if not candidates:
+            # with every backend ejected a request that may succeed beats one that surely fails
+            candidates = [backend for backend in self.backends if backend not in exclude]
+        if not candidates:
+            return None
+
+        least = min(backend.load() for backend in candidates)
+        tied = [backend for backend in candidates if backend.load() == least]
+
+        # ties rotate, sequential traffic still reaches every replica
+        self.turn += 1
+        return tied[self.turn % len(tied)]
+
+    def record_failure(self, backend: Backend):
+        backend.failures_total += 1
+        backend.failures += 1
+
+        now = time.monotonic()
+        if backend.failures >= self.eject_failures and backend.is_healthy(now):
+            backend.ejected_until = now + self.eject_seconds
+            self.logger.warning(
+                f"Ejected {backend.base_url} from the {self.name} pool for {self.eject_seconds}s "
+                f"after {backend.failures} failures"
+            )
+
+    def record_success(self, backend: Backend):
+        backend.failures = 0
+        if not backend.is_healthy(time.monotonic()):
+            backend.ejected_until = 0.0
+            self.logger.info(f"Restored {backend.base_url} to the {self.name} pool")
+
+    def start_health_check(self):
+        if self.health_task is None and self.health_check_interval > 0:
+            self.health_task = asyncio.create_task(self.health_check())
+
+    async def health_check(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            await asyncio.gather(*[self.check_backend(backend) for backend in self.backends])
+
+    async def check_backend(self, backend: Backend):
+        request = httpx.Request(
+            "GET", backend.make_url("models"),
+            extensions={"timeout": httpx.Timeout(self.health_check_timeout).as_dict()}
+        )
+        try:
+            response = await backend.transport.handle_async_request(request)
+            await response.aread()
+            await response.aclose()
+        except httpx.TransportError:
+            self.record_failure(backend)
+            return
+
+        # servers without a models endpoint are still up, only server errors count
+        if response.status_code >= 500:
+            self.record_failure(backend)
+        else:
+            self.record_success(backend)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.start_health_check()
+
+        # the client talks to a placeholder host, the path is resolved against the chosen backend
+        path = request.url.raw_path.decode("ascii").lstrip("/")
+        tried = []
+
+        while True:
+            backend = self.pick(exclude=tried)
+            tried.append(backend)
+
+            request.url = backend.make_url(path)
+            request.headers["Host"] = request.url.netloc.decode("ascii")
+
+            backend.outstanding += 1
+            backend.requests += 1
+            try:
+                response = await backend.transport.handle_async_request(request)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                backend.outstanding -= 1
+                self.record_failure(backend)
+                # nothing reached the backend, the next one can take the request as is
+                if len(tried) < len(self.backends):
+                    continue
+                raise
+            except httpx.TransportError:
+                backend.outstanding -= 1
+                self.record_failure(backend)
+                raise
+            except BaseException:
+                backend.outstanding -= 1
+                raise
+
+            if response.status_code >= 500:
+                self.record_failure(backend)
+            else:
+                self.record_success(backend)
+
+            response.stream = BackendStream(response.stream, backend=backend, transport=self)
+            return response
+
+    def stats(self):
+        now = time.monotonic()
+        return [backend.stats(now) for backend in self.backends]
+
+    async def aclose(self):
+        if self.health_task is not None:
+            self.health_task.cancel()
+            await asyncio.gather(self.health_task, return_exceptions=True)
+            self.health_task = None
+
+        for backend in self.backends:
+            await backend.aclose()
@@ -0,0 +1,2 @@
+from .Backend import Backend
+from .BalancedTransport import BalancedTransport
@@ -0,0 +1,104 @@
+from ..LLMInterface import LLMInterface
+from stores.cache import EmbeddingCache
+import asyncio
+
+class CachedEmbeddingProvider(LLMInterface):
+
+    def __init__(self, provider: LLMInterface, cache: EmbeddingCache):
+        self.provider = provider
+        self.cache = cache
+
+    def __getattr__(self, name: str):
+        # everything not related to embeddings goes straight to the wrapped provider
+        return getattr(self.provider, name)
+
+    def set_generation_model(self, model_id: str):
+        self.provider.set_generation_model(model_id=model_id)
+
+    def set_embedding_model(self, model_id: str, embedding_size: int):
+        self.provider.set_embedding_model(model_id=model_id, embedding_size=embedding_size)
+
+    def generate_text(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
+                            temperature: float = None, truncate_input: bool = True):
+        return self.provider.generate_text(prompt=prompt, chat_history=chat_history,
+                                           max_output_tokens=max_output_tokens,
+                                           temperature=temperature,
+                                           truncate_input=truncate_input)
+
+    async def agenerate_text(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
+                                   temperature: float = None, truncate_input: bool = True):
+        return await self.provider.agenerate_text(prompt=prompt, chat_history=chat_history,
+                                                  max_output_tokens=max_output_tokens,
+                                                  temperature=temperature,
+                                                  truncate_input=truncate_input)
+
+    def astream_text(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
+                           temperature: float = None, truncate_input: bool = True):
+        return self.provider.astream_text(prompt=prompt, chat_history=chat_history,
+                                          max_output_tokens=max_output_tokens,
+                                          temperature=temperature,
+                                          truncate_input=truncate_input)
+
+    def construct_prompt(self, prompt: str, role: str, truncate: bool = True):
+        return self.provider.construct_prompt(prompt=prompt, role=role, truncate=truncate)
+
+    def cache_stats(self):
+        return self.cache.stats()
+
+    def lookup(self, texts: list):
+        keys = [
+            self.cache.make_key(self.provider.embedding_model_id, self.provider.embedding_size, text)
+            if text else None
+            for text in texts
+        ]
+        cached = self.cache.get_many([key for key in keys if key])
+        vectors = [cached.get(key) if key else None for key in keys]
+
+        # identical chunks inside one call are only embedded once
+        pending = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if key and vector is None and key not in pending:
+                pending[key] = text
+
+        return keys, vectors, pending
+
+    def merge(self, keys: list, vectors: list, pending: dict, new_vectors: list):
+        fresh = {
+            key: vector
+            for key, vector in zip(pending.keys(), new_vectors)
+            if vector is not None
+        }
+        merged = [
+            vector if vector is not None else fresh.get(key)
+            for key, vector in zip(keys, vectors)
+        ]
+        return merged, fresh
+
+    def embed_text(self, text: str, document_type: str = None):
+        return self.embed_many([text], document_type=document_type)[0]
+
+    def embed_many(self, texts: list, document_type: str = None):
+        keys, vectors, pending = self.lookup(texts)
+        if not pending:
+            return vectors
+
+        new_vectors = self.provider.embed_many(list(pending.values()), document_type=document_type)
+        vectors, fresh = self.merge(keys, vectors, pending, new_vectors)
+        self.cache.put_many(fresh)
+
+        return vectors
+
+    async def aembed_text(self, text: str, document_type: str = None):
+        vectors = await self.aembed_many([text], document_type=document_type)
+        return vectors[0]
+
+    async def aembed_many(self, texts: list, document_type: str = None):
+        keys, vectors, pending = await asyncio.to_thread(self.lookup, texts)
+        if not pending:
+            return vectors
+
+        new_vectors = await self.provider.aembed_many(list(pending.values()), document_type=document_type)
+        vectors, fresh = self.merge(keys, vectors, pending, new_vectors)
+        await asyncio.to_thread(self.cache.put_many, fresh)
+
+        return vectors
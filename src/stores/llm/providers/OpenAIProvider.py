@@ -1,6 +1,10 @@
 from ..LLMInterface import LLMInterface
 from ..LLMEnums import OpenAIEnums
+from helpers.metrics import TOKENS
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
 import openai 
+import httpx
 import logging
 
 class OpenAIProvider(LLMInterface):
@@ -8,21 +12,40 @@ class OpenAIProvider(LLMInterface):
     def __init__(self, api_key: str, base_url: str=None,
                        default_input_max_characters: int=1000,
                        default_generation_max_output_tokens: int=1000,
-                       default_generation_temperature: float=0.1):
+                       default_generation_temperature: float=0.1,
+                       embedding_batch_max_items: int=256,
+                       embedding_batch_max_tokens: int=100000,
+                       embedding_batch_concurrency: int=4,
+                       http_client: httpx.AsyncClient=None,
+                       async_base_url: str=None):
         
         self.api_key = api_key
-        #self.base_url = base_url
+        self.base_url = base_url
         self.default_input_max_characters = default_input_max_characters
         self.default_generation_max_output_tokens = default_generation_max_output_tokens
         self.default_generation_temperature = default_generation_temperature
 
+        self.embedding_batch_max_items = embedding_batch_max_items
+        self.embedding_batch_max_tokens = embedding_batch_max_tokens
+        self.embedding_batch_concurrency = embedding_batch_concurrency
 
         self.generation_model_id = None
         self.embedding_model_id = None
         self.embedding_size = None
 
-        openai.api_key = api_key
-        self.client = openai
+        # every provider has its own clients, the module level openai settings are never touched
+        self.client = openai.OpenAI(
+            api_key=api_key,
+            base_url=base_url
+        )
+
+        # the async client shares the pooled http client handed over by the factory
+        # with a balanced http client its base url is a placeholder only the balancer resolves
+        self.async_client = openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=async_base_url or base_url,
+            http_client=http_client
+        )
 
         self.logger = logging.getLogger(__name__)
 
@@ -34,12 +57,22 @@ class OpenAIProvider(LLMInterface):
         self.embedding_model_id = model_id
         self.embedding_size = embedding_size
 
+    def record_usage(self, response, prompt_kind: str):
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+
+        if getattr(usage, "prompt_tokens", None):
+            TOKENS.labels(prompt_kind).inc(usage.prompt_tokens)
+        if getattr(usage, "completion_tokens", None):
+            TOKENS.labels("completion").inc(usage.completion_tokens)
+
     def process_text(self, text: str):
         return text[:self.default_input_max_characters].strip()
         
 
     def generate_text(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
-                            temperature: float = None):
+                            temperature: float = None, truncate_input: bool = True):
         
         if not self.client:
             self.logger.error("OpenAI client was not set")
@@ -52,13 +85,13 @@ class OpenAIProvider(LLMInterface):
         max_output_tokens = max_output_tokens if max_output_tokens else self.default_generation_max_output_tokens
         temperature = temperature if temperature else self.default_generation_temperature
 
-        chat_history.append(
-            self.construct_prompt(prompt=prompt, role=OpenAIEnums.USER.value)
-        )
+        messages = list(chat_history) + [
+            self.construct_prompt(prompt=prompt, role=OpenAIEnums.USER.value, truncate=truncate_input)
+        ]
 
         response = self.client.chat.completions.create(
             model = self.generation_model_id,
-            messages = chat_history,
+            messages = messages,
             max_tokens = max_output_tokens,
             temperature = temperature
         )
@@ -67,6 +100,7 @@ class OpenAIProvider(LLMInterface):
             self.logger.error("Error while generating text with OpenAI")
             return None
 
+        self.record_usage(response, prompt_kind="prompt")
         return response.choices[0].message.content
 
     def embed_text(self, text: str, document_type: str = None):
@@ -90,9 +124,227 @@ class OpenAIProvider(LLMInterface):
 
         return response.data[0].embedding
 
-    def construct_prompt(self, prompt: str, role: str):
+    def estimate_tokens(self, text: str):
+        # rough approximation for english text, good enough to size requests
+        return len(text) // 4 + 1
+
+    def pack_embedding_batches(self, texts: list):
+        batches = []
+        current_batch = []
+        current_tokens = 0
+
+        for idx, text in enumerate(texts):
+            if not text:
+                continue
+
+            tokens = self.estimate_tokens(text)
+            if current_batch and (len(current_batch) >= self.embedding_batch_max_items
+                                  or current_tokens + tokens > self.embedding_batch_max_tokens):
+                batches.append(current_batch)
+                current_batch = []
+                current_tokens = 0
+
+            current_batch.append(idx)
+            current_tokens += tokens
+
+        if current_batch:
+            batches.append(current_batch)
+
+        return batches
+
+    def embed_batch(self, texts: list):
+        try:
+            response = self.client.embeddings.create(
+                model = self.embedding_model_id,
+                input = texts,
+            )
+        except openai.BadRequestError as e:
+            if len(texts) == 1:
+                self.logger.error(f"Error while embedding text with OpenAI: {e}")
+                return [None]
+            # one bad input rejects the whole request, retry item by item to isolate it
+            return [vector for text in texts for vector in self.embed_batch([text])]
+
+        vectors = [None] * len(texts)
+        if not response or not response.data:
+            self.logger.error("Error while embedding batch with OpenAI")
+            return vectors
+
+        self.record_usage(response, prompt_kind="embedding")
+        for item in response.data:
+            vectors[item.index] = item.embedding
+
+        return vectors
+
+    def embed_many(self, texts: list, document_type: str = None):
+
+        vectors = [None] * len(texts)
+
+        if not self.client:
+            self.logger.error("OpenAI client was not set")
+            return vectors
+
+        if not self.embedding_model_id:
+            self.logger.error("Embedding model for OpenAI was not set")
+            return vectors
+
+        batches = self.pack_embedding_batches(texts)
+
+        with ThreadPoolExecutor(max_workers=self.embedding_batch_concurrency) as executor:
+            futures = {
+                executor.submit(self.embed_batch, [texts[idx] for idx in batch]): batch
+                for batch in batches
+            }
+
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    batch_vectors = future.result()
+                except Exception as e:
+                    self.logger.error(f"Embedding batch of {len(batch)} items failed: {e}")
+                    continue
+
+                for idx, vector in zip(batch, batch_vectors):
+                    vectors[idx] = vector
+
+        return vectors
+
+    async def agenerate_text(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
+                                   temperature: float = None, truncate_input: bool = True):
+
+        if not self.async_client:
+            self.logger.error("OpenAI async client was not set")
+            return None
+
+        if not self.generation_model_id:
+            self.logger.error("Generation model for OpenAI was not set")
+            return None
+
+        max_output_tokens = max_output_tokens if max_output_tokens else self.default_generation_max_output_tokens
+        temperature = temperature if temperature else self.default_generation_temperature
+
+        messages = list(chat_history) + [
+            self.construct_prompt(prompt=prompt, role=OpenAIEnums.USER.value, truncate=truncate_input)
+        ]
+
+        try:
+            response = await self.async_client.chat.completions.create(
+                model = self.generation_model_id,
+                messages = messages,
+                max_tokens = max_output_tokens,
+                temperature = temperature
+            )
+        except openai.OpenAIError as e:
+            self.logger.error(f"Error while generating text with OpenAI: {e}")
+            return None
+
+        if not response or not response.choices or len(response.choices) == 0 or not response.choices[0].message:
+            self.logger.error("Error while generating text with OpenAI")
+            return None
+
+        self.record_usage(response, prompt_kind="prompt")
+        return response.choices[0].message.content
+
+    async def astream_text(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
+                                 temperature: float = None, truncate_input: bool = True):
+
+        if not self.async_client:
+            self.logger.error("OpenAI async client was not set")
+            return
+
+        if not self.generation_model_id:
+            self.logger.error("Generation model for OpenAI was not set")
+            return
+
+        max_output_tokens = max_output_tokens if max_output_tokens else self.default_generation_max_output_tokens
+        temperature = temperature if temperature else self.default_generation_temperature
+
+        messages = list(chat_history) + [
+            self.construct_prompt(prompt=prompt, role=OpenAIEnums.USER.value, truncate=truncate_input)
+        ]
+
+        stream = await self.async_client.chat.completions.create(
+            model = self.generation_model_id,
+            messages = messages,
+            max_tokens = max_output_tokens,
+            temperature = temperature,
+            stream = True
+        )
+
+        try:
+            async for chunk in stream:
+                if not chunk.choices or not chunk.choices[0].delta:
+                    continue
+                if chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # closing the response drops the connection so the server stops generating
+            await stream.close()
+
+    async def aembed_text(self, text: str, document_type: str = None):
+        vectors = await self.aembed_many([text], document_type=document_type)
+        return vectors[0]
+
+    async def aembed_batch(self, texts: list):
+        try:
+            response = await self.async_client.embeddings.create(
+                model = self.embedding_model_id,
+                input = texts,
+            )
+        except openai.BadRequestError as e:
+            if len(texts) == 1:
+                self.logger.error(f"Error while embedding text with OpenAI: {e}")
+                return [None]
+            vectors = []
+            for text in texts:
+                vectors.extend(await self.aembed_batch([text]))
+            return vectors
+
+        vectors = [None] * len(texts)
+        if not response or not response.data:
+            self.logger.error("Error while embedding batch with OpenAI")
+            return vectors
+
+        self.record_usage(response, prompt_kind="embedding")
+        for item in response.data:
+            vectors[item.index] = item.embedding
+
+        return vectors
+
+    async def aembed_many(self, texts: list, document_type: str = None):
+
+        vectors = [None] * len(texts)
+
+        if not self.async_client:
+            self.logger.error("OpenAI async client was not set")
+            return vectors
+
+        if not self.embedding_model_id:
+            self.logger.error("Embedding model for OpenAI was not set")
+            return vectors
+
+        semaphore = asyncio.Semaphore(self.embedding_batch_concurrency)
+
+        async def run_batch(batch: list):
+            async with semaphore:
+                try:
+                    batch_vectors = await self.aembed_batch([texts[idx] for idx in batch])
+                except Exception as e:
+                    self.logger.error(f"Embedding batch of {len(batch)} items failed: {e}")
+                    return
+
+            for idx, vector in zip(batch, batch_vectors):
+                vectors[idx] = vector
+
+        await asyncio.gather(*[
+            run_batch(batch) for batch in self.pack_embedding_batches(texts)
+        ])
+
+        return vectors
+
+    def construct_prompt(self, prompt: str, role: str, truncate: bool = True):
         return {
             "role": role,
-            "content": self.process_text(prompt)
+            "content": self.process_text(prompt) if truncate else prompt.strip()
         }
     
\ No newline at end of file
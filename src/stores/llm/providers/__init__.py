@@ -1 +1,2 @@
-from .OpenAIProvider import OpenAIProvider
\ No newline at end of file
+from .OpenAIProvider import OpenAIProvider
+from .CachedEmbeddingProvider import CachedEmbeddingProvider
\ No newline at end of file
@@ -0,0 +1,151 @@
+import logging
+import re
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+
+# tokenizers loaded by load_encoding, keyed by model id, a failed load is kept as None
+encodings = {}
+
+
+def load_encoding(model_id: str = None):
+    # may download the BPE file on a cold cache, called once at startup off the event loop
+    if tiktoken is None:
+        return None
+
+    if model_id in encodings:
+        return encodings[model_id]
+
+    encoding = None
+    try:
+        encoding = tiktoken.encoding_for_model(model_id)
+    except Exception:
+        try:
+            encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            logger.warning(f"No tokenizer available, token counts are approximated: {e}")
+
+    encodings[model_id] = encoding
+    return encoding
+
+
+def get_encoding(model_id: str = None):
+    # never loads on the request path, the approximation holds until load_encoding is done
+    return encodings.get(model_id)
+
+
+class ContextBuilder:
+
+    sentence_pattern = re.compile(r"(?<=[.!?;:])\s+|\n+")
+    # the longest overlap looked for when two neighbouring chunks are merged
+    max_overlap_characters = 2000
+    # a trimmed chunk shorter than this is not worth the separator
+    min_chunk_tokens = 16
+
+    def __init__(self, max_tokens: int, model_id: str = None):
+        self.max_tokens = max_tokens
+        self.encoding = get_encoding(model_id)
+
+    def count_tokens(self, text: str):
+        if not text:
+            return 0
+
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+
+        # about four characters per token for english text
+        return len(text) // 4 + 1
+
+    def trim_to_budget(self, text: str, budget: int):
+        # keep whole leading sentences only, a cut mid-sentence reads as a different claim
+        kept = []
+        used = 0
+        for sentence in self.sentence_pattern.split(text):
+            if not sentence.strip():
+                continue
+            tokens = self.count_tokens(sentence) + 1
+            if used + tokens > budget:
+                break
+            kept.append(sentence.strip())
+            used += tokens
+
+        return " ".join(kept), used
+
+    def join_overlapping(self, first: str, second: str):
+        # chunking with an overlap repeats the tail of a chunk at the head of the next one
+        longest = min(len(first), len(second), self.max_overlap_characters)
+        for size in range(longest, 0, -1):
+            if first.endswith(second[:size]):
+                return first + second[size:]
+        return first + "\n" + second
+
+    def find_group(self, groups: list, metadata: dict):
+        file_id = metadata.get("file_id")
+        chunk_index = metadata.get("chunk_index")
+        if file_id is None or chunk_index is None:
+            return None
+
+        for group in groups:
+            if group["file_id"] != file_id or None in group["chunks"]:
+                continue
+            if chunk_index in (min(group["chunks"]) - 1, max(group["chunks"]) + 1):
+                return group
+        return None
+
+    def build(self, question: str, search_results: dict, prompt_template):
+        # the question is always kept, the context gets whatever budget is left
+        base_prompt = prompt_template.create_question_prompt(question, "")
+        budget = self.max_tokens - self.count_tokens(base_prompt)
+
+        groups = []
+        used_chunks = 0
+        documents = search_results["documents"][0] if search_results else []
+        metadatas = search_results["metadatas"][0] if search_results else []
+
+        # rank order decides what gets in, the highest ranked chunks are never dropped for lower ones
+        for document, metadata in zip(documents, metadatas):
+            if budget < self.min_chunk_tokens:
+                break
+
+            document = (document or "").strip()
+            tokens = self.count_tokens(document) + 1
+            if tokens > budget:
+                document, tokens = self.trim_to_budget(document, budget)
+                if tokens < self.min_chunk_tokens:
+                    break
+
+            budget -= tokens
+            used_chunks += 1
+
+            metadata = metadata or {}
+            group = self.find_group(groups, metadata)
+            if group is None:
+                groups.append({
+                    "file_id": metadata.get("file_id"),
+                    "chunks": {metadata.get("chunk_index"): document},
+                })
+            else:
+                group["chunks"][metadata.get("chunk_index")] = document
+
+        passages = []
+        for group in groups:
+            # neighbours from the same file are read as one passage, in document order
+            texts = [group["chunks"][idx] for idx in sorted(group["chunks"], key=lambda idx: (idx is None, idx))]
+            passage = texts[0]
+            for text in texts[1:]:
+                passage = self.join_overlapping(passage, text)
+            passages.append(passage)
+
+        prompt = prompt_template.create_question_prompt(question, "\n\n".join(passages))
+
+        return {
+            "prompt": prompt,
+            "prompt_tokens": self.count_tokens(prompt),
+            "chunks_used": used_chunks,
+            "chunks_retrieved": len(documents),
+        }
@@ -0,0 +1,71 @@
+import numpy as np
+import re
+
+
+class MMRReranker:
+
+    whitespace_pattern = re.compile(r"\s+")
+
+    def __init__(self, mmr_lambda: float = 0.7):
+        # 1.0 keeps the pure relevance order, lower values trade relevance for diversity
+        self.mmr_lambda = mmr_lambda
+
+    @classmethod
+    def normalize_text(cls, text: str):
+        return cls.whitespace_pattern.sub(" ", text or "").strip().lower()
+
+    def drop_contained(self, documents: list):
+        # overlapping chunks often repeat a neighbour entirely, keep the larger one
+        texts = [self.normalize_text(document) for document in documents]
+        order = sorted(range(len(texts)), key=lambda idx: len(texts[idx]), reverse=True)
+
+        kept = []
+        for idx in order:
+            if not any(texts[idx] in texts[other] for other in kept):
+                kept.append(idx)
+
+        return sorted(kept)
+
+    def select(self, query_vector: list, vectors: np.ndarray, top_k: int):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / max(np.linalg.norm(query), 1e-12)
+
+        relevance = vectors @ query
+        similarity = vectors @ vectors.T
+
+        selected = []
+        max_similarity = np.full(len(vectors), -np.inf, dtype=np.float32)
+        available = np.ones(len(vectors), dtype=bool)
+
+        for _ in range(min(top_k, len(vectors))):
+            redundancy = np.where(np.isfinite(max_similarity), max_similarity, 0)
+            scores = self.mmr_lambda * relevance - (1 - self.mmr_lambda) * redundancy
+            scores[~available] = -np.inf
+
+            pick = int(np.argmax(scores))
+            selected.append(pick)
+            available[pick] = False
+            max_similarity = np.maximum(max_similarity, similarity[pick])
+
+        return selected
+
+    def rerank(self, search_results: dict, top_k: int, query_vector: list = None):
+        if not search_results or not search_results["ids"][0]:
+            return search_results
+
+        keep = self.drop_contained(search_results["documents"][0])
+
+        vectors = search_results.get("embeddings")
+        if query_vector is not None and vectors is not None and vectors[0] is not None:
+            candidate_vectors = np.asarray(vectors[0], dtype=np.float32)[keep]
+            keep = [keep[idx] for idx in self.select(query_vector, candidate_vectors, top_k)]
+        else:
+            # nothing to measure redundancy with, the rank order stands
+            keep = keep[:top_k]
+
+        return {
+            key: [[search_results[key][0][idx] for idx in keep]]
+            for key in ["ids", "documents", "metadatas", "distances"]
+        }
@@ -0,0 +1,29 @@
+class RankFusion:
+
+    def __init__(self, k: int = 60):
+        # the usual reciprocal rank fusion constant, damps the weight of the very top ranks
+        self.k = k
+
+    def fuse(self, results_list: list, limit: int):
+        fused = {}
+        for results in results_list:
+            if not results or not results["ids"][0]:
+                continue
+
+            for rank, (record_id, document, metadata) in enumerate(zip(
+                results["ids"][0], results["documents"][0], results["metadatas"][0]
+            )):
+                entry = fused.setdefault(record_id, {"score": 0.0, "document": document, "metadata": metadata})
+                entry["score"] += 1.0 / (self.k + rank + 1)
+
+        if not fused:
+            return None
+
+        rows = sorted(fused.items(), key=lambda item: item[1]["score"], reverse=True)[:limit]
+
+        return {
+            "ids": [[record_id for record_id, _ in rows]],
+            "documents": [[entry["document"] for _, entry in rows]],
+            "metadatas": [[entry["metadata"] for _, entry in rows]],
+            "distances": [[-entry["score"] for _, entry in rows]],
+        }
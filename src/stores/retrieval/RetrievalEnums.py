@@ -0,0 +1,6 @@
+from enum import Enum
+
+class SearchModeEnums(Enum):
+    VECTOR = "vector"
+    LEXICAL = "lexical"
+    HYBRID = "hybrid"
@@ -0,0 +1,4 @@
+from .RetrievalEnums import SearchModeEnums
+from .RankFusion import RankFusion
+from .MMRReranker import MMRReranker
+from .ContextBuilder import ContextBuilder, load_encoding
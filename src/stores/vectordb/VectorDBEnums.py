@@ -2,7 +2,21 @@ from enum import Enum
 
 class VectorDBEnums(Enum):
     CHROMA = "CHROMA"  
+    NUMPY = "NUMPY"
+
+class VectorDBModeEnums(Enum):
+    # one process owns the store
+    SINGLE = "single"
+    # every worker is a client of a chroma server
+    SERVER = "server"
+    # one worker writes, the others follow its files as read replicas
+    REPLICA = "replica"
 
 class DistanceMethodEnums(Enum):
     COSINE = "cosine"
-    L2 = "l2"
\ No newline at end of file
+    L2 = "l2"
+
+class QuantizationEnums(Enum):
+    NONE = "none"
+    INT8 = "int8"
+    PQ = "pq"
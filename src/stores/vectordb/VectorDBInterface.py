@@ -45,7 +45,28 @@ class VectorDBInterface(ABC):
                           record_ids: list = None, batch_size: int = 50):
         pass
 
+    @abstractmethod
+    def upsert_many(self, collection_name: str, texts: list, 
+                          vectors: list, metadata: list = None, 
+                          record_ids: list = None, batch_size: int = 50):
+        pass
+
+    @abstractmethod
+    def get_records(self, collection_name: str, metadata_filter: dict = None) -> dict:
+        pass
+
+    @abstractmethod
+    def delete_many(self, collection_name: str, record_ids: list):
+        pass
+
+    @abstractmethod
+    def delete_by_filter(self, collection_name: str, metadata_filter: dict):
+        pass
+
     @abstractmethod
     def search_by_vector(self, collection_name: str, vector: list, limit: int):
         pass
-    
\ No newline at end of file
+    
+    @abstractmethod
+    def search_by_vectors(self, collection_name: str, vectors: list, limit: int):
+        pass
@@ -1,5 +1,4 @@
-from .providers import ChromaDBProvider
-from .VectorDBEnums import VectorDBEnums
+from .VectorDBEnums import VectorDBEnums, VectorDBModeEnums
 from controllers.BaseController import BaseController
 
 class VectorDBProviderFactory:
@@ -7,14 +6,45 @@ class VectorDBProviderFactory:
         self.config = config
         self.base_controller = BaseController()
 
-    def create(self, provider: str):
-        
+    def create(self, provider: str, read_only: bool = False):
+        # read_only only matters to the replica mode, it is the default of every worker but the writer
+        mode = self.config.VECTOR_DB_MODE
+
+        if mode not in [e.value for e in VectorDBModeEnums]:
+            raise ValueError(f"Unsupported vector db mode: {mode}")
+
         if provider == VectorDBEnums.CHROMA.value:
+            from .providers.ChromaDBProvider import ChromaDBProvider
+
+            if mode == VectorDBModeEnums.REPLICA.value:
+                raise ValueError("Chroma files cannot be shared by several processes, use the server mode")
+
             db_path = self.base_controller.get_database_path(db_name=self.config.VECTOR_DB_PATH)
 
+            is_server = mode == VectorDBModeEnums.SERVER.value
             return ChromaDBProvider(
                 db_path=db_path,
                 distance_method=self.config.VECTOR_DB_DISTANCE_METHOD,
+                host=self.config.VECTOR_DB_HOST if is_server else None,
+                port=self.config.VECTOR_DB_PORT if is_server else None,
+            )
+
+        if provider == VectorDBEnums.NUMPY.value:
+            from .providers.NumpyDBProvider import NumpyDBProvider
+
+            if mode == VectorDBModeEnums.SERVER.value:
+                raise ValueError("The numpy store has no server, use the replica mode")
+
+            db_path = self.base_controller.get_database_path(db_name=self.config.VECTOR_DB_PATH)
+
+            return NumpyDBProvider(
+                db_path=db_path,
+                distance_method=self.config.VECTOR_DB_DISTANCE_METHOD,
+                compaction_ratio=self.config.VECTOR_DB_COMPACTION_RATIO,
+                quantization=self.config.VECTOR_DB_QUANTIZATION,
+                pq_subspaces=self.config.VECTOR_DB_PQ_SUBSPACES,
+                rescore_factor=self.config.VECTOR_DB_RESCORE_FACTOR,
+                read_only=read_only and mode == VectorDBModeEnums.REPLICA.value,
             )
 
         return None
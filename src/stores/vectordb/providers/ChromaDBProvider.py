@@ -1,4 +1,4 @@
-from chromadb import PersistentClient
+from chromadb import PersistentClient, HttpClient
 from chromadb.config import Settings
 from ..VectorDBInterface import VectorDBInterface
 from ..VectorDBEnums import DistanceMethodEnums
@@ -8,10 +8,15 @@ import os
 
 class ChromaDBProvider(VectorDBInterface):
 
-    def __init__(self, db_path: str, distance_method: str = "cosine"):
+    def __init__(self, db_path: str, distance_method: str = "cosine",
+                       host: str = None, port: int = None):
         self.db_path = db_path
+        self.host = host
+        self.port = port
         self.client: Optional[PersistentClient] = None
         self.distance_method = distance_method
+        # open collection handles, so inserts and searches skip the get_collection round trip
+        self.collections = {}
 
         if self.distance_method not in [e.value for e in DistanceMethodEnums]:
             raise ValueError(f"Unsupported distance method: {self.distance_method}")
@@ -20,38 +25,62 @@ class ChromaDBProvider(VectorDBInterface):
     
 
     def connect(self):
-        self.client = PersistentClient(path=self.db_path)
+        if self.host:
+            # every app worker talks to the same chroma server, it owns the files and serializes the writes
+            self.client = HttpClient(host=self.host, port=self.port)
+        else:
+            self.client = PersistentClient(path=self.db_path)
 
     def disconnect(self):
         self.client = None
+        self.collections = {}
+
+    def get_collection(self, collection_name: str):
+        collection = self.collections.get(collection_name)
+        if collection is None:
+            collection = self.client.get_collection(name=collection_name)
+            self.collections[collection_name] = collection
+        return collection
 
     def is_collection_existed(self, collection_name: str) -> bool:
+        if collection_name in self.collections:
+            return True
         collections = self.client.list_collections()  
-        return collection_name in collections  
+        return collection_name in [collection.name for collection in collections]
 
 
     def list_all_collections(self) -> List:
         return self.client.list_collections()
 
     def get_collection_info(self, collection_name: str) -> Dict[str, Any]:
-        return self.client.get_collection(collection_name=collection_name)
-         
+        collection = self.get_collection(collection_name)
+        return {
+            "name": collection.name,
+            "count": collection.count(),
+            "distance_method": (collection.metadata or {}).get("hnsw:space", self.distance_method),
+        }
+
 
     def delete_collection(self, collection_name: str):
+      self.collections.pop(collection_name, None)
       if self.is_collection_existed(collection_name):  
-         self.client.delete_collection(collection_name=collection_name)
+         self.client.delete_collection(name=collection_name)
 
 
     def create_collection(self, collection_name: str, embedding_size: int, do_reset: bool = False):
         try:
+            if do_reset:
+                self.delete_collection(collection_name=collection_name)
+
             # Use get_or_create_collection to either get the collection or create it if it doesn't exist
             collection = self.client.get_or_create_collection(
                 name=collection_name, 
                 metadata={"hnsw:space": self.distance_method}
             )
-            print(f"Collection '{collection_name}' is ready for use.")
+            self.collections[collection_name] = collection
+            self.logger.debug(f"Collection '{collection_name}' is ready for use.")
         except Exception as e:
-            print(f"Error creating or getting collection: {e}")
+            self.logger.error(f"Error creating or getting collection: {e}")
             raise
 
     
@@ -65,11 +94,13 @@ class ChromaDBProvider(VectorDBInterface):
     ):
 
         try:
-            col = self.client.get_collection(collection_name=collection_name)
+            col = self.get_collection(collection_name)
             col.add(documents=[text], embeddings=[vector], metadatas=[metadata], ids=[record_id])
             return True
         except Exception as e:
             self.logger.error(f"Failed to insert record: {e}")
+            # the handle may be stale if the collection was dropped elsewhere
+            self.collections.pop(collection_name, None)
             return False
 
     def insert_many(
@@ -83,7 +114,7 @@ class ChromaDBProvider(VectorDBInterface):
     ):
 
         try:
-            col = self.client.get_collection(collection_name)
+            col = self.get_collection(collection_name)
 
             if metadata is None:
                 metadata = [{} for _ in texts]
@@ -105,27 +136,139 @@ class ChromaDBProvider(VectorDBInterface):
 
         except Exception as e:
             self.logger.error(f"Failed to insert batch: {e}")
+            # the handle may be stale if the collection was dropped elsewhere
+            self.collections.pop(collection_name, None)
+            return False
+
+    def upsert_many(
+        self,
+        collection_name: str,
+        texts: List[str],
+        vectors: List[List[float]],
+        metadata: Optional[List[Dict[str, Any]]] = None,
+        record_ids: Optional[List[str]] = None,
+        batch_size: int = 50
+    ):
+
+        try:
+            col = self.get_collection(collection_name)
+
+            if metadata is None:
+                metadata = [{} for _ in texts]
+
+            for i in range(0, len(texts), batch_size):
+                col.upsert(
+                    documents=texts[i:i+batch_size],
+                    embeddings=vectors[i:i+batch_size],
+                    metadatas=metadata[i:i+batch_size],
+                    ids=record_ids[i:i+batch_size]
+                )
+
+            return True
+
+        except Exception as e:
+            self.logger.error(f"Failed to upsert batch: {e}")
+            # the handle may be stale if the collection was dropped elsewhere
+            self.collections.pop(collection_name, None)
+            return False
+
+    def get_records(
+        self,
+        collection_name: str,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+
+        try:
+            col = self.get_collection(collection_name)
+            results = col.get(where=metadata_filter, include=["metadatas"])
+            return {"ids": results["ids"], "metadatas": results["metadatas"]}
+        except Exception as e:
+            self.logger.error(f"Failed to get records: {e}")
+            self.collections.pop(collection_name, None)
+            return {"ids": [], "metadatas": []}
+
+    def get_batch(self, collection_name: str, offset: int, limit: int) -> Dict[str, Any]:
+        # everything stored, vectors included, a page at a time
+        col = self.get_collection(collection_name)
+        return col.get(offset=offset, limit=limit, include=["documents", "metadatas", "embeddings"])
+
+    def delete_many(self, collection_name: str, record_ids: List[str], batch_size: int = 500):
+
+        try:
+            col = self.get_collection(collection_name)
+            for i in range(0, len(record_ids), batch_size):
+                col.delete(ids=record_ids[i:i+batch_size])
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to delete records: {e}")
+            self.collections.pop(collection_name, None)
+            return False
+
+    def delete_by_filter(self, collection_name: str, metadata_filter: Dict[str, Any]):
+
+        try:
+            col = self.get_collection(collection_name)
+            col.delete(where=metadata_filter)
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to delete records: {e}")
+            self.collections.pop(collection_name, None)
             return False
 
+    def get_query_include(self, include_vectors: bool = False):
+        include = ["documents", "metadatas", "distances"]
+        if include_vectors:
+            include.append("embeddings")
+        return include
+
     def search_by_vector(
         self,
         collection_name: str,
         vector: List[float],
         limit: int,
-        metadata_filter: Optional[Dict[str, Any]] = None
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        include_vectors: bool = False
 
     ) -> List[Dict[str, Any]]:
         try:
-            col = self.client.get_collection(collection_name)
+            col = self.get_collection(collection_name)
+            include = self.get_query_include(include_vectors)
             
             if metadata_filter:
             # Use metadata filtering if provided (through 'where' clause)
-               results = col.query(query_embeddings=[vector], n_results=limit, where=metadata_filter)
+               results = col.query(query_embeddings=[vector], n_results=limit, where=metadata_filter, include=include)
             else:
             # If no metadata filter is provided, just use the query_embeddings
-               results = col.query(query_embeddings=[vector], n_results=limit)
+               results = col.query(query_embeddings=[vector], n_results=limit, include=include)
+
+            return results
+        except Exception as e:
+            self.logger.error(f"Search failed: {e}")
+            # the handle may be stale if the collection was dropped elsewhere
+            self.collections.pop(collection_name, None)
+            return []
+
+    def search_by_vectors(
+        self,
+        collection_name: str,
+        vectors: List[List[float]],
+        limit: int,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        include_vectors: bool = False
+
+    ) -> List[Dict[str, Any]]:
+        try:
+            col = self.get_collection(collection_name)
+            include = self.get_query_include(include_vectors)
+
+            # one query call answers every vector, results are nested per vector
+            if metadata_filter:
+               results = col.query(query_embeddings=vectors, n_results=limit, where=metadata_filter, include=include)
+            else:
+               results = col.query(query_embeddings=vectors, n_results=limit, include=include)
 
             return results
         except Exception as e:
             self.logger.error(f"Search failed: {e}")
+            self.collections.pop(collection_name, None)
             return []
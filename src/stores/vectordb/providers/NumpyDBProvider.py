@@ -0,0 +1,731 @@
+from ..VectorDBInterface import VectorDBInterface
+from ..VectorDBEnums import DistanceMethodEnums, QuantizationEnums
+from ..quantizers import ScalarQuantizer, ProductQuantizer
+from typing import List, Dict, Any
+import numpy as np
+import threading
+import logging
+import shutil
+import json
+import os
+
+
+class NumpyCollection:
+
+    initial_capacity = 1024
+    # below this size a flat float32 scan is cheap and the codebooks would be poorly trained
+    quantize_min_rows = 1024
+
+    def __init__(self, path: str, read_only: bool = False):
+        self.path = path
+        # a read replica never writes, it follows the writer through meta.json and the records log
+        self.read_only = read_only
+        self.lock = threading.RLock()
+        self.load()
+
+    def read_meta(self):
+        meta_path = os.path.join(self.path, "meta.json")
+        with open(meta_path) as f:
+            return json.load(f), os.stat(meta_path).st_mtime_ns
+
+    def load(self):
+        self.meta, self.meta_mtime = self.read_meta()
+
+        self.dimension = self.meta["dimension"]
+        self.distance_method = self.meta["distance_method"]
+        self.generation = self.meta["generation"]
+        self.quantization = self.meta.get("quantization", QuantizationEnums.NONE.value)
+
+        self.ids = []
+        self.documents = []
+        self.metadatas = []
+        self.id_to_row = {}
+        self.count = 0
+        self.deleted = 0
+        self.columns = {}
+
+        self.matrix = None
+        self.codes = None
+        self.alive = np.zeros(0, dtype=bool)
+        self.norms = np.zeros(0, dtype=np.float32)
+        self.log_offset = 0
+
+        self.quantizer = self.make_quantizer()
+        if self.quantizer is not None and os.path.isfile(self.quantizer_path()):
+            with np.load(self.quantizer_path()) as arrays:
+                self.quantizer.from_arrays({key: arrays[key] for key in arrays.files})
+
+        self.open_matrix()
+        self.replay()
+        self.log = None if self.read_only else open(self.records_path(), "a", encoding="utf-8")
+
+    @staticmethod
+    def create(path: str, dimension: int, distance_method: str,
+                     quantization: str = "none", pq_subspaces: int = 16):
+        os.makedirs(path, exist_ok=True)
+        NumpyCollection.write_meta(path, {
+            "dimension": dimension,
+            "distance_method": distance_method,
+            "generation": 0,
+            "quantization": quantization,
+            "pq_subspaces": pq_subspaces,
+        })
+        open(os.path.join(path, "vectors.0.f32"), "wb").close()
+        open(os.path.join(path, "records.0.jsonl"), "w").close()
+        return NumpyCollection(path)
+
+    @staticmethod
+    def write_meta(path: str, meta: dict):
+        temp_path = os.path.join(path, "meta.json.tmp")
+        with open(temp_path, "w") as f:
+            json.dump(meta, f)
+        # the meta file is the commit point of a compaction
+        os.replace(temp_path, os.path.join(path, "meta.json"))
+
+    def make_quantizer(self):
+        if self.quantization == QuantizationEnums.INT8.value:
+            return ScalarQuantizer(dimension=self.dimension)
+
+        if self.quantization == QuantizationEnums.PQ.value:
+            return ProductQuantizer(dimension=self.dimension,
+                                    subspaces=self.meta.get("pq_subspaces", 16))
+
+        return None
+
+    def vectors_path(self, generation: int = None):
+        generation = self.generation if generation is None else generation
+        return os.path.join(self.path, f"vectors.{generation}.f32")
+
+    def records_path(self, generation: int = None):
+        generation = self.generation if generation is None else generation
+        return os.path.join(self.path, f"records.{generation}.jsonl")
+
+    def codes_path(self, generation: int = None):
+        generation = self.generation if generation is None else generation
+        return os.path.join(self.path, f"codes.{generation}.u8")
+
+    def quantizer_path(self, generation: int = None):
+        generation = self.generation if generation is None else generation
+        return os.path.join(self.path, f"quantizer.{generation}.npz")
+
+    @property
+    def is_quantized(self):
+        return self.quantizer is not None and self.quantizer.is_trained
+
+    def open_matrix(self, capacity: int = None):
+        row_bytes = self.dimension * 4
+        file_size = os.path.getsize(self.vectors_path())
+
+        if capacity is not None and capacity * row_bytes > file_size:
+            with open(self.vectors_path(), "r+b") as f:
+                f.truncate(capacity * row_bytes)
+            file_size = capacity * row_bytes
+
+        rows = file_size // row_bytes
+        # pages are only read when a search touches them, opening costs nothing
+        self.matrix = np.memmap(self.vectors_path(), dtype=np.float32, mode="r" if self.read_only else "r+",
+                                shape=(rows, self.dimension)) if rows else np.zeros((0, self.dimension), dtype=np.float32)
+
+        alive = np.zeros(rows, dtype=bool)
+        alive[:len(self.alive)] = self.alive[:rows]
+        self.alive = alive
+
+        norms = np.zeros(rows, dtype=np.float32)
+        norms[:len(self.norms)] = self.norms[:rows]
+        self.norms = norms
+
+        if self.is_quantized:
+            self.open_codes(rows)
+
+    def open_codes(self, rows: int):
+        code_size = self.quantizer.code_size
+        if self.read_only:
+            # the writer sizes the codes file together with the matrix
+            rows = min(rows, os.path.getsize(self.codes_path()) // code_size)
+        elif not os.path.isfile(self.codes_path()) or os.path.getsize(self.codes_path()) < rows * code_size:
+            with open(self.codes_path(), "ab") as f:
+                f.truncate(rows * code_size)
+
+        self.codes = np.memmap(self.codes_path(), dtype=np.uint8, mode="r" if self.read_only else "r+",
+                               shape=(rows, code_size)) if rows else None
+
+    def replay(self):
+        # applies the log from where the last replay stopped, a replica calls it again to catch up
+        rows = []
+        with open(self.records_path(), "rb") as f:
+            f.seek(self.log_offset)
+            for line in f:
+                try:
+                    # a line without its newline is torn by a crash or still being written
+                    record = json.loads(line) if line.endswith(b"\n") else None
+                except json.JSONDecodeError:
+                    record = None
+                if record is None:
+                    # the vectors a torn line points to were never committed
+                    break
+                self.log_offset += len(line)
+
+                if record["op"] == "add":
+                    if record["row"] >= len(self.alive):
+                        # the writer grew the matrix since this replica mapped it
+                        self.open_matrix()
+                    self.set_record(record["row"], record["id"], record["document"], record["metadata"])
+                    rows.append(record["row"])
+                elif record["op"] == "del":
+                    self.unset_record(record["id"])
+
+        if rows:
+            rows = np.unique(rows)
+            self.norms[rows] = np.einsum("ij,ij->i", self.matrix[rows], self.matrix[rows])
+            self.columns = {}
+
+    def refresh(self):
+        # cheap when nothing changed: one stat of meta.json and one of the records log
+        with self.lock:
+            meta_mtime = os.stat(os.path.join(self.path, "meta.json")).st_mtime_ns
+            if meta_mtime != self.meta_mtime:
+                meta, meta_mtime = self.read_meta()
+                if meta["generation"] != self.generation:
+                    # compacted by the writer, the old generation files are about to go away
+                    self.close()
+                    self.load()
+                    return
+                self.meta_mtime = meta_mtime
+
+            if self.quantizer is not None and not self.is_quantized and os.path.isfile(self.quantizer_path()):
+                # the writer trained the codebooks since this replica loaded
+                self.close()
+                self.load()
+                return
+
+            if os.path.getsize(self.records_path()) > self.log_offset:
+                self.replay()
+
+    def set_record(self, row: int, record_id: str, document: str, metadata: dict):
+        if row >= len(self.ids):
+            missing = row + 1 - len(self.ids)
+            self.ids.extend([None] * missing)
+            self.documents.extend([None] * missing)
+            self.metadatas.extend([None] * missing)
+            self.count = row + 1
+
+        self.ids[row] = record_id
+        self.documents[row] = document
+        self.metadatas[row] = metadata or {}
+        self.id_to_row[record_id] = row
+        self.alive[row] = True
+
+    def unset_record(self, record_id: str):
+        row = self.id_to_row.pop(record_id, None)
+        if row is not None:
+            self.alive[row] = False
+            self.deleted += 1
+
+    def prepare_vectors(self, vectors: list):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        if self.distance_method == DistanceMethodEnums.COSINE.value:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms > 0, norms, 1)
+        return vectors
+
+    def upsert(self, record_ids: list, vectors: list, documents: list, metadatas: list):
+        vectors = self.prepare_vectors(vectors)
+
+        # an id repeated in one batch keeps its last copy, an earlier one would leave an unreachable row
+        last_positions = {record_id: idx for idx, record_id in enumerate(record_ids)}
+        if len(last_positions) < len(record_ids):
+            keep = sorted(last_positions.values())
+            record_ids = [record_ids[idx] for idx in keep]
+            documents = [documents[idx] for idx in keep]
+            metadatas = [metadatas[idx] for idx in keep]
+            vectors = vectors[keep]
+
+        with self.lock:
+            rows = []
+            next_row = self.count
+            for record_id in record_ids:
+                row = self.id_to_row.get(record_id)
+                if row is None:
+                    row = next_row
+                    next_row += 1
+                rows.append(row)
+
+            if next_row > len(self.alive):
+                self.open_matrix(capacity=max(next_row, 2 * len(self.alive), self.initial_capacity))
+
+            # vectors hit the disk before the log line that makes them visible
+            rows = np.asarray(rows)
+            self.matrix[rows] = vectors
+            self.matrix.flush()
+            if self.is_quantized:
+                self.codes[rows] = self.quantizer.encode(vectors)
+                self.codes.flush()
+
+            for row, record_id, document, metadata in zip(rows.tolist(), record_ids, documents, metadatas):
+                self.log.write(json.dumps({
+                    "op": "add", "row": row, "id": record_id,
+                    "document": document, "metadata": metadata or {},
+                }) + "\n")
+                self.set_record(row, record_id, document, metadata)
+            self.log.flush()
+
+            self.norms[rows] = np.einsum("ij,ij->i", vectors, vectors)
+            self.columns = {}
+
+            if self.needs_training():
+                self.train_quantizer()
+
+    def needs_training(self):
+        return (
+            self.quantizer is not None and not self.quantizer.is_trained
+            and len(self.id_to_row) >= self.quantize_min_rows
+        )
+
+    def train_quantizer(self):
+        with self.lock:
+            live_rows = np.flatnonzero(self.alive[:self.count])
+            self.quantizer.train(np.asarray(self.matrix[live_rows]))
+
+            self.open_codes(len(self.alive))
+            for start in range(0, self.count, 16384):
+                end = min(start + 16384, self.count)
+                self.codes[start:end] = self.quantizer.encode(np.asarray(self.matrix[start:end]))
+            self.codes.flush()
+
+            # the codebooks land last, codes without them are ignored and rebuilt
+            temp_path = self.quantizer_path() + ".tmp"
+            with open(temp_path, "wb") as f:
+                np.savez(f, **self.quantizer.to_arrays())
+            os.replace(temp_path, self.quantizer_path())
+
+    def delete(self, record_ids: list):
+        with self.lock:
+            for record_id in record_ids:
+                if record_id in self.id_to_row:
+                    self.log.write(json.dumps({"op": "del", "id": record_id}) + "\n")
+                    self.unset_record(record_id)
+            self.log.flush()
+            self.columns = {}
+
+    def needs_compaction(self, ratio: float):
+        return self.deleted >= 64 and self.deleted > ratio * self.count
+
+    def compact(self):
+        with self.lock:
+            live_rows = np.flatnonzero(self.alive[:self.count])
+            generation = self.generation + 1
+            capacity = max(len(live_rows), self.initial_capacity)
+
+            vectors = np.memmap(self.vectors_path(generation), dtype=np.float32, mode="w+",
+                                shape=(capacity, self.dimension))
+            for start in range(0, len(live_rows), 4096):
+                block = live_rows[start:start + 4096]
+                vectors[start:start + len(block)] = self.matrix[block]
+            vectors.flush()
+            del vectors
+
+            with open(self.records_path(generation), "w", encoding="utf-8") as f:
+                for new_row, row in enumerate(live_rows.tolist()):
+                    f.write(json.dumps({
+                        "op": "add", "row": new_row, "id": self.ids[row],
+                        "document": self.documents[row], "metadata": self.metadatas[row],
+                    }) + "\n")
+
+            old_generation = self.generation
+            self.write_meta(self.path, {**self.meta, "generation": generation})
+
+            self.log.close()
+            self.load()
+
+            for old_path in [self.vectors_path(old_generation), self.records_path(old_generation),
+                             self.codes_path(old_generation), self.quantizer_path(old_generation)]:
+                if os.path.isfile(old_path):
+                    os.remove(old_path)
+
+            # codebooks are retrained on what survived the compaction
+            if self.needs_training():
+                self.train_quantizer()
+
+    def get_column(self, key: str, n: int):
+        column = self.columns.get(key)
+        if column is None or len(column) < n:
+            column = np.empty(n, dtype=object)
+            column[:] = [metadata.get(key) if metadata else None for metadata in self.metadatas[:n]]
+            self.columns[key] = column
+        return column[:n]
+
+    def match(self, metadata_filter: dict, n: int):
+        mask = np.ones(n, dtype=bool)
+
+        for key, condition in metadata_filter.items():
+            if key == "$and":
+                for sub_filter in condition:
+                    mask &= self.match(sub_filter, n)
+                continue
+
+            if key == "$or":
+                any_mask = np.zeros(n, dtype=bool)
+                for sub_filter in condition:
+                    any_mask |= self.match(sub_filter, n)
+                mask &= any_mask
+                continue
+
+            column = self.get_column(key, n)
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+
+            for operator, value in condition.items():
+                if operator == "$eq":
+                    mask &= column == value
+                elif operator == "$ne":
+                    mask &= column != value
+                elif operator in ["$in", "$nin"]:
+                    values = set(value)
+                    found = np.fromiter((item in values for item in column), dtype=bool, count=n)
+                    mask &= found if operator == "$in" else ~found
+                elif operator in ["$gt", "$gte", "$lt", "$lte"]:
+                    compare = {
+                        "$gt": lambda a: a > value, "$gte": lambda a: a >= value,
+                        "$lt": lambda a: a < value, "$lte": lambda a: a <= value,
+                    }[operator]
+                    mask &= np.fromiter((item is not None and compare(item) for item in column),
+                                        dtype=bool, count=n)
+                else:
+                    raise ValueError(f"Unsupported filter operator: {operator}")
+
+        return mask
+
+    def get_records(self, metadata_filter: dict = None):
+        with self.lock:
+            n = self.count
+            mask = self.alive[:n].copy()
+            if metadata_filter:
+                mask &= self.match(metadata_filter, n)
+            rows = np.flatnonzero(mask).tolist()
+            return {
+                "ids": [self.ids[row] for row in rows],
+                "metadatas": [self.metadatas[row] for row in rows],
+            }
+
+    def score_rows(self, source, score, queries: np.ndarray, rows: np.ndarray, mask: np.ndarray, n: int):
+        # a selective filter scans only the matching rows, a loose one masks a full scan
+        if len(rows) < n // 2:
+            return score(queries, source[rows]), rows
+
+        scores = score(queries, source[:n])
+        scores[:, ~mask] = -np.inf
+        return scores, np.arange(n)
+
+    def rank_scores(self, dots: np.ndarray, row_norms: np.ndarray):
+        if self.distance_method == DistanceMethodEnums.L2.value:
+            # smaller squared l2 distance ranks first, the query norm is a constant
+            return 2 * dots - row_norms
+        return dots
+
+    def search(self, queries: list, limit: int, metadata_filter: dict = None,
+                     include_vectors: bool = False, rescore_factor: int = 4, exact: bool = False):
+        queries = self.prepare_vectors(queries)
+
+        with self.lock:
+            n = self.count
+            matrix = self.matrix
+            codes = self.codes
+            norms = self.norms
+            quantized = self.is_quantized and not exact and codes is not None
+            mask = self.alive[:n].copy()
+            if metadata_filter:
+                mask &= self.match(metadata_filter, n)
+            ids, documents, metadatas = self.ids, self.documents, self.metadatas
+
+        rows = np.flatnonzero(mask)
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if include_vectors:
+            results["embeddings"] = []
+
+        k = min(limit, len(rows))
+        if k == 0:
+            for key in results:
+                results[key] = [[] for _ in range(len(queries))]
+            return results
+
+        if quantized:
+            # shortlist on the compressed codes, then re-score the shortlist at full precision
+            dots, row_map = self.score_rows(codes, self.quantizer.scores, queries, rows, mask, n)
+            ranking = self.rank_scores(dots, norms[row_map])
+            shortlist = min(len(rows), k * max(rescore_factor, 1))
+            candidates = row_map[np.argpartition(-ranking, shortlist - 1, axis=1)[:, :shortlist]]
+
+            vectors = np.asarray(matrix[candidates.ravel()]).reshape(len(queries), shortlist, -1)
+            dots = np.einsum("bcd,bd->bc", vectors, queries)
+        else:
+            dots, row_map = self.score_rows(matrix, lambda q, m: q @ np.asarray(m).T,
+                                            queries, rows, mask, n)
+            candidates = np.broadcast_to(row_map, dots.shape)
+
+        ranking = self.rank_scores(dots, norms[candidates])
+        if self.distance_method == DistanceMethodEnums.L2.value:
+            # squared l2 distance, same scale as chroma reports
+            distances = np.einsum("ij,ij->i", queries, queries)[:, np.newaxis] - ranking
+        else:
+            distances = 1 - dots
+
+        top = np.argpartition(-ranking, k - 1, axis=1)[:, :k]
+        for query_idx in range(len(queries)):
+            order = top[query_idx][np.argsort(-ranking[query_idx, top[query_idx]])]
+            result_rows = candidates[query_idx, order].tolist()
+
+            results["ids"].append([ids[row] for row in result_rows])
+            results["documents"].append([documents[row] for row in result_rows])
+            results["metadatas"].append([metadatas[row] for row in result_rows])
+            results["distances"].append(distances[query_idx, order].tolist())
+            if include_vectors:
+                results["embeddings"].append(np.asarray(matrix[result_rows]).tolist())
+
+        return results
+
+    def evaluate_recall(self, k: int = 10, sample_size: int = 100, rescore_factor: int = 4, seed: int = 0):
+        # stored vectors serve as queries, the exact flat scan is the ground truth
+        with self.lock:
+            live_rows = np.flatnonzero(self.alive[:self.count])
+        if len(live_rows) == 0:
+            return None
+
+        rng = np.random.default_rng(seed)
+        sample = rng.choice(live_rows, size=min(sample_size, len(live_rows)), replace=False)
+        queries = np.asarray(self.matrix[np.sort(sample)])
+
+        exact = self.search(queries, limit=k, exact=True)
+        recalls = {}
+        for name, factor in [("codes_only", 1), ("rescored", rescore_factor)]:
+            approximate = self.search(queries, limit=k, rescore_factor=factor)
+            recalls[name] = float(np.mean([
+                len(set(truth) & set(found)) / max(len(truth), 1)
+                for truth, found in zip(exact["ids"], approximate["ids"])
+            ]))
+
+        return {"k": k, "queries": len(queries), "quantization": self.quantization,
+                "quantized": self.is_quantized, "rescore_factor": rescore_factor,
+                f"recall_at_{k}": recalls}
+
+    def info(self):
+        vectors_bytes = self.count * self.dimension * 4
+        codes_bytes = self.count * self.quantizer.code_size if self.is_quantized else 0
+        quantizer_bytes = self.quantizer.nbytes if self.quantizer is not None else 0
+
+        return {
+            "name": os.path.basename(self.path),
+            "count": len(self.id_to_row),
+            "deleted": self.deleted,
+            "dimension": self.dimension,
+            "distance_method": self.distance_method,
+            "quantization": self.quantization,
+            "quantized": self.is_quantized,
+            "memory": {
+                "vectors_bytes": vectors_bytes,
+                "codes_bytes": codes_bytes,
+                "quantizer_bytes": quantizer_bytes,
+                # what a scan keeps hot: the codes once trained, the whole matrix otherwise
+                "search_bytes": codes_bytes + quantizer_bytes if self.is_quantized else vectors_bytes,
+            },
+        }
+
+    def close(self):
+        with self.lock:
+            if self.log is not None:
+                self.log.close()
+            if isinstance(self.matrix, np.memmap) and not self.read_only:
+                self.matrix.flush()
+            self.matrix = None
+            self.codes = None
+
+
+class NumpyDBProvider(VectorDBInterface):
+
+    def __init__(self, db_path: str, distance_method: str = "cosine",
+                       compaction_ratio: float = 0.3, quantization: str = "none",
+                       pq_subspaces: int = 16, rescore_factor: int = 4, read_only: bool = False):
+        self.db_path = db_path
+        self.read_only = read_only
+        self.distance_method = distance_method
+        self.compaction_ratio = compaction_ratio
+        self.quantization = quantization
+        self.pq_subspaces = pq_subspaces
+        self.rescore_factor = rescore_factor
+
+        if self.distance_method not in [e.value for e in DistanceMethodEnums]:
+            raise ValueError(f"Unsupported distance method: {self.distance_method}")
+
+        if self.quantization not in [e.value for e in QuantizationEnums]:
+            raise ValueError(f"Unsupported quantization: {self.quantization}")
+
+        self.collections = {}
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def connect(self):
+        # collections are opened lazily on first use
+        os.makedirs(self.db_path, exist_ok=True)
+
+    def disconnect(self):
+        with self.lock:
+            for collection in self.collections.values():
+                collection.close()
+            self.collections = {}
+
+    def get_collection_path(self, collection_name: str):
+        return os.path.join(self.db_path, collection_name)
+
+    def check_writable(self):
+        if self.read_only:
+            raise RuntimeError(f"{self.db_path} is opened as a read replica, only the writer changes it")
+
+    def get_collection(self, collection_name: str) -> NumpyCollection:
+        collection = self.collections.get(collection_name)
+        if collection is not None:
+            if not self.read_only:
+                return collection
+            try:
+                # a replica catches up with the writer before every read
+                collection.refresh()
+                return collection
+            except FileNotFoundError:
+                # dropped by the writer, or caught between the files of a compaction
+                with self.lock:
+                    if self.collections.get(collection_name) is collection:
+                        del self.collections[collection_name]
+                collection.close()
+
+        with self.lock:
+            collection = self.collections.get(collection_name)
+            if collection is None:
+                if not self.is_collection_existed(collection_name):
+                    raise ValueError(f"Collection [{collection_name}] does not exists")
+                collection = NumpyCollection(self.get_collection_path(collection_name),
+                                             read_only=self.read_only)
+                self.collections[collection_name] = collection
+            return collection
+
+    def is_collection_existed(self, collection_name: str) -> bool:
+        return os.path.isfile(os.path.join(self.get_collection_path(collection_name), "meta.json"))
+
+    def list_all_collections(self) -> List:
+        return [
+            name for name in sorted(os.listdir(self.db_path))
+            if self.is_collection_existed(name)
+        ]
+
+    def get_collection_info(self, collection_name: str) -> Dict[str, Any]:
+        return self.get_collection(collection_name).info()
+
+    def delete_collection(self, collection_name: str):
+        self.check_writable()
+        with self.lock:
+            collection = self.collections.pop(collection_name, None)
+            if collection is not None:
+                collection.close()
+            if self.is_collection_existed(collection_name):
+                shutil.rmtree(self.get_collection_path(collection_name))
+
+    def create_collection(self, collection_name: str, embedding_size: int, do_reset: bool = False):
+        self.check_writable()
+        if do_reset:
+            self.delete_collection(collection_name=collection_name)
+
+        with self.lock:
+            if not self.is_collection_existed(collection_name):
+                self.collections[collection_name] = NumpyCollection.create(
+                    self.get_collection_path(collection_name),
+                    dimension=embedding_size,
+                    distance_method=self.distance_method,
+                    quantization=self.quantization,
+                    pq_subspaces=self.pq_subspaces
+                )
+
+    def insert_one(self, collection_name: str, text: str, vector: list,
+                         metadata: dict = None, record_id: str = None):
+        return self.insert_many(collection_name=collection_name, texts=[text], vectors=[vector],
+                                metadata=[metadata], record_ids=[record_id])
+
+    def insert_many(self, collection_name: str, texts: list, vectors: list,
+                          metadata: list = None, record_ids: list = None, batch_size: int = 50):
+        try:
+            self.check_writable()
+            collection = self.get_collection(collection_name)
+
+            if metadata is None:
+                metadata = [{} for _ in texts]
+
+            if record_ids is None:
+                record_ids = [str(i) for i in range(len(texts))]
+
+            existing = [record_id for record_id in record_ids if record_id in collection.id_to_row]
+            if existing:
+                raise ValueError(f"Records already exist: {existing[:5]}")
+
+            collection.upsert(record_ids, vectors, texts, metadata)
+            return True
+
+        except Exception as e:
+            self.logger.error(f"Failed to insert batch: {e}")
+            return False
+
+    def upsert_many(self, collection_name: str, texts: list, vectors: list,
+                          metadata: list = None, record_ids: list = None, batch_size: int = 50):
+        try:
+            self.check_writable()
+            collection = self.get_collection(collection_name)
+
+            if metadata is None:
+                metadata = [{} for _ in texts]
+
+            collection.upsert(record_ids, vectors, texts, metadata)
+            return True
+
+        except Exception as e:
+            self.logger.error(f"Failed to upsert batch: {e}")
+            return False
+
+    def get_records(self, collection_name: str, metadata_filter: dict = None) -> dict:
+        try:
+            return self.get_collection(collection_name).get_records(metadata_filter=metadata_filter)
+        except Exception as e:
+            self.logger.error(f"Failed to get records: {e}")
+            return {"ids": [], "metadatas": []}
+
+    def delete_many(self, collection_name: str, record_ids: list):
+        try:
+            self.check_writable()
+            collection = self.get_collection(collection_name)
+            collection.delete(record_ids)
+            if collection.needs_compaction(self.compaction_ratio):
+                collection.compact()
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to delete records: {e}")
+            return False
+
+    def delete_by_filter(self, collection_name: str, metadata_filter: dict):
+        records = self.get_records(collection_name=collection_name, metadata_filter=metadata_filter)
+        return self.delete_many(collection_name=collection_name, record_ids=records["ids"])
+
+    def search_by_vectors(self, collection_name: str, vectors: list, limit: int,
+                                metadata_filter: dict = None, include_vectors: bool = False):
+        try:
+            return self.get_collection(collection_name).search(
+                vectors, limit=limit, metadata_filter=metadata_filter,
+                include_vectors=include_vectors, rescore_factor=self.rescore_factor
+            )
+        except Exception as e:
+            self.logger.error(f"Search failed: {e}")
+            return []
+
+    def search_by_vector(self, collection_name: str, vector: list, limit: int,
+                               metadata_filter: dict = None, include_vectors: bool = False):
+        return self.search_by_vectors(collection_name=collection_name, vectors=[vector],
+                                      limit=limit, metadata_filter=metadata_filter,
+                                      include_vectors=include_vectors)
+
+    def evaluate_recall(self, collection_name: str, k: int = 10, sample_size: int = 100):
+        return self.get_collection(collection_name).evaluate_recall(
+            k=k, sample_size=sample_size, rescore_factor=self.rescore_factor
+        )
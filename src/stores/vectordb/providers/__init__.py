@@ -1 +1,30 @@
-from .ChromaDBProvider import ChromaDBProvider
\ No newline at end of file
+import importlib
+import types
+import sys
+
+# chromadb takes most of a second to import, a backend is only loaded when it is asked for
+PROVIDERS = {
+    "ChromaDBProvider": ".ChromaDBProvider",
+    "NumpyDBProvider": ".NumpyDBProvider",
+}
+
+
+class ProvidersModule(types.ModuleType):
+
+    # importing a submodule binds the module under the class name on the package, whatever
+    # imported it first, so the name is resolved to the class on every lookup
+    def __getattribute__(self, name: str):
+        value = super().__getattribute__(name)
+        if name in PROVIDERS and isinstance(value, types.ModuleType):
+            return getattr(value, name)
+        return value
+
+
+def __getattr__(name: str):
+    if name not in PROVIDERS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    return getattr(importlib.import_module(PROVIDERS[name], __name__), name)
+
+
+sys.modules[__name__].__class__ = ProvidersModule
@@ -0,0 +1,96 @@
+import numpy as np
+
+
+class ProductQuantizer:
+
+    # one uint8 centroid id per subspace
+    n_centroids = 256
+    train_iterations = 20
+    max_train_rows = 20000
+
+    def __init__(self, dimension: int, subspaces: int = 16, seed: int = 0):
+        # the dimension has to split evenly, fall back to the closest divisor below
+        subspaces = max(1, min(subspaces, dimension))
+        while dimension % subspaces:
+            subspaces -= 1
+
+        self.dimension = dimension
+        self.subspaces = subspaces
+        self.sub_dimension = dimension // subspaces
+        self.rng = np.random.default_rng(seed)
+        self.centroids = None
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    @property
+    def code_size(self):
+        return self.subspaces
+
+    @property
+    def nbytes(self):
+        return self.centroids.nbytes if self.is_trained else 0
+
+    def split(self, vectors: np.ndarray):
+        return vectors.reshape(len(vectors), self.subspaces, self.sub_dimension)
+
+    def kmeans(self, points: np.ndarray):
+        k = min(self.n_centroids, len(points))
+        centroids = points[self.rng.choice(len(points), size=k, replace=False)].copy()
+
+        for _ in range(self.train_iterations):
+            distances = (
+                np.einsum("ij,ij->i", points, points)[:, np.newaxis]
+                - 2 * points @ centroids.T
+                + np.einsum("ij,ij->i", centroids, centroids)[np.newaxis, :]
+            )
+            assignment = distances.argmin(axis=1)
+
+            counts = np.bincount(assignment, minlength=k)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, points)
+            # empty clusters keep their previous centroid
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, np.newaxis]
+
+        if k < self.n_centroids:
+            centroids = np.vstack([centroids, np.repeat(centroids[-1:], self.n_centroids - k, axis=0)])
+        return centroids
+
+    def train(self, vectors: np.ndarray):
+        if len(vectors) > self.max_train_rows:
+            vectors = vectors[self.rng.choice(len(vectors), size=self.max_train_rows, replace=False)]
+
+        parts = self.split(np.asarray(vectors, dtype=np.float32))
+        self.centroids = np.stack([
+            self.kmeans(parts[:, sub]) for sub in range(self.subspaces)
+        ]).astype(np.float32)
+
+    def encode(self, vectors: np.ndarray):
+        parts = self.split(np.asarray(vectors, dtype=np.float32))
+        codes = np.empty((len(vectors), self.subspaces), dtype=np.uint8)
+        for sub in range(self.subspaces):
+            centroids = self.centroids[sub]
+            distances = (
+                -2 * parts[:, sub] @ centroids.T
+                + np.einsum("ij,ij->i", centroids, centroids)[np.newaxis, :]
+            )
+            codes[:, sub] = distances.argmin(axis=1)
+        return codes
+
+    def scores(self, queries: np.ndarray, codes: np.ndarray):
+        # per query lookup table of sub-vector dot products, summed over the codes
+        tables = np.einsum("bsd,scd->bsc", self.split(queries), self.centroids)
+
+        codes = np.asarray(codes)
+        scores = np.zeros((len(queries), len(codes)), dtype=np.float32)
+        for sub in range(self.subspaces):
+            scores += tables[:, sub, codes[:, sub]]
+        return scores
+
+    def to_arrays(self):
+        return {"centroids": self.centroids}
+
+    def from_arrays(self, arrays: dict):
+        self.centroids = arrays["centroids"]
@@ -0,0 +1,51 @@
+import numpy as np
+
+
+class ScalarQuantizer:
+
+    # one uint8 per dimension, a 4x reduction over float32
+    block_rows = 16384
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+        self.minimum = None
+        self.scale = None
+
+    @property
+    def is_trained(self):
+        return self.minimum is not None
+
+    @property
+    def code_size(self):
+        return self.dimension
+
+    @property
+    def nbytes(self):
+        return self.minimum.nbytes + self.scale.nbytes if self.is_trained else 0
+
+    def train(self, vectors: np.ndarray):
+        self.minimum = vectors.min(axis=0).astype(np.float32)
+        spread = vectors.max(axis=0) - self.minimum
+        self.scale = (np.where(spread > 0, spread, 1) / 255).astype(np.float32)
+
+    def encode(self, vectors: np.ndarray):
+        codes = np.rint((vectors - self.minimum) / self.scale)
+        return np.clip(codes, 0, 255).astype(np.uint8)
+
+    def scores(self, queries: np.ndarray, codes: np.ndarray):
+        # q . (min + scale * c) without decoding the whole matrix at once
+        scaled = queries * self.scale
+        offset = queries @ self.minimum
+
+        scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), self.block_rows):
+            block = np.asarray(codes[start:start + self.block_rows], dtype=np.float32)
+            scores[:, start:start + len(block)] = scaled @ block.T
+        return scores + offset[:, np.newaxis]
+
+    def to_arrays(self):
+        return {"minimum": self.minimum, "scale": self.scale}
+
+    def from_arrays(self, arrays: dict):
+        self.minimum = arrays["minimum"]
+        self.scale = arrays["scale"]
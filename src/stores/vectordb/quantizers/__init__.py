@@ -0,0 +1,2 @@
+from .ScalarQuantizer import ScalarQuantizer
+from .ProductQuantizer import ProductQuantizer
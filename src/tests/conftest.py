@@ -0,0 +1,28 @@
+import sys
+import os
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIR)
+
+# every setting .env.exemple leaves to the deployment, the tests never read a real .env
+for key, value in {
+    "APP_NAME": "mini-rag-test",
+    "APP_VERSION": "test",
+    "FILE_ALLOWED_TYPES": '["application/pdf", "text/plain"]',
+    "FILE_MAX_SIZE": "10",
+    "FILE_DEFAULT_CHUNK_SIZE": "512000",
+    "GENERATION_BACKEND": "OPENAI",
+    "EMBEDDING_BACKEND": "OPENAI",
+    "OPENAI_API_KEY": "test",
+    "OPENAI_API_URL": "http://127.0.0.1:9/v1/",
+    "GENERATION_MODEL_ID": "test-chat",
+    "EMBEDDING_MODEL_ID": "test-embedding",
+    "EMBEDDING_MODEL_SIZE": "32",
+    "INPUT_DAFAULT_MAX_CHARACTERS": "100000",
+    "GENERATION_DAFAULT_MAX_TOKENS": "256",
+    "GENERATION_DAFAULT_TEMPERATURE": "0.1",
+    "VECTOR_DB_BACKEND": "NUMPY",
+    "VECTOR_DB_PATH": "test_vectors",
+    "VECTOR_DB_DISTANCE_METHOD": "cosine",
+}.items():
+    os.environ.setdefault(key, value)
@@ -0,0 +1,41 @@
+from stores.cache import AnswerCache
+from stores.catalog import Catalog
+import pytest
+
+VECTOR = [1.0, 0.0, 0.0]
+CHUNK_IDS = ["a", "b"]
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = Catalog(db_path=str(tmp_path), files_dir=str(tmp_path / "files"))
+    yield catalog
+    catalog.close()
+
+
+def test_writer_invalidation_reaches_reader(tmp_path, catalog):
+    # every worker opens its own catalog connection on the same database
+    reader_catalog = Catalog(db_path=str(tmp_path), files_dir=str(tmp_path / "files"))
+    writer = AnswerCache(catalog=catalog)
+    reader = AnswerCache(catalog=reader_catalog)
+
+    reader.put("project", VECTOR, CHUNK_IDS, answer="old", sources=[])
+    assert reader.get("project", VECTOR, CHUNK_IDS)["answer"] == "old"
+
+    writer.invalidate("project")
+
+    assert reader.get("project", VECTOR, CHUNK_IDS) is None
+    assert reader.stats()["invalidations"] == 1
+
+    reader.put("project", VECTOR, CHUNK_IDS, answer="new", sources=[])
+    assert reader.get("project", VECTOR, CHUNK_IDS)["answer"] == "new"
+    reader_catalog.close()
+
+
+def test_invalidation_is_per_project(catalog):
+    cache = AnswerCache(catalog=catalog)
+    cache.put("project", VECTOR, CHUNK_IDS, answer="kept", sources=[])
+
+    AnswerCache(catalog=catalog).invalidate("other")
+
+    assert cache.get("project", VECTOR, CHUNK_IDS)["answer"] == "kept"
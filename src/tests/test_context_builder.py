@@ -0,0 +1,45 @@
+from stores.retrieval import ContextBuilder, load_encoding
+import importlib
+import pytest
+
+# the package exports the class under the module's name
+context_builder_module = importlib.import_module("stores.retrieval.ContextBuilder")
+
+
+class OfflineTiktoken:
+
+    def __init__(self):
+        self.calls = 0
+
+    def encoding_for_model(self, model_id):
+        self.calls += 1
+        raise KeyError(model_id)
+
+    def get_encoding(self, name):
+        self.calls += 1
+        raise ConnectionError("no network")
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    tiktoken = OfflineTiktoken()
+    monkeypatch.setattr(context_builder_module, "tiktoken", tiktoken)
+    monkeypatch.setattr(context_builder_module, "encodings", {})
+    return tiktoken
+
+
+def test_request_path_never_loads_a_tokenizer(offline):
+    builder = ContextBuilder(max_tokens=100, model_id="test-chat")
+
+    assert offline.calls == 0
+    assert builder.encoding is None
+    assert builder.count_tokens("a" * 40) == 11
+
+
+def test_failed_load_is_loaded_once(offline):
+    assert load_encoding("test-chat") is None
+    assert load_encoding("test-chat") is None
+    assert offline.calls == 2
+
+    assert ContextBuilder(max_tokens=100, model_id="test-chat").encoding is None
+    assert offline.calls == 2
@@ -0,0 +1,106 @@
+from benchmarks.corpus import generate_corpus
+from controllers.IngestionController import IngestionController
+from controllers.ProcessController import ProcessController
+from stores.vectordb.providers import NumpyDBProvider
+from stores.catalog import Catalog, ChunkSpool
+from helpers.config import get_settings
+from concurrent.futures import ThreadPoolExecutor
+from jobs.Job import Job
+import asyncio
+import time
+import shutil
+import uuid
+import os
+import pytest
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIMENSION = 8
+
+
+class FakeEmbedding:
+
+    def __init__(self):
+        self.embedding_size = DIMENSION
+
+    async def aembed_many(self, texts: list, document_type: str = None):
+        return [[float(len(text) % 7 + 1)] + [1.0] * (DIMENSION - 1) for text in texts]
+
+
+class FailingVectorDB:
+
+    # the insert of the last batch fails once the parser had time to finish, like a crash mid embedding
+    def __init__(self, vectordb, last_index: int):
+        self.vectordb = vectordb
+        self.last_index = last_index
+
+    def __getattr__(self, name):
+        return getattr(self.vectordb, name)
+
+    def upsert_many(self, metadata: list, **kwargs):
+        if any(item["chunk_index"] == self.last_index for item in metadata):
+            time.sleep(0.5)
+            raise RuntimeError("vector store down")
+        return self.vectordb.upsert_many(metadata=metadata, **kwargs)
+
+
+@pytest.fixture
+def ingestion(tmp_path, monkeypatch):
+    run_id = uuid.uuid4().hex[:8]
+    project_id = f"test{run_id}"
+    monkeypatch.setenv("CHECKPOINT_PATH", f"test_{run_id}_checkpoints")
+    monkeypatch.setenv("JOB_INGEST_BATCH_SIZE", "8")
+    get_settings.cache_clear()
+
+    path = generate_corpus(str(tmp_path / "corpus"), pdf_files=0, xlsx_files=1, xlsx_rows=60)[0]
+    file_id = os.path.basename(path)
+    project_path = os.path.join(SRC_DIR, "assets", "files", project_id)
+    os.makedirs(project_path, exist_ok=True)
+    shutil.copy(path, os.path.join(project_path, file_id))
+
+    catalog = Catalog(db_path=str(tmp_path), files_dir=os.path.dirname(project_path))
+    catalog.add_file(project_id=project_id, file_id=file_id, file_name=file_id,
+                     file_hash=catalog.hash_file(path), file_size=os.path.getsize(path))
+
+    vectordb = NumpyDBProvider(db_path=str(tmp_path / "vectors"), distance_method="cosine")
+    vectordb.connect()
+
+    yield project_id, file_id, catalog, vectordb
+
+    vectordb.disconnect()
+    catalog.close()
+    get_settings.cache_clear()
+    shutil.rmtree(project_path, ignore_errors=True)
+    shutil.rmtree(os.path.join(SRC_DIR, "assets", "database", f"test_{run_id}_checkpoints"), ignore_errors=True)
+
+
+def run_job(project_id: str, file_id: str, catalog, vectordb, embedding):
+    job = Job(project_id=project_id, file_id=file_id, params={"chunk_size": 200, "overlap_size": 0})
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return asyncio.run(IngestionController(project_id=project_id).run(
+            job=job, executor=executor, embedding_client=embedding,
+            vectordb_client=vectordb, catalog=catalog
+        ))
+
+
+def test_parsed_file_is_replayed_after_a_failed_run(ingestion, monkeypatch):
+    project_id, file_id, catalog, vectordb = ingestion
+    chunk_count = len(list(ProcessController(project_id=project_id).get_file_chunks(file_id=file_id, chunk_size=200)))
+
+    with pytest.raises(RuntimeError):
+        run_job(project_id, file_id, catalog, FailingVectorDB(vectordb, chunk_count - 1), FakeEmbedding())
+
+    # the whole file made it into the spool before the run failed
+    controller = IngestionController(project_id=project_id)
+    spool_dir = controller.get_database_path(db_name=controller.app_settings.CHECKPOINT_PATH)
+    spool = ChunkSpool(spool_dir=spool_dir, project_id=project_id, file_id=file_id, ingest_key=None)
+    assert list(spool.read_lines())[-1] == {"complete": True, "chunk_count": chunk_count}
+
+    def parse_again(*args, **kwargs):
+        raise AssertionError("a spooled file is parsed again")
+
+    monkeypatch.setattr(ProcessController, "get_file_chunks", parse_again)
+    result = run_job(project_id, file_id, catalog, vectordb, FakeEmbedding())
+
+    assert result["failed"] == 0
+    records = vectordb.get_records(collection_name=result["collection"], metadata_filter={"file_id": file_id})
+    assert len(records["ids"]) == chunk_count
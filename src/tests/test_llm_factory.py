@@ -0,0 +1,37 @@
+from stores.llm.LLMProviderFactory import LLMProviderFactory
+from stores.llm.LLMEnums import LLMEnums, LLMRoleEnums
+from helpers.config import get_settings
+import openai
+
+
+def make_factory(**overrides):
+    return LLMProviderFactory(get_settings().model_copy(update=overrides))
+
+
+def test_pooled_providers_keep_their_own_clients():
+    module_base_url = openai.base_url
+    factory = make_factory(
+        GENERATION_API_URLS={"http://generation-a/v1/": 1, "http://generation-b/v1/": 3},
+        EMBEDDING_API_URLS={"http://embedding-a/v1/": 1},
+    )
+
+    generation = factory.create(LLMEnums.OPENAI.value, role=LLMRoleEnums.GENERATION.value)
+    embedding = factory.create(LLMEnums.OPENAI.value, role=LLMRoleEnums.EMBEDDING.value)
+
+    # building a provider never changes the module level client settings
+    assert openai.base_url == module_base_url
+
+    # only the async clients go through the balancer, the sync ones reach a real server
+    assert str(generation.async_client.base_url) == "http://generation.pool/"
+    assert str(embedding.async_client.base_url) == "http://embedding.pool/"
+    assert str(generation.client.base_url) == "http://generation-b/v1/"
+    assert str(embedding.client.base_url) == "http://embedding-a/v1/"
+
+
+def test_provider_without_pool_uses_the_api_url():
+    factory = make_factory(OPENAI_API_URL="http://openai.local/v1/")
+
+    provider = factory.create(LLMEnums.OPENAI.value, role=LLMRoleEnums.GENERATION.value)
+
+    assert str(provider.client.base_url) == "http://openai.local/v1/"
+    assert str(provider.async_client.base_url) == "http://openai.local/v1/"
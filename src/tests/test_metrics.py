@@ -0,0 +1,108 @@
+from benchmarks.corpus import generate_corpus
+from helpers.config import get_settings
+from models import JobStatusEnum
+from fastapi.testclient import TestClient
+import subprocess
+import importlib
+import shutil
+import socket
+import httpx
+import time
+import uuid
+import sys
+import os
+import re
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+XLSX_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_openai(port: int):
+    process = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_openai", "--port", str(port), "--embedding-size", "32",
+        "--embedding-latency-ms", "0", "--first-token-latency-ms", "0", "--token-latency-ms", "0",
+    ], cwd=SRC_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    for _ in range(100):
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/v1/models").status_code == 200:
+                return process
+        except httpx.TransportError:
+            time.sleep(0.1)
+
+    process.kill()
+    raise RuntimeError("fake OpenAI server did not start")
+
+
+def read_samples(text: str, name: str):
+    return {
+        labels: float(value)
+        for labels, value in re.findall(rf"^{name}(\{{[^}}]*\}}) (\S+)$", text, flags=re.MULTILINE)
+    }
+
+
+def test_one_job_reports_no_provider_errors(tmp_path, monkeypatch):
+    run_id = uuid.uuid4().hex[:8]
+    project_id = f"test{run_id}"
+    port = free_port()
+
+    monkeypatch.setenv("OPENAI_API_URL", f"http://127.0.0.1:{port}/v1/")
+    monkeypatch.setenv("FILE_ALLOWED_TYPES", f'["{XLSX_TYPE}"]')
+    monkeypatch.setenv("METRICS_ENABLED", "True")
+    monkeypatch.setenv("JOB_PARSE_WORKERS", "1")
+    for key in ["VECTOR_DB_PATH", "LEXICAL_INDEX_PATH", "EMBEDDING_CACHE_PATH", "CATALOG_PATH", "CHECKPOINT_PATH"]:
+        monkeypatch.setenv(key, f"test_{run_id}_{key.lower()}")
+    get_settings.cache_clear()
+
+    fake = start_fake_openai(port)
+    try:
+        main = importlib.import_module("main")
+        path = generate_corpus(str(tmp_path), pdf_files=0, xlsx_files=1, xlsx_rows=60)[0]
+
+        with TestClient(main.app) as client:
+            with open(path, "rb") as f:
+                response = client.post(f"/api/v1/data/upload/{project_id}",
+                                       files={"file": (os.path.basename(path), f.read(), XLSX_TYPE)})
+            assert response.status_code == 200
+            file_id = response.json()["file_id"]
+
+            response = client.post(f"/api/v1/data/process/{project_id}",
+                                   json={"file_id": file_id, "chunk_size": 500})
+            assert response.status_code == 202
+            job_id = response.json()["job_id"]
+
+            for _ in range(600):
+                job = client.get(f"/api/v1/jobs/{job_id}").json()
+                if job["status"] in [JobStatusEnum.COMPLETED.value, JobStatusEnum.FAILED.value]:
+                    break
+                time.sleep(0.1)
+            assert job["status"] == JobStatusEnum.COMPLETED.value, job
+
+            # a search without hits is not an error either
+            response = client.post(f"/api/v1/data/query/{project_id}",
+                                   json={"question": "revenue", "file_ids": ["missing.xlsx"]})
+            assert response.status_code == 400
+
+            metrics = client.get("/metrics").text
+
+        calls = read_samples(metrics, "rag_provider_call_duration_seconds_count")
+        assert any('method="create_collection"' in labels for labels in calls)
+        assert any('method="search_by_vector"' in labels for labels in calls)
+
+        errors = read_samples(metrics, "rag_provider_errors_total")
+        assert all(value == 0 for value in errors.values()), errors
+
+    finally:
+        fake.kill()
+        get_settings.cache_clear()
+        shutil.rmtree(os.path.join(SRC_DIR, "assets", "files", project_id), ignore_errors=True)
+        database_dir = os.path.join(SRC_DIR, "assets", "database")
+        for name in os.listdir(database_dir):
+            if name.startswith(f"test_{run_id}_"):
+                shutil.rmtree(os.path.join(database_dir, name), ignore_errors=True)
@@ -0,0 +1,83 @@
+from stores.vectordb.providers import NumpyDBProvider
+from routes.data import data_router
+from fastapi.testclient import TestClient
+from fastapi import FastAPI
+import numpy as np
+import pytest
+
+DIMENSION = 32
+# enough rows that half of them still train the codebooks
+ROWS = 3000
+
+
+def make_vectors(n: int, seed: int = 0):
+    # clustered like real embeddings, a uniform cloud has no meaningful neighbours
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(20, DIMENSION))
+    return (centers[rng.integers(0, len(centers), n)] + 0.5 * rng.normal(size=(n, DIMENSION))).astype(np.float32)
+
+
+def make_provider(db_path: str, quantization: str):
+    provider = NumpyDBProvider(db_path=db_path, quantization=quantization, pq_subspaces=16)
+    provider.connect()
+    provider.create_collection(collection_name="project_test", embedding_size=DIMENSION)
+
+    vectors = make_vectors(ROWS)
+    assert provider.insert_many(
+        collection_name="project_test",
+        texts=[f"text {idx}" for idx in range(ROWS)],
+        vectors=vectors.tolist(),
+        metadata=[{"file_id": "a" if idx % 2 else "b", "chunk_index": idx} for idx in range(ROWS)],
+        record_ids=[str(idx) for idx in range(ROWS)]
+    )
+    return provider
+
+
+@pytest.mark.parametrize("quantization, codes_only_floor, rescored_floor", [
+    ("int8", 0.9, 0.97),
+    ("pq", 0.5, 0.9),
+])
+def test_recall_floor(tmp_path, quantization, codes_only_floor, rescored_floor):
+    provider = make_provider(str(tmp_path / "vectors"), quantization)
+
+    report = provider.evaluate_recall(collection_name="project_test", k=10, sample_size=100)
+    assert report["quantized"]
+    assert report["recall_at_10"]["codes_only"] >= codes_only_floor
+    assert report["recall_at_10"]["rescored"] >= rescored_floor
+
+
+@pytest.mark.parametrize("quantization", ["int8", "pq"])
+def test_codebooks_retrained_on_compaction(tmp_path, quantization):
+    provider = make_provider(str(tmp_path / "vectors"), quantization)
+    collection = provider.get_collection("project_test")
+    before = {key: value.copy() for key, value in collection.quantizer.to_arrays().items()}
+    old_quantizer_path = collection.quantizer_path()
+
+    # every row of one file goes, the survivors have another distribution
+    assert provider.delete_by_filter(collection_name="project_test", metadata_filter={"file_id": "b"})
+
+    assert collection.generation == 1
+    assert collection.is_quantized
+    assert collection.quantizer_path() != old_quantizer_path
+    after = collection.quantizer.to_arrays()
+    assert any(not np.array_equal(after[key], before[key]) for key in before)
+
+    report = provider.evaluate_recall(collection_name="project_test", k=10, sample_size=50)
+    assert report["recall_at_10"]["rescored"] >= 0.9
+
+
+def test_collection_stats_endpoint(tmp_path):
+    app = FastAPI()
+    app.include_router(data_router)
+    app.vectordb_client = make_provider(str(tmp_path / "vectors"), "int8")
+
+    with TestClient(app) as client:
+        response = client.get("/api/v1/data/collections/test/stats", params={"recall_k": 5, "sample_size": 20})
+        assert response.status_code == 200
+        info = response.json()["collections"][0]
+        assert info["count"] == ROWS
+        assert info["memory"]["codes_bytes"] == ROWS * DIMENSION
+        assert info["recall"]["recall_at_5"]["rescored"] >= 0.9
+
+        assert client.get("/api/v1/data/collections/missing/stats").status_code == 404
+        assert client.get("/api/v1/data/collections/test/stats", params={"recall_k": -1}).status_code == 422
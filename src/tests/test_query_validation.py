@@ -0,0 +1,37 @@
+from routes.data import data_router
+from fastapi.testclient import TestClient
+from fastapi import FastAPI
+import pytest
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(data_router)
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.mark.parametrize("path, body", [
+    ("/api/v1/data/query/test", {"question": "q"}),
+    ("/api/v1/data/query/batch/test", {"questions": [{"question": "q"}]}),
+])
+@pytest.mark.parametrize("field, value", [
+    ("top_k", 0),
+    ("top_k", -3),
+    ("top_k", "many"),
+    ("fetch_factor", 0),
+    ("fetch_factor", "x"),
+    ("mmr_lambda", -0.1),
+    ("mmr_lambda", 1.5),
+    ("mmr_lambda", "half"),
+])
+def test_retrieval_parameters_are_validated(client, path, body, field, value):
+    response = client.post(path, json={**body, field: value})
+    assert response.status_code == 422
+
+
+def test_missing_question_keeps_its_signal(client):
+    response = client.post("/api/v1/data/query/test", json={"top_k": 3})
+    assert response.status_code == 400
+    assert response.json() == {"signal": "Missing question"}
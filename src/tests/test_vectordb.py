@@ -0,0 +1,206 @@
+from stores.vectordb.providers import ChromaDBProvider, NumpyDBProvider
+import numpy as np
+import subprocess
+import pytest
+import sys
+import os
+
+DIMENSION = 8
+
+
+def make_provider(name: str, db_path: str, **kwargs):
+    if name == "chroma":
+        provider = ChromaDBProvider(db_path=db_path, distance_method="cosine")
+    else:
+        provider = NumpyDBProvider(db_path=db_path, distance_method="cosine", **kwargs)
+    provider.connect()
+    return provider
+
+
+@pytest.fixture(params=["chroma", "numpy"])
+def provider(request, tmp_path):
+    provider = make_provider(request.param, str(tmp_path / "vectors"))
+    provider.create_collection(collection_name="project_test", embedding_size=DIMENSION)
+    yield provider
+    provider.disconnect()
+
+
+def make_vectors(n: int, seed: int = 0):
+    return np.random.default_rng(seed).normal(size=(n, DIMENSION)).astype(np.float32).tolist()
+
+
+def insert_files(provider, n_per_file: int = 5, files: tuple = ("a", "b"), seed: int = 0):
+    vectors = make_vectors(n_per_file * len(files), seed=seed)
+    record_ids, texts, metadata = [], [], []
+    for file_idx, file_id in enumerate(files):
+        for chunk_index in range(n_per_file):
+            record_ids.append(f"{file_id}-{chunk_index}")
+            texts.append(f"text {file_id} {chunk_index}")
+            metadata.append({"file_id": file_id, "chunk_index": chunk_index})
+
+    assert provider.insert_many(collection_name="project_test", texts=texts, vectors=vectors,
+                                metadata=metadata, record_ids=record_ids)
+    return dict(zip(record_ids, vectors))
+
+
+def test_create_and_reset(provider):
+    assert provider.is_collection_existed("project_test")
+    assert not provider.is_collection_existed("project_missing")
+
+    insert_files(provider)
+    provider.create_collection(collection_name="project_test", embedding_size=DIMENSION)
+    assert len(provider.get_records("project_test")["ids"]) == 10
+
+    provider.create_collection(collection_name="project_test", embedding_size=DIMENSION, do_reset=True)
+    assert provider.get_records("project_test")["ids"] == []
+
+    provider.delete_collection("project_test")
+    assert not provider.is_collection_existed("project_test")
+
+
+def test_insert_upsert_and_get_records(provider):
+    insert_files(provider)
+
+    assert provider.upsert_many(
+        collection_name="project_test",
+        texts=["replaced", "new"],
+        vectors=make_vectors(2, seed=2),
+        metadata=[{"file_id": "a", "chunk_index": 0, "version": 2}, {"file_id": "c", "chunk_index": 0}],
+        record_ids=["a-0", "c-0"]
+    )
+
+    records = provider.get_records("project_test")
+    assert sorted(records["ids"]) == sorted([f"a-{i}" for i in range(5)] + [f"b-{i}" for i in range(5)] + ["c-0"])
+
+    records = provider.get_records("project_test", metadata_filter={"file_id": "a"})
+    by_id = dict(zip(records["ids"], records["metadatas"]))
+    assert len(by_id) == 5
+    assert by_id["a-0"]["version"] == 2
+
+    records = provider.get_records("project_test", metadata_filter={"file_id": {"$in": ["a", "c"]}})
+    assert len(records["ids"]) == 6
+
+
+def test_delete_many_and_by_filter(provider):
+    insert_files(provider)
+
+    assert provider.delete_many(collection_name="project_test", record_ids=["a-0", "a-1"])
+    assert sorted(provider.get_records("project_test", metadata_filter={"file_id": "a"})["ids"]) == \
+        ["a-2", "a-3", "a-4"]
+
+    assert provider.delete_by_filter(collection_name="project_test", metadata_filter={"file_id": "b"})
+    assert provider.get_records("project_test", metadata_filter={"file_id": "b"})["ids"] == []
+    assert len(provider.get_records("project_test")["ids"]) == 3
+
+
+def test_search_with_filter(provider):
+    vectors = insert_files(provider)
+
+    results = provider.search_by_vector(collection_name="project_test", vector=vectors["a-3"], limit=3)
+    assert results["ids"][0][0] == "a-3"
+    assert results["distances"][0][0] == pytest.approx(0, abs=1e-4)
+    assert results["distances"][0] == sorted(results["distances"][0])
+
+    # the nearest record belongs to another file, the filter keeps it out
+    results = provider.search_by_vector(collection_name="project_test", vector=vectors["a-3"], limit=3,
+                                        metadata_filter={"file_id": "b"}, include_vectors=True)
+    assert len(results["ids"][0]) == 3
+    assert all(metadata["file_id"] == "b" for metadata in results["metadatas"][0])
+    assert len(results["embeddings"][0][0]) == DIMENSION
+
+    results = provider.search_by_vector(collection_name="project_test", vector=vectors["a-3"], limit=3,
+                                        metadata_filter={"file_id": "missing"})
+    assert results["ids"] == [[]]
+
+
+def test_search_by_vectors(provider):
+    vectors = insert_files(provider)
+
+    results = provider.search_by_vectors(collection_name="project_test",
+                                         vectors=[vectors["a-1"], vectors["b-4"]], limit=2,
+                                         metadata_filter={"file_id": {"$in": ["a", "b"]}})
+    assert len(results["ids"]) == 2
+    assert results["ids"][0][0] == "a-1"
+    assert results["ids"][1][0] == "b-4"
+
+    results = provider.search_by_vectors(collection_name="project_test",
+                                         vectors=[vectors["a-1"], vectors["b-4"]], limit=2,
+                                         metadata_filter={"file_id": "a"})
+    assert all(record_id.startswith("a-") for ids in results["ids"] for record_id in ids)
+
+
+def test_compaction_threshold(tmp_path):
+    provider = make_provider("numpy", str(tmp_path / "vectors"), compaction_ratio=0.3)
+    provider.create_collection(collection_name="project_test", embedding_size=DIMENSION)
+    vectors = insert_files(provider, n_per_file=100)
+    collection = provider.get_collection("project_test")
+
+    # 60 of 200 rows deleted: below the 64 rows floor, the tombstones stay
+    assert provider.delete_many(collection_name="project_test", record_ids=[f"a-{i}" for i in range(60)])
+    assert collection.generation == 0
+    assert collection.deleted == 60
+
+    # 70 of 200 rows deleted: past both the floor and the ratio, the files are rewritten
+    assert provider.delete_many(collection_name="project_test", record_ids=[f"a-{i}" for i in range(60, 70)])
+    assert collection.generation == 1
+    assert collection.deleted == 0
+    assert collection.count == 130
+
+    results = provider.search_by_vector(collection_name="project_test", vector=vectors["b-7"], limit=1)
+    assert results["ids"] == [["b-7"]]
+    assert len(provider.get_records("project_test", metadata_filter={"file_id": "a"})["ids"]) == 30
+
+
+def test_repeated_id_in_one_batch_keeps_the_last_copy(tmp_path):
+    provider = make_provider("numpy", str(tmp_path / "vectors"))
+    provider.create_collection(collection_name="project_test", embedding_size=DIMENSION)
+    vectors = make_vectors(3)
+
+    assert provider.upsert_many(collection_name="project_test", texts=["first", "other", "last"],
+                                vectors=vectors, metadata=[{"file_id": "a"}] * 3,
+                                record_ids=["dup", "other", "dup"])
+
+    records = provider.get_records("project_test", metadata_filter={"file_id": "a"})
+    assert sorted(records["ids"]) == ["dup", "other"]
+    assert provider.get_collection("project_test").count == 2
+
+    results = provider.search_by_vector(collection_name="project_test", vector=vectors[0], limit=3)
+    assert sorted(results["ids"][0]) == ["dup", "other"]
+    assert results["documents"][0][results["ids"][0].index("dup")] == "last"
+
+    assert provider.delete_many(collection_name="project_test", record_ids=["dup", "other"])
+    assert provider.search_by_vector(collection_name="project_test", vector=vectors[0], limit=3)["ids"] == [[]]
+
+
+def test_replica_follows_writer(tmp_path):
+    db_path = str(tmp_path / "vectors")
+    writer = make_provider("numpy", db_path)
+    writer.create_collection(collection_name="project_test", embedding_size=DIMENSION)
+    vectors = insert_files(writer, files=("a",))
+
+    replica = make_provider("numpy", db_path, read_only=True)
+    assert len(replica.get_records("project_test")["ids"]) == 5
+
+    # appended after the replica opened the collection
+    vectors.update(insert_files(writer, files=("b",), seed=1))
+    results = replica.search_by_vector(collection_name="project_test", vector=vectors["b-2"], limit=1)
+    assert results["ids"] == [["b-2"]]
+
+    writer.delete_by_filter(collection_name="project_test", metadata_filter={"file_id": "a"})
+    assert replica.get_records("project_test", metadata_filter={"file_id": "a"})["ids"] == []
+
+    assert not replica.insert_many(collection_name="project_test", texts=["x"],
+                                   vectors=make_vectors(1), record_ids=["x"])
+    with pytest.raises(RuntimeError):
+        replica.create_collection(collection_name="project_other", embedding_size=DIMENSION)
+
+
+def test_package_names_resolve_to_classes_in_any_import_order():
+    # a fresh interpreter, in this one the package names were already resolved by the imports above
+    script = (
+        "import stores.vectordb.providers.NumpyDBProvider\n"
+        "from stores.vectordb.providers import NumpyDBProvider\n"
+        "assert isinstance(NumpyDBProvider, type), NumpyDBProvider\n"
+    )
+    src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", script], cwd=src_dir, check=True)